@@ -0,0 +1,20 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_cst_binary"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("cst_blobs", sa.Column("format", sa.String(length=16), nullable=False, server_default="sexp"))
+    op.add_column("cst_blobs", sa.Column("data", sa.LargeBinary(), nullable=True))
+    op.alter_column("cst_blobs", "tree", nullable=True)
+
+
+def downgrade():
+    op.execute("DELETE FROM cst_blobs WHERE tree IS NULL")
+    op.alter_column("cst_blobs", "tree", nullable=False)
+    op.drop_column("cst_blobs", "data")
+    op.drop_column("cst_blobs", "format")
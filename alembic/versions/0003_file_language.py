@@ -0,0 +1,15 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_file_language"
+down_revision = "0002_cst_binary"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("source_files", sa.Column("language", sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    op.drop_column("source_files", "language")
@@ -0,0 +1,24 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_run_progress"
+down_revision = "0003_file_language"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Runs that predate job tracking were ingested synchronously and finished.
+    op.add_column("runs", sa.Column("status", sa.String(length=16), nullable=False, server_default="completed"))
+    op.add_column("runs", sa.Column("files_total", sa.Integer(), nullable=True))
+    op.add_column("runs", sa.Column("files_done", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("runs", sa.Column("bytes_done", sa.BigInteger(), nullable=False, server_default="0"))
+    op.add_column("runs", sa.Column("error", sa.Text(), nullable=True))
+    op.add_column("runs", sa.Column("finished_at", sa.String(length=64), nullable=True))
+    op.create_index("ix_runs_status", "runs", ["status"])
+
+
+def downgrade():
+    op.drop_index("ix_runs_status", table_name="runs")
+    for column in ("finished_at", "error", "bytes_done", "files_done", "files_total", "status"):
+        op.drop_column("runs", column)
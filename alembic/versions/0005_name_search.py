@@ -0,0 +1,28 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_name_search"
+down_revision = "0004_run_progress"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Prefix matches: LIKE 'abc%' on name, and on lower(name) for ignore_case.
+    op.create_index(
+        "ix_ast_nodes_name_pattern", "ast_nodes", ["name"], postgresql_ops={"name": "text_pattern_ops"},
+    )
+    op.create_index("ix_ast_nodes_name_lower", "ast_nodes", [sa.text("lower(name) text_pattern_ops")])
+    # Substring and fuzzy matches. pg_trgm ships with contrib but is not
+    # always installed; without it queries use the in-process name index.
+    bind = op.get_bind()
+    available = bind.execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).first()
+    if available is not None:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX ix_ast_nodes_name_trgm ON ast_nodes USING gin (name gin_trgm_ops)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_ast_nodes_name_trgm")
+    op.drop_index("ix_ast_nodes_name_lower", table_name="ast_nodes")
+    op.drop_index("ix_ast_nodes_name_pattern", table_name="ast_nodes")
@@ -0,0 +1,77 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_call_edges"
+down_revision = "0005_name_search"
+branch_labels = None
+depends_on = None
+
+DEF_KINDS = ("function_definition", "class_definition", "function_declaration", "class_declaration",
+             "method_definition")
+
+# Innermost enclosing definition of every named call in existing runs:
+# climb parent_id until a definition is reached.
+BACKFILL_SQL = """
+WITH RECURSIVE up(call_id, file_id, callee_name, anc) AS (
+    SELECT c.id, c.file_id, c.name, c.parent_id
+    FROM ast_nodes c
+    WHERE c.kind = 'call_expression' AND c.name IS NOT NULL
+    UNION ALL
+    SELECT up.call_id, up.file_id, up.callee_name, p.parent_id
+    FROM up JOIN ast_nodes p ON p.id = up.anc
+    WHERE p.kind <> ALL(:kinds)
+)
+INSERT INTO call_edges (run_id, file_id, caller_id, call_id, callee_name)
+SELECT f.run_id, up.file_id, up.anc, up.call_id, up.callee_name
+FROM up
+JOIN ast_nodes d ON d.id = up.anc AND d.kind = ANY(:kinds)
+JOIN source_files f ON f.id = up.file_id
+ORDER BY up.call_id
+"""
+
+# Same rules as app.graph.resolve_callees, for every run at once.
+RESOLVE_SQL = """
+WITH defs AS MATERIALIZED (
+    SELECT n.id, n.name, n.file_id, f.run_id
+    FROM ast_nodes n JOIN source_files f ON f.id = n.file_id
+    WHERE n.kind = ANY(:kinds) AND n.name IS NOT NULL
+),
+same_file AS (
+    SELECT file_id, name, min(id) AS id FROM defs GROUP BY file_id, name HAVING count(*) = 1
+),
+same_run AS (
+    SELECT run_id, name, min(id) AS id FROM defs GROUP BY run_id, name HAVING count(*) = 1
+),
+resolved AS (
+    SELECT e.id AS edge_id, COALESCE(sf.id, sr.id) AS callee_id
+    FROM call_edges e
+    LEFT JOIN same_file sf ON sf.file_id = e.file_id AND sf.name = e.callee_name
+    LEFT JOIN same_run sr ON sr.run_id = e.run_id AND sr.name = e.callee_name
+)
+UPDATE call_edges e SET callee_id = r.callee_id
+FROM resolved r
+WHERE e.id = r.edge_id AND r.callee_id IS NOT NULL
+"""
+
+
+def upgrade():
+    op.create_table(
+        "call_edges",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("run_id", sa.BigInteger(), sa.ForeignKey("runs.id", ondelete="CASCADE"), index=True),
+        sa.Column("file_id", sa.BigInteger(), sa.ForeignKey("source_files.id", ondelete="CASCADE"), index=True),
+        sa.Column("caller_id", sa.BigInteger(), nullable=False, index=True),
+        sa.Column("call_id", sa.BigInteger(), nullable=False),
+        sa.Column("callee_name", sa.String(length=256), nullable=False),
+        sa.Column("callee_id", sa.BigInteger(), nullable=True, index=True),
+    )
+    op.create_index("ix_call_edges_run_callee_name", "call_edges", ["run_id", "callee_name"])
+
+    bind = op.get_bind()
+    params = {"kinds": list(DEF_KINDS)}
+    bind.execute(sa.text(BACKFILL_SQL), params)
+    bind.execute(sa.text(RESOLVE_SQL), params)
+
+
+def downgrade():
+    op.drop_table("call_edges")
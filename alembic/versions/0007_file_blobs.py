@@ -0,0 +1,27 @@
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0007_file_blobs"
+down_revision = "0006_call_edges"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "file_blobs",
+        sa.Column("content_hash", sa.String(length=64), primary_key=True),
+        sa.Column("codec", sa.String(length=16), nullable=False),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+        sa.Column("chunk_size", sa.Integer(), nullable=False),
+        sa.Column("chunk_ends", postgresql.ARRAY(sa.BigInteger()), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+    )
+    # Chunks are already compressed; keep TOAST from compressing them again
+    # so substring() reads fetch only the pages a slice needs.
+    op.execute("ALTER TABLE file_blobs ALTER COLUMN data SET STORAGE EXTERNAL")
+
+
+def downgrade():
+    op.drop_table("file_blobs")
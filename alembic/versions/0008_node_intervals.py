@@ -0,0 +1,56 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_node_intervals"
+down_revision = "0007_file_blobs"
+branch_labels = None
+depends_on = None
+
+# Nodes were always inserted in pre-order, so a node's position among its
+# file's ids is its pre-order number.
+BACKFILL_PRE_SQL = """
+UPDATE ast_nodes n SET pre = r.pre
+FROM (SELECT id, row_number() OVER (PARTITION BY file_id ORDER BY id) - 1 AS pre FROM ast_nodes) r
+WHERE n.id = r.id
+"""
+
+# Every (node, ancestor, distance) pair: depth is the longest distance and an
+# ancestor's subtree ends at its last descendant in pre-order.
+BACKFILL_POST_DEPTH_SQL = """
+CREATE TEMP TABLE node_ancestors ON COMMIT DROP AS
+WITH RECURSIVE up(id, pre, anc, lvl) AS (
+    SELECT id, pre, parent_id, 1 FROM ast_nodes WHERE parent_id IS NOT NULL
+    UNION ALL
+    SELECT up.id, up.pre, p.parent_id, up.lvl + 1
+    FROM up JOIN ast_nodes p ON p.id = up.anc
+    WHERE p.parent_id IS NOT NULL
+)
+SELECT id, pre, anc, lvl FROM up;
+
+UPDATE ast_nodes n SET depth = d.depth
+FROM (SELECT id, max(lvl) AS depth FROM node_ancestors GROUP BY id) d
+WHERE n.id = d.id;
+
+UPDATE ast_nodes n SET post = a.post
+FROM (SELECT anc, max(pre) AS post FROM node_ancestors GROUP BY anc) a
+WHERE n.id = a.anc;
+
+UPDATE ast_nodes SET depth = 0 WHERE depth IS NULL;
+UPDATE ast_nodes SET post = pre WHERE post IS NULL;
+"""
+
+
+def upgrade():
+    for column in ("pre", "post", "depth"):
+        op.add_column("ast_nodes", sa.Column(column, sa.Integer(), nullable=True))
+    op.execute(BACKFILL_PRE_SQL)
+    op.execute(BACKFILL_POST_DEPTH_SQL)
+    for column in ("pre", "post", "depth"):
+        op.alter_column("ast_nodes", column, nullable=False)
+    op.create_index("ix_ast_nodes_file_pre", "ast_nodes", ["file_id", "pre"])
+
+
+def downgrade():
+    op.drop_index("ix_ast_nodes_file_pre", table_name="ast_nodes")
+    for column in ("depth", "post", "pre"):
+        op.drop_column("ast_nodes", column)
@@ -0,0 +1,43 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_projects"
+down_revision = "0008_node_intervals"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "projects",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("root_path", sa.Text(), nullable=False, unique=True),
+        sa.Column("created_at", sa.String(length=64), nullable=True),
+    )
+    op.add_column("runs", sa.Column("project_id", sa.BigInteger(), sa.ForeignKey("projects.id"), nullable=True))
+    # Whether earlier runs walked the whole root is unknown; as partial runs
+    # they only ever add paths to the latest view.
+    op.add_column("runs", sa.Column("full_walk", sa.Boolean(), nullable=False, server_default=sa.text("false")))
+    op.create_index("ix_runs_project_id", "runs", ["project_id"])
+
+    # One project per distinct root; trailing slashes are dropped, as
+    # app.ingest.project_root does for new runs.
+    op.execute("""
+        INSERT INTO projects (root_path, created_at)
+        SELECT root, min(created_at) FROM (
+            SELECT CASE WHEN root_path = '/' THEN root_path ELSE rtrim(root_path, '/') END AS root, created_at
+            FROM runs WHERE root_path IS NOT NULL AND root_path <> ''
+        ) r
+        GROUP BY root
+    """)
+    op.execute("""
+        UPDATE runs SET project_id = p.id FROM projects p
+        WHERE p.root_path = CASE WHEN runs.root_path = '/' THEN runs.root_path ELSE rtrim(runs.root_path, '/') END
+    """)
+
+
+def downgrade():
+    op.drop_index("ix_runs_project_id", table_name="runs")
+    op.drop_column("runs", "full_walk")
+    op.drop_column("runs", "project_id")
+    op.drop_table("projects")
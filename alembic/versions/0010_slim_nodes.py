@@ -0,0 +1,160 @@
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0010_slim_nodes"
+down_revision = "0009_projects"
+branch_labels = None
+depends_on = None
+
+# Columns widest first, as in app.models.AstNode, so rows carry no padding.
+CREATE_NODES_SQL = """
+CREATE TABLE ast_nodes (
+    id bigint NOT NULL DEFAULT nextval('ast_nodes_id_seq'),
+    run_id bigint NOT NULL,
+    file_id bigint NOT NULL,
+    parent_id bigint,
+    name_id integer,
+    pre integer NOT NULL,
+    post integer NOT NULL,
+    depth integer NOT NULL,
+    start_byte integer NOT NULL,
+    end_byte integer NOT NULL,
+    start_line integer NOT NULL,
+    start_col integer NOT NULL,
+    end_line integer NOT NULL,
+    end_col integer NOT NULL,
+    kind_id smallint NOT NULL,
+    meta jsonb
+) PARTITION BY LIST (run_id)
+"""
+
+# Rows are written in id order, which is pre-order per file, so each
+# partition is laid out in the order range scans read it.
+COPY_NODES_SQL = """
+INSERT INTO ast_nodes (id, run_id, file_id, parent_id, name_id, pre, post, depth, start_byte, end_byte,
+                       start_line, start_col, end_line, end_col, kind_id, meta)
+SELECT o.id, f.run_id, o.file_id, o.parent_id, s.id, o.pre, o.post, o.depth, o.start_byte, o.end_byte,
+       o.start_line, o.start_col, o.end_line, o.end_col, k.id, o.meta
+FROM ast_nodes_old o
+JOIN source_files f ON f.id = o.file_id
+JOIN node_kinds k ON k.kind = o.kind
+LEFT JOIN symbols s ON s.name = o.name
+ORDER BY o.id
+"""
+
+NAME_STATISTICS = 1000
+
+NODE_INDEXES = {
+    "ix_ast_nodes_name_kind": ["name_id", "kind_id"],
+    "ix_ast_nodes_file_kind": ["file_id", "kind_id"],
+    "ix_ast_nodes_file_pre": ["file_id", "pre"],
+}
+
+OLD_NODE_INDEXES = ("ix_ast_nodes_file_id", "ix_ast_nodes_file_pre", "ix_ast_nodes_kind", "ix_ast_nodes_name",
+                    "ix_ast_nodes_name_lower", "ix_ast_nodes_name_pattern", "ix_ast_nodes_parent_id",
+                    "ix_ast_nodes_name_trgm")
+
+
+def _has_pg_trgm(bind) -> bool:
+    return bind.execute(sa.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+
+
+def upgrade():
+    bind = op.get_bind()
+    op.create_table(
+        "node_kinds",
+        sa.Column("id", sa.SmallInteger(), primary_key=True),
+        sa.Column("kind", sa.String(length=64), nullable=False, unique=True),
+    )
+    op.create_table(
+        "symbols",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(length=256), nullable=False),
+    )
+    op.execute("INSERT INTO node_kinds (kind) SELECT DISTINCT kind FROM ast_nodes ORDER BY kind")
+    op.execute("INSERT INTO symbols (name) SELECT DISTINCT name FROM ast_nodes WHERE name IS NOT NULL ORDER BY name")
+    # The name search indexes of 0005 move to the distinct names.
+    op.create_index("ix_symbols_name", "symbols", ["name"], unique=True, postgresql_ops={"name": "text_pattern_ops"})
+    op.create_index("ix_symbols_name_lower", "symbols", [sa.text("lower(name) text_pattern_ops")])
+    if _has_pg_trgm(bind):
+        op.execute("CREATE INDEX ix_symbols_name_trgm ON symbols USING gin (name gin_trgm_ops)")
+
+    # Rebuild ast_nodes partitioned, keeping ids and their sequence. The old
+    # table's constraints and indexes go first to free their names.
+    op.rename_table("ast_nodes", "ast_nodes_old")
+    op.execute("ALTER SEQUENCE ast_nodes_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE ast_nodes_old DROP CONSTRAINT ast_nodes_pkey")
+    op.execute("ALTER TABLE ast_nodes_old DROP CONSTRAINT ast_nodes_file_id_fkey")
+    for name in OLD_NODE_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute(CREATE_NODES_SQL)
+    for (run_id,) in bind.execute(sa.text("SELECT DISTINCT run_id FROM source_files ORDER BY run_id")):
+        op.execute(f"CREATE TABLE ast_nodes_r{run_id} PARTITION OF ast_nodes FOR VALUES IN ({run_id})")
+    # Nodes without a file belong to no run; there are none unless rows
+    # were deleted by hand.
+    op.execute(COPY_NODES_SQL)
+    op.drop_table("ast_nodes_old")
+
+    # Indexes are built once the rows are in, one partition at a time.
+    op.execute("ALTER TABLE ast_nodes ADD PRIMARY KEY (id, run_id)")
+    for name, columns in NODE_INDEXES.items():
+        op.create_index(name, "ast_nodes", columns)
+    op.create_foreign_key("ast_nodes_file_id_fkey", "ast_nodes", "source_files", ["file_id"], ["id"],
+                          ondelete="CASCADE")
+    op.execute("ALTER SEQUENCE ast_nodes_id_seq OWNED BY ast_nodes.id")
+    # As app.partitions.ensure_partition does for new runs.
+    op.execute(f"ALTER TABLE ast_nodes ALTER COLUMN name_id SET STATISTICS {NAME_STATISTICS}")
+    op.execute("ANALYZE ast_nodes, node_kinds, symbols")
+
+
+def downgrade():
+    bind = op.get_bind()
+    op.rename_table("ast_nodes", "ast_nodes_new")
+    op.execute("ALTER SEQUENCE ast_nodes_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE ast_nodes_new DROP CONSTRAINT ast_nodes_pkey")
+    op.execute("ALTER TABLE ast_nodes_new DROP CONSTRAINT ast_nodes_file_id_fkey")
+    for name in NODE_INDEXES:
+        op.execute(f"DROP INDEX {name}")
+    op.create_table(
+        "ast_nodes",
+        sa.Column("id", sa.BigInteger(), primary_key=True, server_default=sa.text("nextval('ast_nodes_id_seq')")),
+        sa.Column("file_id", sa.BigInteger(), sa.ForeignKey("source_files.id", ondelete="CASCADE")),
+        sa.Column("kind", sa.String(length=64), nullable=False),
+        sa.Column("name", sa.String(length=256), nullable=True),
+        sa.Column("parent_id", sa.BigInteger(), nullable=True),
+        sa.Column("start_byte", sa.Integer(), nullable=False),
+        sa.Column("end_byte", sa.Integer(), nullable=False),
+        sa.Column("start_line", sa.Integer(), nullable=False),
+        sa.Column("start_col", sa.Integer(), nullable=False),
+        sa.Column("end_line", sa.Integer(), nullable=False),
+        sa.Column("end_col", sa.Integer(), nullable=False),
+        sa.Column("meta", postgresql.JSONB(), nullable=True),
+        sa.Column("pre", sa.Integer(), nullable=False),
+        sa.Column("post", sa.Integer(), nullable=False),
+        sa.Column("depth", sa.Integer(), nullable=False),
+    )
+    op.execute("""
+        INSERT INTO ast_nodes (id, file_id, kind, name, parent_id, start_byte, end_byte, start_line, start_col,
+                               end_line, end_col, meta, pre, post, depth)
+        SELECT n.id, n.file_id, k.kind, s.name, n.parent_id, n.start_byte, n.end_byte, n.start_line, n.start_col,
+               n.end_line, n.end_col, n.meta, n.pre, n.post, n.depth
+        FROM ast_nodes_new n
+        JOIN node_kinds k ON k.id = n.kind_id
+        LEFT JOIN symbols s ON s.id = n.name_id
+    """)
+    op.execute("DROP TABLE ast_nodes_new")
+    op.execute("ALTER SEQUENCE ast_nodes_id_seq OWNED BY ast_nodes.id")
+    op.create_index("ix_ast_nodes_file_id", "ast_nodes", ["file_id"])
+    op.create_index("ix_ast_nodes_file_pre", "ast_nodes", ["file_id", "pre"])
+    op.create_index("ix_ast_nodes_kind", "ast_nodes", ["kind"])
+    op.create_index("ix_ast_nodes_name", "ast_nodes", ["name"])
+    op.create_index("ix_ast_nodes_parent_id", "ast_nodes", ["parent_id"])
+    op.create_index(
+        "ix_ast_nodes_name_pattern", "ast_nodes", ["name"], postgresql_ops={"name": "text_pattern_ops"},
+    )
+    op.create_index("ix_ast_nodes_name_lower", "ast_nodes", [sa.text("lower(name) text_pattern_ops")])
+    if _has_pg_trgm(bind):
+        op.execute("CREATE INDEX ix_ast_nodes_name_trgm ON ast_nodes USING gin (name gin_trgm_ops)")
+    op.drop_table("symbols")
+    op.drop_table("node_kinds")
@@ -0,0 +1,15 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011_run_version"
+down_revision = "0010_slim_nodes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("runs", sa.Column("version", sa.Integer(), nullable=False, server_default=sa.text("0")))
+
+
+def downgrade():
+    op.drop_column("runs", "version")
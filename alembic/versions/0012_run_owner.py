@@ -0,0 +1,17 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012_run_owner"
+down_revision = "0011_run_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Unfinished runs from before have no owner, so app.leases treats them as
+    # orphaned: no process survives the upgrade's restart to finish them.
+    op.add_column("runs", sa.Column("owner", sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("runs", "owner")
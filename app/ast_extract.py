@@ -15,7 +15,19 @@ class AstLikeNode:
     parent_idx: int | None
     meta: dict | None = None
 
-# Minimal extractors. Extend per language.
+# Node kinds that own the calls made inside them (see ``call_edges``).
+DEF_KINDS = [
+    "function_definition",
+    "class_definition",
+    "function_declaration",
+    "class_declaration",
+    "method_definition",
+]
+
+# Node kinds recorded for import statements (Python and JavaScript).
+IMPORT_KINDS = ["import_statement", "import_from_statement"]
+
+# Minimal extractors. Extend per language with a ``_Grammar`` (below).
 
 def extract_ast_like(language: str, tree) -> list[AstLikeNode]:
     lang = language.lower()
@@ -28,157 +40,193 @@ def extract_ast_like(language: str, tree) -> list[AstLikeNode]:
     return []
 
 
-def _walk(node, parent_idx, out):
-    for child in node.children:
-        yield child
-        yield from _walk(child, parent_idx, out)
+def call_edges(nodes: list[AstLikeNode]) -> list[tuple[int, int]]:
+    """``(caller_idx, call_idx)`` for each named call inside a definition.
+
+    The caller is the innermost enclosing ``DEF_KINDS`` node. Nodes are in
+    pre-order, so one pass that inherits each parent's owner is enough.
+    """
+    def_kinds = frozenset(DEF_KINDS)
+    owner: list[int | None] = [None] * len(nodes)
+    edges = []
+    for idx, n in enumerate(nodes):
+        if n.kind in def_kinds:
+            owner[idx] = idx
+            continue
+        if n.parent_idx is not None:
+            owner[idx] = owner[n.parent_idx]
+        if n.kind == "call_expression" and n.name and owner[idx] is not None:
+            edges.append((owner[idx], idx))
+    return edges
+
+
+def tree_intervals(nodes: list[AstLikeNode]) -> tuple[list[int], list[int]]:
+    """``(post, depth)`` for each node of a pre-order node list.
+
+    Node ``i`` sits at pre-order position ``i`` and its subtree is exactly
+    the positions ``i..post[i]``, so descendants are a range and ancestors
+    are the nodes whose range contains ``i``.
+    """
+    count = len(nodes)
+    post = list(range(count))
+    depth = [0] * count
+    for idx, n in enumerate(nodes):
+        if n.parent_idx is not None:
+            depth[idx] = depth[n.parent_idx] + 1
+    for idx in range(count - 1, -1, -1):
+        parent = nodes[idx].parent_idx
+        if parent is not None and post[idx] > post[parent]:
+            post[parent] = post[idx]
+    return post, depth
 
 
+def _ts_range(node):
+    (srow, scol) = node.start_point
+    (erow, ecol) = node.end_point
+    return node.start_byte, node.end_byte, srow, scol, erow, ecol
 
 
-def _last_identifier_text(node):
-    last = None
-    for child in node.children:
-        if child.type == "identifier":
-            last = child
-        last_child = _last_identifier_text(child)
-        if last_child is not None:
-            last = last_child
-    return last.text.decode("utf-8") if last is not None else None
+def _text(node) -> str:
+    return node.text.decode("utf-8")
 
 
-def _extract_call_name(node, field_names=("function", "callee")):
-    target = None
-    for field in field_names:
-        target = node.child_by_field_name(field)
-        if target is not None:
-            break
-    if target is None:
-        return None
-    if target.type == "identifier":
-        return target.text.decode("utf-8")
-    return _last_identifier_text(target)
+@dataclass(frozen=True)
+class _Grammar:
+    """What one language's extractor records.
 
+    ``records`` maps each recorded node kind to a function returning its
+    ``(name, meta)``. Nodes of ``call_type`` are recorded as
+    ``call_expression``, named after the child in one of ``call_fields``.
+    """
+    records: dict
+    call_type: str | None = None
+    call_fields: frozenset = frozenset()
 
-def _ts_range(node):
-    (srow, scol) = node.start_point
-    (erow, ecol) = node.end_point
-    return node.start_byte, node.end_byte, srow, scol, erow, ecol
 
+def _extract(tree, grammar: _Grammar) -> list[AstLikeNode]:
+    """One pre-order pass over ``tree`` with a ``TreeCursor``; no recursion.
 
-def _extract_python(tree):
+    Each recorded node's parent is its nearest recorded ancestor. A call is
+    named after its callee if that is an identifier, otherwise after the
+    last identifier inside the callee (``a.b().c`` is ``c``). That
+    identifier is tracked during the same pass, so chained calls are not
+    re-walked once per call.
+    """
+    records, call_type, call_fields = grammar.records, grammar.call_type, grammar.call_fields
     out: list[AstLikeNode] = []
-
-    def visit(node, parent_idx=None):
+    cursor = tree.walk()
+    goto_first_child, goto_next_sibling, goto_parent = (
+        cursor.goto_first_child, cursor.goto_next_sibling, cursor.goto_parent,
+    )
+    # ``owner`` is the index recorded nodes under the cursor get as parent,
+    # ``parent_call`` the index of the cursor's parent if that is a call;
+    # both are saved per ancestor on the way down.
+    owner = parent_call = None
+    saved: list[tuple[int | None, int | None]] = []
+    # Callees still open: (call index, depth, identifiers seen on entry).
+    callees: list[tuple[int, int, int]] = []
+    last_identifier = None
+    identifiers = 0
+    while True:
+        node = cursor.node
         kind = node.type
-        if kind in {"function_definition", "class_definition", "import_statement", "import_from_statement"}:
-            name = None
-            meta = None
-            if kind in {"function_definition", "class_definition"}:
-                name_node = node.child_by_field_name("name")
-                if name_node:
-                    name = name_node.text.decode("utf-8")
-                if kind == "function_definition":
-                    params = []
-                    params_node = node.child_by_field_name("parameters")
-                    if params_node:
-                        for child in params_node.children:
-                            if child.type == "identifier":
-                                params.append(child.text.decode("utf-8"))
-                    if params:
-                        meta = {"params": params}
-            if kind in {"import_statement", "import_from_statement"}:
-                names = []
-                for child in node.children:
-                    if child.type in {"dotted_name", "identifier"}:
-                        names.append(child.text.decode("utf-8"))
-                if names:
-                    meta = {"names": names}
-                    name = names[0]
-            start_byte, end_byte, srow, scol, erow, ecol = _ts_range(node)
-            idx = len(out)
-            out.append(AstLikeNode(kind=kind, name=name, start_byte=start_byte, end_byte=end_byte,
-                                   start_line=srow, start_col=scol, end_line=erow, end_col=ecol,
-                                   parent_idx=parent_idx, meta=meta))
-            for child in node.children:
-                visit(child, idx)
-        elif kind == "call":
-            name = _extract_call_name(node, ("function",))
-            start_byte, end_byte, srow, scol, erow, ecol = _ts_range(node)
+        idx = owner
+        call = None
+        if kind in records:
+            name, meta = records[kind](node)
             idx = len(out)
-            out.append(AstLikeNode(kind="call_expression", name=name, start_byte=start_byte, end_byte=end_byte,
-                                   start_line=srow, start_col=scol, end_line=erow, end_col=ecol,
-                                   parent_idx=parent_idx))
-            for child in node.children:
-                visit(child, idx)
-        else:
-            for child in node.children:
-                visit(child, parent_idx)
-
-    visit(tree.root_node, None)
-    return out
+            out.append(AstLikeNode(kind, name, *_ts_range(node), parent_idx=owner, meta=meta))
+        elif kind == call_type:
+            idx = call = len(out)
+            out.append(AstLikeNode("call_expression", None, *_ts_range(node), parent_idx=owner))
+        elif kind == "identifier":
+            last_identifier = node
+            identifiers += 1
+        if parent_call is not None and cursor.field_name in call_fields:
+            if kind == "identifier":
+                out[parent_call].name = _text(node)
+            else:
+                callees.append((parent_call, len(saved), identifiers))
+
+        if goto_first_child():
+            saved.append((owner, parent_call))
+            owner, parent_call = idx, call
+            continue
+        while True:
+            if callees and callees[-1][1] == len(saved):
+                call, _, seen = callees.pop()
+                if identifiers > seen:
+                    out[call].name = _text(last_identifier)
+            if goto_next_sibling():
+                break
+            if not goto_parent():
+                return out
+            owner, parent_call = saved.pop()
+
+
+def _python_def(node):
+    name_node = node.child_by_field_name("name")
+    name = _text(name_node) if name_node else None
+    meta = None
+    if node.type == "function_definition":
+        params_node = node.child_by_field_name("parameters")
+        params = [_text(c) for c in params_node.children if c.type == "identifier"] if params_node else []
+        if params:
+            meta = {"params": params}
+    return name, meta
+
+
+def _python_import(node):
+    names = [_text(c) for c in node.children if c.type in {"dotted_name", "identifier"}]
+    return (names[0], {"names": names}) if names else (None, None)
+
+
+def _javascript_decl(node):
+    name_node = node.child_by_field_name("name")
+    name = _text(name_node) if name_node else None
+    if node.type == "import_statement":
+        for child in node.children:
+            if child.type == "string":
+                source = _text(child).strip("'\"")
+                if source:
+                    return source, {"source": source}
+                break
+    return name, None
+
+
+def _unnamed(node):
+    return None, None
+
+
+_PYTHON = _Grammar(
+    records={
+        "function_definition": _python_def,
+        "class_definition": _python_def,
+        "import_statement": _python_import,
+        "import_from_statement": _python_import,
+    },
+    call_type="call",
+    call_fields=frozenset({"function"}),
+)
+_JAVASCRIPT = _Grammar(
+    records={
+        kind: _javascript_decl
+        for kind in ("function_declaration", "class_declaration", "lexical_declaration", "method_definition",
+                     "import_statement")
+    },
+    call_type="call_expression",
+    call_fields=frozenset({"function", "callee"}),
+)
+_CSS = _Grammar(records={"rule_set": _unnamed, "at_rule": _unnamed})
 
 
-def _extract_javascript(tree):
-    out: list[AstLikeNode] = []
+def _extract_python(tree):
+    return _extract(tree, _PYTHON)
 
-    def visit(node, parent_idx=None):
-        kind = node.type
-        if kind in {"function_declaration", "class_declaration", "lexical_declaration", "method_definition", "import_statement"}:
-            name = None
-            meta = None
-            name_node = node.child_by_field_name("name")
-            if name_node:
-                name = name_node.text.decode("utf-8")
-            if kind == "import_statement":
-                source = None
-                for child in node.children:
-                    if child.type == "string":
-                        source = child.text.decode("utf-8").strip("'\"")
-                        break
-                if source:
-                    meta = {"source": source}
-                    name = source
-            start_byte, end_byte, srow, scol, erow, ecol = _ts_range(node)
-            idx = len(out)
-            out.append(AstLikeNode(kind=kind, name=name, start_byte=start_byte, end_byte=end_byte,
-                                   start_line=srow, start_col=scol, end_line=erow, end_col=ecol,
-                                   parent_idx=parent_idx, meta=meta))
-            for child in node.children:
-                visit(child, idx)
-        elif kind == "call_expression":
-            name = _extract_call_name(node, ("function", "callee"))
-            start_byte, end_byte, srow, scol, erow, ecol = _ts_range(node)
-            idx = len(out)
-            out.append(AstLikeNode(kind="call_expression", name=name, start_byte=start_byte, end_byte=end_byte,
-                                   start_line=srow, start_col=scol, end_line=erow, end_col=ecol,
-                                   parent_idx=parent_idx))
-            for child in node.children:
-                visit(child, idx)
-        else:
-            for child in node.children:
-                visit(child, parent_idx)
 
-    visit(tree.root_node, None)
-    return out
+def _extract_javascript(tree):
+    return _extract(tree, _JAVASCRIPT)
 
 
 def _extract_css(tree):
-    out: list[AstLikeNode] = []
-
-    def visit(node, parent_idx=None):
-        kind = node.type
-        if kind in {"rule_set", "at_rule"}:
-            start_byte, end_byte, srow, scol, erow, ecol = _ts_range(node)
-            idx = len(out)
-            out.append(AstLikeNode(kind=kind, name=None, start_byte=start_byte, end_byte=end_byte,
-                                   start_line=srow, start_col=scol, end_line=erow, end_col=ecol,
-                                   parent_idx=parent_idx))
-            for child in node.children:
-                visit(child, idx)
-        else:
-            for child in node.children:
-                visit(child, parent_idx)
-
-    visit(tree.root_node, None)
-    return out
+    return _extract(tree, _CSS)
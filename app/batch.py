@@ -0,0 +1,335 @@
+"""Many read operations answered in one session and one snapshot.
+
+An agent exploring a symbol issues a string of small reads: definitions,
+node details, children, sources, callers. ``run_batch`` takes them as one
+list of ``{"op": ..., **arguments}`` entries, where ``op`` is the name of
+an MCP tool without its ``reason_`` prefix (see ``OPERATIONS``) and the
+arguments are that tool's. They all run on one connection inside one
+``REPEATABLE READ`` read-only transaction, so every result sees the same
+snapshot even while ingests commit.
+
+Independent lookups by id are coalesced before anything else runs: the
+nodes of every ``get_node``, tree navigation and call graph operation, the
+files of ``get_file`` and the runs of ``get_run`` are loaded with one
+query per table, and every ``get_source``/``get_sources`` slice goes
+through a single ``read_slices`` call. The remaining operations then run
+in request order. Results come back in request order, shaped like the
+matching tool's output; an operation that fails carries ``{"error": ...}``
+without failing the rest.
+"""
+import inspect
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+import orjson
+from pydantic import BaseModel, ConfigDict, ValidationError, create_model
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from .cache import result_cache, query_cache_key
+from .config import settings
+from .context import symbol_context
+from .graph import MAX_DEPTH, callers, callees, find_defs
+from .models import AstNode, Run, SourceFile
+from .query import (
+    query_nodes,
+    query_defs,
+    query_calls,
+    query_children,
+    query_descendants,
+    query_ancestors,
+    list_run_files,
+    list_project_files,
+    SUMMARY_COLUMNS,
+    MATCH_MODES,
+    RUN_STATE,
+)
+from .schemas import SourceSliceRequest
+from .serializers import serialize_summary_row, serialize_graph_row, serialize_node_detail, serialize_file, serialize_run
+from .source_slices import read_slices
+
+
+def cached_summaries(db: Session, fetch, run_id: int | None, **params) -> bytes:
+    """Summaries from ``fetch`` (``query_nodes`` etc.) as JSON, through the result cache."""
+    status = version = None
+    if result_cache.needs_status(run_id):
+        status, version = db.execute(RUN_STATE, {"run_id": run_id}).first() or (None, None)
+    tag = result_cache.tag_for(run_id, status)
+    key = query_cache_key("mcp:" + fetch.__name__, run_id=run_id, version=version, **params)
+    if tag is not None:
+        cached = result_cache.get(key, tag)
+        if cached is not None:
+            return cached
+    generation = result_cache.generation
+    out = orjson.dumps([serialize_summary_row(r) for r in fetch(db, run_id=run_id, columns=SUMMARY_COLUMNS, **params)])
+    if tag is not None:
+        result_cache.put(key, tag, out, generation)
+    return out
+
+
+@dataclass
+class _Batch:
+    db: Session
+    nodes: dict[int, AstNode] = field(default_factory=dict)
+    files: dict[int, SourceFile] = field(default_factory=dict)
+    runs: dict[int, Run] = field(default_factory=dict)
+    # read_slices results for all source operations, consumed in request order.
+    ranges: Iterator[dict] = iter(())
+    node_slices: Iterator[dict] = iter(())
+
+
+# ── operations ───────────────────────────────────────────────
+
+def _query(fetch, batch: _Batch, run_id: int | None, match: str, **params):
+    if match not in MATCH_MODES:
+        return {"error": f"Unsupported match mode: {match}"}
+    # Embedded as-is: cached pages are not decoded and re-encoded.
+    return orjson.Fragment(cached_summaries(batch.db, fetch, run_id, match=match, **params))
+
+
+def _query_nodes(
+    batch: _Batch,
+    kind: str | None = None,
+    name: str | None = None,
+    limit: int = 50,
+    run_id: int | None = None,
+    file_id: int | None = None,
+    project_id: int | None = None,
+    match: str = "exact",
+    ignore_case: bool = False,
+):
+    return _query(query_nodes, batch, run_id, match, kind=kind, name=name, limit=limit, file_id=file_id,
+                  project_id=project_id, ignore_case=ignore_case)
+
+
+def _query_defs(
+    batch: _Batch,
+    name: str | None = None,
+    limit: int = 50,
+    run_id: int | None = None,
+    file_id: int | None = None,
+    project_id: int | None = None,
+    match: str = "exact",
+    ignore_case: bool = False,
+):
+    return _query(query_defs, batch, run_id, match, name=name, limit=limit, file_id=file_id,
+                  project_id=project_id, ignore_case=ignore_case)
+
+
+def _query_calls(
+    batch: _Batch,
+    name: str | None = None,
+    limit: int = 50,
+    run_id: int | None = None,
+    file_id: int | None = None,
+    project_id: int | None = None,
+    match: str = "exact",
+    ignore_case: bool = False,
+):
+    return _query(query_calls, batch, run_id, match, name=name, limit=limit, file_id=file_id,
+                  project_id=project_id, ignore_case=ignore_case)
+
+
+def _get_node(batch: _Batch, node_id: int):
+    node = batch.nodes.get(node_id)
+    return serialize_node_detail(node) if node is not None else {"error": "node not found"}
+
+
+def _get_file(batch: _Batch, file_id: int):
+    f = batch.files.get(file_id)
+    return serialize_file(f) if f is not None else {"error": "file not found"}
+
+
+def _get_run(batch: _Batch, run_id: int):
+    run = batch.runs.get(run_id)
+    return serialize_run(run) if run is not None else {"error": "run not found"}
+
+
+def _get_children(batch: _Batch, node_id: int, limit: int = 200):
+    node = batch.nodes.get(node_id)
+    if node is None:
+        return {"error": "node not found"}
+    return [serialize_summary_row(r) for r in query_children(batch.db, node, limit=limit, columns=SUMMARY_COLUMNS)]
+
+
+def _get_descendants(batch: _Batch, node_id: int, kind: str | None = None, limit: int = 200):
+    node = batch.nodes.get(node_id)
+    if node is None:
+        return {"error": "node not found"}
+    rows = query_descendants(batch.db, node, kind=kind, limit=limit, columns=SUMMARY_COLUMNS)
+    return [serialize_summary_row(r) for r in rows]
+
+
+def _get_ancestors(batch: _Batch, node_id: int, kind: str | None = None):
+    node = batch.nodes.get(node_id)
+    if node is None:
+        return {"error": "node not found"}
+    return [serialize_summary_row(r) for r in query_ancestors(batch.db, node, kind=kind, columns=SUMMARY_COLUMNS)]
+
+
+def _graph(walk, batch: _Batch, node_id: int | None, name: str | None, run_id: int | None, depth: int, limit: int):
+    if node_id is None and not name:
+        return {"error": "node_id or name is required"}
+    start = [node_id] if node_id is not None else find_defs(batch.db, name, run_id)
+    rows = walk(batch.db, start, depth=max(1, min(depth, MAX_DEPTH)), limit=limit)
+    return [serialize_graph_row(r) for r in rows]
+
+
+def _callers(
+    batch: _Batch,
+    node_id: int | None = None,
+    name: str | None = None,
+    run_id: int | None = None,
+    depth: int = 3,
+    limit: int = 200,
+):
+    return _graph(callers, batch, node_id, name, run_id, depth, limit)
+
+
+def _callees(
+    batch: _Batch,
+    node_id: int | None = None,
+    name: str | None = None,
+    run_id: int | None = None,
+    depth: int = 3,
+    limit: int = 200,
+):
+    return _graph(callees, batch, node_id, name, run_id, depth, limit)
+
+
+def _get_source(batch: _Batch, path: str, start_byte: int, end_byte: int):
+    return next(batch.ranges)
+
+
+def _get_sources(batch: _Batch, slices: list[SourceSliceRequest] | None = None, node_ids: list[int] | None = None):
+    return [next(batch.ranges) for _ in slices or ()] + [next(batch.node_slices) for _ in node_ids or ()]
+
+
+def _symbol_context(
+    batch: _Batch,
+    name: str,
+    run_id: int | None = None,
+    project_id: int | None = None,
+    limit: int = 50,
+    max_bytes: int | None = None,
+):
+    return symbol_context(batch.db, name, run_id=run_id, project_id=project_id, limit=limit, max_bytes=max_bytes)
+
+
+def _list_run_files(batch: _Batch, run_id: int, limit: int = 200):
+    return [serialize_file(f) for f in list_run_files(batch.db, run_id=run_id, limit=limit)]
+
+
+def _list_project_files(batch: _Batch, project_id: int, limit: int = 200):
+    return [serialize_file(f) for f in list_project_files(batch.db, project_id=project_id, limit=limit)]
+
+
+OPERATIONS = {
+    "query_nodes": _query_nodes,
+    "query_defs": _query_defs,
+    "query_calls": _query_calls,
+    "get_node": _get_node,
+    "get_file": _get_file,
+    "get_run": _get_run,
+    "get_children": _get_children,
+    "get_descendants": _get_descendants,
+    "get_ancestors": _get_ancestors,
+    "callers": _callers,
+    "callees": _callees,
+    "get_source": _get_source,
+    "get_sources": _get_sources,
+    "list_run_files": _list_run_files,
+    "list_project_files": _list_project_files,
+    "symbol_context": _symbol_context,
+}
+
+# Operations whose node_id is loaded up front.
+_BY_NODE = {"get_node", "get_children", "get_descendants", "get_ancestors", "callers", "callees"}
+
+
+def _arguments_model(name: str, handler) -> type[BaseModel]:
+    params = list(inspect.signature(handler).parameters.values())[1:]
+    fields = {
+        p.name: (p.annotation, ... if p.default is inspect.Parameter.empty else p.default)
+        for p in params
+    }
+    return create_model(name, __config__=ConfigDict(extra="forbid"), **fields)
+
+
+_ARGUMENTS = {name: _arguments_model(name, handler) for name, handler in OPERATIONS.items()}
+
+
+# ── execution ────────────────────────────────────────────────
+
+def _parse(operation: Any) -> tuple[str, dict] | dict:
+    """``(op, validated arguments)``, or an error result."""
+    if not isinstance(operation, dict) or "op" not in operation:
+        return {"error": "each operation needs an op"}
+    arguments = dict(operation)
+    name = arguments.pop("op")
+    if name not in OPERATIONS:
+        return {"error": f"unknown op: {name}"}
+    try:
+        model = _ARGUMENTS[name].model_validate(arguments)
+    except ValidationError as exc:
+        problems = "; ".join(f"{'.'.join(map(str, e['loc'])) or 'arguments'}: {e['msg']}" for e in exc.errors())
+        return {"error": f"{name}: {problems}"}
+    return name, {k: getattr(model, k) for k in model.model_fields}
+
+
+def _prefetch(batch: _Batch, calls: list[tuple[str, dict]]) -> None:
+    node_ids, file_ids, run_ids = set(), set(), set()
+    ranges: list[tuple[str, int, int]] = []
+    slice_nodes: list[int] = []
+    for name, args in calls:
+        if name in _BY_NODE and args["node_id"] is not None:
+            node_ids.add(args["node_id"])
+        elif name == "get_file":
+            file_ids.add(args["file_id"])
+        elif name == "get_run":
+            run_ids.add(args["run_id"])
+        elif name == "get_source":
+            ranges.append((args["path"], args["start_byte"], args["end_byte"]))
+        elif name == "get_sources":
+            ranges.extend((s.path, s.start_byte, s.end_byte) for s in args["slices"] or ())
+            slice_nodes.extend(args["node_ids"] or ())
+
+    db = batch.db
+    if node_ids:
+        batch.nodes = {n.id: n for n in db.scalars(select(AstNode).where(AstNode.id.in_(node_ids)))}
+    if file_ids:
+        batch.files = {f.id: f for f in db.scalars(select(SourceFile).where(SourceFile.id.in_(file_ids)))}
+    if run_ids:
+        batch.runs = {r.id: r for r in db.scalars(select(Run).where(Run.id.in_(run_ids)))}
+    if ranges or slice_nodes:
+        out = read_slices(db, ranges, slice_nodes)
+        batch.ranges, batch.node_slices = iter(out[:len(ranges)]), iter(out[len(ranges):])
+
+
+def _begin_snapshot(db: Session) -> None:
+    """Start the session's transaction as a read-only REPEATABLE READ snapshot.
+
+    A session already inside a transaction keeps it as it is.
+    """
+    if db.in_transaction() or db.get_bind().dialect.name != "postgresql":
+        return
+    # The isolation level is reset when the connection goes back to the pool.
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    db.execute(text("SET TRANSACTION READ ONLY"))
+
+
+def run_batch(db: Session, operations: list) -> list:
+    """Results of ``operations`` in request order; see the module docstring.
+
+    The snapshot is only taken when ``db`` has not begun a transaction yet.
+    Raises ``ValueError`` for more than ``settings.batch_max_operations``
+    operations.
+    """
+    if len(operations) > settings.batch_max_operations:
+        raise ValueError(f"at most {settings.batch_max_operations} operations per batch")
+    parsed = [_parse(op) for op in operations]
+    calls = [p for p in parsed if isinstance(p, tuple)]
+    _begin_snapshot(db)
+    batch = _Batch(db)
+    _prefetch(batch, calls)
+    return [OPERATIONS[p[0]](batch, **p[1]) if isinstance(p, tuple) else p for p in parsed]
@@ -0,0 +1,75 @@
+"""Chunked compression for source snapshots.
+
+Content is split into fixed-size chunks that are compressed independently,
+so a slice only needs the chunks it overlaps. ``chunk_ends`` holds the
+cumulative end offset of each compressed chunk within ``data``.
+
+zstd is used when the ``zstandard`` package is installed, otherwise zlib.
+The codec is recorded per blob, so blobs written with either stay readable
+(zstd blobs require ``zstandard`` to read).
+
+This module is imported by parse pool workers and stays free of database
+imports.
+"""
+from __future__ import annotations
+import threading
+import zlib
+from dataclasses import dataclass
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+CHUNK_SIZE = 64 * 1024
+
+# Compressor objects are reusable but not thread-safe or picklable; keep
+# one per thread. Ingest jobs, inline parsing and the watcher compress from
+# several threads of one process at once.
+_ZSTD_LEVEL = 3
+_local = threading.local()
+
+
+@dataclass
+class Snapshot:
+    codec: str
+    size_bytes: int
+    chunk_size: int
+    chunk_ends: list[int]
+    data: bytes
+
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _compress_chunk(codec: str, chunk: bytes) -> bytes:
+    if codec == "zstd":
+        compressor = getattr(_local, "zstd", None)
+        if compressor is None:
+            compressor = _local.zstd = zstandard.ZstdCompressor(level=_ZSTD_LEVEL)
+        return compressor.compress(chunk)
+    if codec == "zlib":
+        return zlib.compress(chunk, 6)
+    raise ValueError(f"Unsupported snapshot codec: {codec}")
+
+
+def decompress_chunk(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd snapshot requires the zstandard package")
+        # Frames written by compress() carry their content size.
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Unsupported snapshot codec: {codec}")
+
+
+def compress(content: bytes, codec: str | None = None, chunk_size: int = CHUNK_SIZE) -> Snapshot:
+    codec = codec or default_codec()
+    out = bytearray()
+    ends = []
+    for pos in range(0, len(content), chunk_size):
+        out += _compress_chunk(codec, content[pos:pos + chunk_size])
+        ends.append(len(out))
+    return Snapshot(codec=codec, size_bytes=len(content), chunk_size=chunk_size, chunk_ends=ends, data=bytes(out))
@@ -0,0 +1,196 @@
+"""Result cache for repeated node queries.
+
+Keys are built from the normalized query parameters; values are the
+serialized response bytes. Each entry is tagged with what it depends on:
+
+- queries scoped to a finished run (completed, cancelled or failed) are
+  tagged with that run, and their keys carry its ``Run.version``. Other
+  runs' ingests leave these entries alone. A watcher rewriting the run
+  bumps the version, and deleting the run drops them. The run's status and
+  version are read by primary key on every lookup, so no process serves a
+  version another process has replaced.
+- queries across all runs are tagged ``*`` and dropped whenever any run
+  commits new rows, finishes or is deleted.
+
+Queries scoped to a run that is still being written are not cached.
+
+The local tier is an LRU bounded by entry count, with a TTL that also
+bounds staleness across processes. With ``CACHE_REDIS_URL`` set (requires
+the ``redis`` package), a shared tier sits behind it: shared keys embed a
+per-tag generation counter, and invalidation bumps the counter, so every
+process stops seeing the old entries at once.
+"""
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from .config import settings
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+FINAL_STATUSES = ("completed", "cancelled", "failed")
+# Tag of entries that span every run.
+ALL_RUNS = "*"
+
+_PREFIX = "reason:cache:"
+
+
+def query_cache_key(op: str, **params) -> str:
+    """Stable key for a query: unset parameters are dropped and case-insensitive names lowercased."""
+    if params.get("ignore_case") and params.get("name"):
+        params["name"] = params["name"].lower()
+    items = sorted((k, v) for k, v in params.items() if v is not None and v is not False)
+    return f"{op}?{urlencode(items)}"
+
+
+def run_tag(run_id: int | None) -> str:
+    return ALL_RUNS if run_id is None else f"run:{run_id}"
+
+
+class SharedTier:
+    """Redis-backed tier; entries are invalidated by bumping their tag's generation."""
+
+    def __init__(self, client, ttl: float):
+        self.client = client
+        self.ttl = max(1, int(ttl))
+
+    def get(self, key: str, tag: str) -> bytes | None:
+        # Value and generation in one round trip; a value written under an
+        # older generation is a miss.
+        gen, stored = self.client.mget(_PREFIX + "gen:" + tag, _PREFIX + key)
+        if stored is None:
+            return None
+        stored_gen, _, value = bytes(stored).partition(b":")
+        return value if stored_gen == (gen or b"0") else None
+
+    def put(self, key: str, tag: str, value: bytes) -> None:
+        gen = self.client.get(_PREFIX + "gen:" + tag) or b"0"
+        self.client.setex(_PREFIX + key, self.ttl, bytes(gen) + b":" + value)
+
+    def invalidate(self, tag: str) -> None:
+        self.client.incr(_PREFIX + "gen:" + tag)
+
+
+class ResultCache:
+    """In-process LRU with TTL and tag invalidation, plus an optional shared tier."""
+
+    def __init__(self, max_entries: int | None = None, ttl: float | None = None, shared: SharedTier | None = None):
+        self.max_entries = settings.cache_max_entries if max_entries is None else max_entries
+        self.ttl = settings.cache_ttl_seconds if ttl is None else ttl
+        self.shared = shared
+        self._entries: OrderedDict[str, tuple[float, str, bytes]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        # Bumped by every invalidation; a result computed across one is not stored.
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(("hits", "shared_hits", "misses", "stores", "evictions", "invalidations"), 0)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _drop(self, key: str) -> None:
+        _, tag, _ = self._entries.pop(key)
+        keys = self._tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def get(self, key: str, tag: str) -> bytes | None:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[2]
+                self._drop(key)
+        if self.shared is not None:
+            value = self.shared.get(key, tag)
+            if value is not None:
+                self._store(key, tag, value)
+                with self._lock:
+                    self._stats["shared_hits"] += 1
+                return value
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def _store(self, key: str, tag: str, value: bytes) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, tag, value)
+            self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def put(self, key: str, tag: str, value: bytes, generation: int | None = None) -> None:
+        """Store ``value``; skipped if an invalidation happened since ``generation`` was read."""
+        if not self.enabled or (generation is not None and generation != self.generation):
+            return
+        self._store(key, tag, value)
+        if self.shared is not None:
+            self.shared.put(key, tag, value)
+        with self._lock:
+            self._stats["stores"] += 1
+
+    def needs_status(self, run_id: int | None) -> bool:
+        """Whether ``tag_for`` needs the run's status, and the key its version, to decide."""
+        return self.enabled and run_id is not None
+
+    def tag_for(self, run_id: int | None, status: str | None = None) -> str | None:
+        """Tag for a query scoped to ``run_id``, or None if the query must not be cached."""
+        if not self.enabled:
+            return None
+        if run_id is None:
+            return ALL_RUNS
+        return run_tag(run_id) if status in FINAL_STATUSES else None
+
+    def invalidate_run(self, run_id: int, deleted: bool = False) -> None:
+        """Drop entries affected by new rows in ``run_id``, or by its deletion."""
+        tags = [ALL_RUNS, run_tag(run_id)] if deleted else [ALL_RUNS]
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+            self.generation += 1
+            self._stats["invalidations"] += 1
+        if self.shared is not None:
+            for tag in tags:
+                self.shared.invalidate(tag)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats, entries=len(self._entries), max_entries=self.max_entries)
+        lookups = out["hits"] + out["shared_hits"] + out["misses"]
+        out["hit_rate"] = (out["hits"] + out["shared_hits"]) / lookups if lookups else 0.0
+        out["shared"] = self.shared is not None
+        return out
+
+
+def _shared_tier() -> SharedTier | None:
+    if not settings.cache_redis_url:
+        return None
+    if redis is None:
+        raise RuntimeError("CACHE_REDIS_URL requires the redis package")
+    return SharedTier(redis.Redis.from_url(settings.cache_redis_url), settings.cache_ttl_seconds)
+
+
+result_cache = ResultCache(shared=_shared_tier())
@@ -0,0 +1,306 @@
+"""In-memory columnar snapshots of finished runs.
+
+A finished run's nodes change only when a watcher rewrites it in place
+(``app.watch``), which bumps ``Run.version``. A process that queries the
+same run repeatedly (typically the MCP server) can load it once into NumPy
+columns and answer ``query_nodes`` / ``query_defs`` / ``query_calls`` from
+memory, after checking the run's status and version by primary key. A
+snapshot of an older version, or of a run being deleted, is dropped rather
+than served. Rows are kept in id order, so results
+and keyset cursors match the SQL path exactly.
+
+Kinds, names and files are interned: each node stores small integer codes,
+plus int32 positions and its int64 id. Nodes are also sorted by name code
+into one index array with per-name offsets, so an exact name lookup is a
+dict lookup plus a slice. Prefix and substring matching scan the distinct
+names rather than the nodes. Fuzzy matching and streaming are not served
+here and fall back to Postgres, as does every run that is not loaded.
+
+Loaded runs are kept in a small LRU (``COLUMNAR_MAX_RUNS``); see the
+README for memory per million nodes. Requires ``numpy``.
+"""
+from __future__ import annotations
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from .cache import FINAL_STATUSES
+from .config import settings
+from .models import Run
+
+# Imported by the first load: most processes never load a run, and numpy
+# is one of the slower imports of the MCP server.
+np = None
+
+
+def _import_numpy() -> bool:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # pragma: no cover - optional dependency
+            return False
+        np = numpy
+    return True
+
+# Same fields and order as query.SUMMARY_COLUMNS rows.
+SummaryRow = namedtuple("SummaryRow", "id file_id kind name start_line start_col end_line end_col")
+
+# Rows scanned per step when filtering without a name, so small limits stop early.
+_SCAN_CHUNK = 65_536
+# Above this many matching names, filter nodes with one vectorized isin().
+_MAX_NAME_SLICES = 256
+
+# Distinct kinds or names of a run, from their lookup tables (app.symbols),
+# coded by their position in byte order.
+_LOOKUP_TABLES = {"kind": "node_kinds", "name": "symbols"}
+_DISTINCT_SQL = """
+SELECT t.id, t.{column} FROM {table} t
+WHERE t.id IN (SELECT n.{column}_id FROM ast_nodes n WHERE n.run_id = {run_id})
+"""
+_CODES_SQL = 'SELECT id, {column}, row_number() OVER (ORDER BY {column} COLLATE "C") - 1 AS code FROM ({distinct}) d'
+# Nodes with kinds and names already encoded (hash joins, no sorts), so only
+# integers cross the wire. Rows are put in id order after loading.
+_ROWS_SQL = """
+WITH kinds AS ({kinds}), names AS ({names})
+SELECT n.id, n.file_id, k.code, coalesce(m.code, -1), n.start_line, n.start_col, n.end_line, n.end_col
+FROM ast_nodes n
+JOIN kinds k ON k.id = n.kind_id
+LEFT JOIN names m ON m.id = n.name_id
+WHERE n.run_id = {run_id}
+"""
+
+
+class RunColumns:
+    def __init__(self, run_id: int, kinds: list[str], names: list[str], rows, version: int = 0):
+        """``rows`` is an (n, 8) integer array in id order: id, file_id, kind code,
+        name code (-1 if unnamed), start_line, start_col, end_line, end_col."""
+        self.run_id = run_id
+        self.version = version
+        self.kinds = kinds
+        self.names = names
+        self.ids = np.ascontiguousarray(rows[:, 0], dtype=np.int64)
+        self.file_ids, file_idx = np.unique(rows[:, 1], return_inverse=True)
+        self.file_idx = file_idx.astype(np.int32)
+        self.kind_code = rows[:, 2].astype(np.int16)
+        self.name_code = rows[:, 3].astype(np.int32)
+        self.positions = rows[:, 4:8].astype(np.int32)
+        self._kind_codes = {k: code for code, k in enumerate(kinds)}
+        self._name_codes = {n: code for code, n in enumerate(names)}
+        self._file_codes = {f: code for code, f in enumerate(self.file_ids.tolist())}
+
+        # Row indices grouped by name code (stable, so id order within a
+        # name); rows of code c are by_name[name_starts[c]:name_starts[c + 1]].
+        named = self.name_code >= 0
+        order = np.flatnonzero(named)
+        self.by_name = order[np.argsort(self.name_code[order], kind="stable")].astype(np.int32)
+        counts = np.bincount(self.name_code[named], minlength=len(self.names))
+        self.name_starts = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self._names_array = None
+        self._lower_names_array = None
+        self._lower_codes: dict[str, list[int]] | None = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held: arrays plus interned names and their lookup tables."""
+        arrays = [self.ids, self.file_idx, self.kind_code, self.name_code, self.positions, self.file_ids,
+                  self.by_name, self.name_starts, self._names_array, self._lower_names_array]
+        names = sum(sys.getsizeof(n) for n in self.names)
+        tables = sys.getsizeof(self.names) + sys.getsizeof(self._name_codes)
+        return sum(a.nbytes for a in arrays if a is not None) + names + tables
+
+    def _matching_names(self, name: str, match: str, ignore_case: bool):
+        if match == "exact" and not ignore_case:
+            code = self._name_codes.get(name)
+            return np.asarray([] if code is None else [code], dtype=np.int32)
+        if match == "exact":
+            if self._lower_codes is None:
+                lower: dict[str, list[int]] = {}
+                for code, n in enumerate(self.names):
+                    lower.setdefault(n.lower(), []).append(code)
+                self._lower_codes = lower
+            return np.asarray(self._lower_codes.get(name.lower(), []), dtype=np.int32)
+        if self._names_array is None:
+            self._names_array = np.asarray(self.names, dtype=np.str_)
+        names = self._names_array
+        if ignore_case:
+            if self._lower_names_array is None:
+                self._lower_names_array = np.char.lower(self._names_array)
+            names, name = self._lower_names_array, name.lower()
+        if match == "prefix":
+            hits = np.char.startswith(names, name)
+        else:
+            hits = np.char.find(names, name) >= 0
+        return np.flatnonzero(hits).astype(np.int32)
+
+    def _rows_for_names(self, codes):
+        if len(codes) > _MAX_NAME_SLICES:
+            return np.flatnonzero(np.isin(self.name_code, codes))
+        starts, by_name = self.name_starts, self.by_name
+        parts = [by_name[starts[c]:starts[c + 1]] for c in codes]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate(parts)
+        return np.sort(rows) if len(parts) > 1 else rows
+
+    def query(
+        self,
+        kind: str | None = None,
+        name: str | None = None,
+        limit: int | None = 50,
+        kinds: list[str] | None = None,
+        file_id: int | None = None,
+        after_id: int | None = None,
+        match: str = "exact",
+        ignore_case: bool = False,
+    ) -> list[SummaryRow] | None:
+        """Summary rows like ``query_nodes(..., columns=SUMMARY_COLUMNS)``; None if not servable here."""
+        if name and match == "fuzzy":
+            return None
+        kind_filter = None
+        wanted = kinds or ([kind] if kind else None)
+        if wanted:
+            kind_filter = np.asarray([self._kind_codes[k] for k in wanted if k in self._kind_codes], dtype=np.int16)
+            if not len(kind_filter):
+                return []
+        file_filter = None
+        if file_id is not None:
+            file_filter = self._file_codes.get(file_id)
+            if file_filter is None:
+                return []
+        start = 0 if after_id is None else int(np.searchsorted(self.ids, after_id, side="right"))
+
+        def keep(rows):
+            mask = np.ones(len(rows), dtype=bool)
+            if kind_filter is not None:
+                mask &= np.isin(self.kind_code[rows], kind_filter)
+            if file_filter is not None:
+                mask &= self.file_idx[rows] == file_filter
+            return rows[mask]
+
+        if name:
+            rows = self._rows_for_names(self._matching_names(name, match, ignore_case))
+            rows = keep(rows[np.searchsorted(rows, start):])
+            if limit is not None:
+                rows = rows[:limit]
+        else:
+            found, total, pos = [], 0, start
+            while pos < len(self.ids) and (limit is None or total < limit):
+                rows = keep(np.arange(pos, min(pos + _SCAN_CHUNK, len(self.ids))))
+                found.append(rows)
+                total += len(rows)
+                pos += _SCAN_CHUNK
+            rows = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+            if limit is not None:
+                rows = rows[:limit]
+        return self._summaries(rows)
+
+    def _summaries(self, rows) -> list[SummaryRow]:
+        kinds, names = self.kinds, self.names
+        ids = self.ids[rows].tolist()
+        files = self.file_ids[self.file_idx[rows]].tolist()
+        kind_codes = self.kind_code[rows].tolist()
+        name_codes = self.name_code[rows].tolist()
+        positions = self.positions[rows].tolist()
+        return [
+            SummaryRow(i, f, kinds[k], names[n] if n >= 0 else None, *pos)
+            for i, f, k, n, pos in zip(ids, files, kind_codes, name_codes, positions)
+        ]
+
+
+def _code_tables(run_id: int) -> dict[str, str]:
+    return {
+        c: _CODES_SQL.format(column=c, distinct=_DISTINCT_SQL.format(column=c, table=table, run_id=int(run_id)))
+        for c, table in _LOOKUP_TABLES.items()
+    }
+
+
+def _fetch_rows(db: Session, run_id: int):
+    codes = _code_tables(run_id)
+    sql = _ROWS_SQL.format(kinds=codes["kind"], names=codes["name"], run_id=int(run_id))
+    if db.get_bind().dialect.driver == "psycopg":
+        # COPY text output parsed in one vectorized call; far faster than
+        # building a Python tuple per row.
+        buf = bytearray()
+        cur = db.connection().connection.driver_connection.cursor()
+        with cur.copy(f"COPY ({sql}) TO STDOUT") as copy:
+            for block in copy:
+                buf += block
+        values = np.fromstring(bytes(buf), dtype=np.int64, sep=" ") if buf else np.empty(0, dtype=np.int64)
+    else:
+        values = np.asarray(db.execute(text(sql)).all(), dtype=np.int64)
+    rows = values.reshape(-1, 8)
+    return rows[np.argsort(rows[:, 0], kind="stable")]
+
+
+class ColumnarStore:
+    """Loaded runs, least recently used evicted beyond ``max_runs``."""
+
+    def __init__(self, max_runs: int | None = None):
+        self.max_runs = settings.columnar_max_runs if max_runs is None else max_runs
+        self._runs: OrderedDict[int, RunColumns] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, db: Session, run_id: int) -> RunColumns:
+        """Load a finished run; raises LookupError if missing, ValueError if still running."""
+        if not _import_numpy():
+            raise RuntimeError("columnar snapshots require the numpy package")
+        # Read before the rows: if a watcher rewrites the run in between,
+        # the snapshot is stamped older than its rows and is merely reloaded.
+        state = db.execute(select(Run.status, Run.version).where(Run.id == run_id)).first()
+        if state is None:
+            raise LookupError(f"run {run_id} not found")
+        if state.status not in FINAL_STATUSES:
+            raise ValueError(f"run {run_id} is {state.status}; only finished runs can be loaded")
+        kinds, names = (
+            db.execute(text(f"SELECT {c} FROM ({sql}) c ORDER BY code")).scalars().all()
+            for c, sql in _code_tables(run_id).items()
+        )
+        columns = RunColumns(run_id, kinds, names, _fetch_rows(db, run_id), state.version)
+        with self._lock:
+            self._runs[run_id] = columns
+            self._runs.move_to_end(run_id)
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+        return columns
+
+    def __contains__(self, run_id: int | None) -> bool:
+        with self._lock:
+            return run_id in self._runs
+
+    def get(self, run_id: int, version: int | None) -> RunColumns | None:
+        """The run's snapshot if it was loaded at ``version``, the run's current
+        ``Run.version``. A snapshot of any other version is dropped, and so is
+        the run's snapshot when ``version`` is None (the run is being deleted
+        or gone)."""
+        with self._lock:
+            columns = self._runs.get(run_id)
+            if columns is None:
+                return None
+            if version is None or columns.version != version:
+                del self._runs[run_id]
+                return None
+            self._runs.move_to_end(run_id)
+            return columns
+
+    def drop(self, run_id: int) -> bool:
+        with self._lock:
+            return self._runs.pop(run_id, None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._runs.clear()
+
+    def loaded(self) -> list[dict]:
+        with self._lock:
+            runs = list(self._runs.values())
+        return [{"run_id": c.run_id, "nodes": len(c), "names": len(c.names), "bytes": c.nbytes} for c in runs]
+
+
+columnar_store = ColumnarStore()
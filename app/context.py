@@ -0,0 +1,157 @@
+"""What an agent usually needs about a symbol, in one response.
+
+``symbol_context`` resolves a name to its definitions and returns each with
+its source, plus the symbol's call sites (each with its innermost enclosing
+definition and its line of source), the names its definitions call and
+the imports of the files that define them. That replaces a chain of
+``query_defs``, ``get_node``, ``get_source`` and ``query_calls`` calls,
+and costs a fixed handful of set-based queries however many definitions
+and call sites there are: definitions, call sites with their callers (one
+lateral lookup over ``(file_id, pre)``), call edges, imports, and one
+batched read for all source text.
+
+Source text is capped by ``max_bytes``. Definition bodies are filled first,
+in id order, then call-site lines; a body that does not fit is cut and
+flagged ``truncated``, and call sites past the budget come without
+``line``. The top-level ``truncated`` says whether anything was left out.
+"""
+from sqlalchemy import func, select, true
+from sqlalchemy.orm import Session, aliased
+
+from .ast_extract import DEF_KINDS, IMPORT_KINDS
+from .config import settings
+from .models import AstNode, CallEdge, SourceFile
+from .query import latest_files
+from .serializers import serialize_node_detail, serialize_summary_row
+from .source_slices import read_ingested
+
+# Bytes read after the start of a call site's line to find its end.
+LINE_BYTES = 240
+
+_Call = aliased(AstNode, name="call")
+_Def = aliased(AstNode, name="enclosing")
+
+
+def _scoped(stmt, node, run_id: int | None, project_id: int | None):
+    if run_id is not None:
+        # Filtering the node rather than its file lets Postgres read only the run's partition.
+        stmt = stmt.where(node.run_id == run_id)
+    if project_id is not None:
+        stmt = stmt.where(SourceFile.id.in_(latest_files(project_id)))
+    return stmt
+
+
+def _read_error(path: str, exc: OSError) -> str:
+    return f"file not found: {path}" if isinstance(exc, FileNotFoundError) else str(exc)
+
+
+def symbol_context(
+    db: Session,
+    name: str,
+    run_id: int | None = None,
+    project_id: int | None = None,
+    limit: int = 50,
+    max_bytes: int | None = None,
+) -> dict:
+    """Definitions, call sites, callees and imports of ``name``; see the module docstring.
+
+    ``limit`` caps each list. Without ``run_id`` or ``project_id`` every
+    run is searched.
+    """
+    budget = settings.context_max_bytes if max_bytes is None else max_bytes
+    defs = db.execute(
+        _scoped(select(AstNode, SourceFile.path, SourceFile.content_hash).join(SourceFile), AstNode, run_id,
+                project_id)
+        .where(AstNode.name == name, AstNode.kind.in_(DEF_KINDS))
+        .order_by(AstNode.id)
+        .limit(limit)
+    ).all()
+
+    # Innermost definition whose subtree holds the call, as in query_ancestors.
+    enclosing = (
+        # Interned columns of an alias need labels to be read off the subquery.
+        select(_Def.id, _Def.kind.label("kind"), _Def.name.label("name"))
+        .where(_Def.run_id == _Call.run_id, _Def.file_id == _Call.file_id, _Def.pre < _Call.pre, _Def.post >= _Call.pre,
+               _Def.kind.in_(DEF_KINDS))
+        .order_by(_Def.depth.desc())
+        .limit(1)
+        .lateral()
+    )
+    sites = db.execute(
+        _scoped(
+            select(_Call.id, _Call.file_id, _Call.kind, _Call.name, _Call.start_line, _Call.start_col,
+                   _Call.end_line, _Call.end_col, _Call.start_byte, SourceFile.path, SourceFile.content_hash,
+                   enclosing.c.id, enclosing.c.kind, enclosing.c.name)
+            .join(SourceFile, SourceFile.id == _Call.file_id)
+            .outerjoin(enclosing, true()),
+            _Call, run_id, project_id,
+        )
+        .where(_Call.name == name, _Call.kind == "call_expression")
+        .order_by(_Call.id)
+        .limit(limit)
+    ).all()
+
+    # Names called from the definitions, with the definition each resolved
+    # to when it was unambiguous (see app.graph).
+    called = db.execute(
+        select(CallEdge.callee_name, func.min(CallEdge.callee_id))
+        .where(CallEdge.caller_id.in_([node.id for node, _, _ in defs]))
+        .group_by(CallEdge.callee_name)
+        .order_by(CallEdge.callee_name)
+        .limit(limit)
+    ).all() if defs else []
+    imports = db.execute(
+        select(AstNode.id, AstNode.file_id, AstNode.kind, AstNode.name, AstNode.start_line, AstNode.start_col,
+               AstNode.end_line, AstNode.end_col, AstNode.meta)
+        .where(AstNode.file_id.in_({node.file_id for node, _, _ in defs}), AstNode.kind.in_(IMPORT_KINDS))
+        .order_by(AstNode.id)
+        .limit(limit)
+    ).all() if defs else []
+
+    # Bodies take the budget first; the rest goes to call-site lines.
+    truncated = False
+    ranges = []
+    for node, path, content_hash in defs:
+        end = min(node.end_byte, node.start_byte + budget)
+        truncated |= end < node.end_byte
+        budget -= end - node.start_byte
+        ranges.append((path, content_hash, node.start_byte, end))
+    for row in sites:
+        line_start = row.start_byte - row.start_col
+        ranges.append((row.path, row.content_hash, line_start, line_start + LINE_BYTES))
+    texts = read_ingested(db, ranges)
+
+    definitions = []
+    for (node, path, _), (_, _, _, end), text in zip(defs, ranges, texts):
+        out = {**serialize_node_detail(node), "path": path, "truncated": end < node.end_byte}
+        if isinstance(text, OSError):
+            out["error"] = _read_error(path, text)
+        else:
+            out["text"] = text
+        definitions.append(out)
+
+    call_sites = []
+    for row, text in zip(sites, texts[len(defs):]):
+        out = serialize_summary_row(row[:8])
+        out["path"] = row.path
+        out["caller"] = {"id": row[11], "kind": row[12], "name": row[13]} if row[11] is not None else None
+        if isinstance(text, OSError):
+            out["error"] = _read_error(row.path, text)
+        else:
+            line = text.split("\n", 1)[0].strip()
+            size = len(line.encode())
+            if size <= budget:
+                out["line"] = line
+                budget -= size
+            else:
+                truncated = True
+        call_sites.append(out)
+
+    return {
+        "name": name,
+        "definitions": definitions,
+        "call_sites": call_sites,
+        "callees": [{"name": callee, "id": callee_id} for callee, callee_id in called],
+        "imports": [{**serialize_summary_row(r[:8]), "meta": r[8]} for r in imports],
+        "truncated": truncated,
+    }
@@ -0,0 +1,210 @@
+"""Compact binary encoding for tree-sitter concrete syntax trees.
+
+Layout (all integers are unsigned LEB128 varints)::
+
+    b"CST1"
+    type_count, then type_count x (byte_len, utf-8 bytes)   -- node-type dictionary
+    node_count, then node_count x record                    -- nodes in pre-order
+
+    record = (type_id << 1 | is_named), start_delta, length, child_count
+
+``start_delta`` is relative to the previous node's start byte (pre-order
+starts never decrease), so typical records take 4-6 bytes against hundreds
+for the equivalent sexp text. Point (row/column) information is not kept;
+byte offsets index straight into the stored source.
+
+``CstTree`` decodes lazily: the header is parsed on construction, node
+records on first access, and ``CstNode`` views are created only for the
+nodes that are actually visited.
+"""
+from __future__ import annotations
+from array import array
+
+MAGIC = b"CST1"
+
+
+def _put_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def encode_tree(tree) -> bytes:
+    """Encode a tree-sitter ``Tree`` by iterating a ``TreeCursor`` in pre-order."""
+    types: dict[str, int] = {}
+    body = bytearray()
+    append = body.append
+    count = 0
+    prev_start = 0
+
+    cursor = tree.walk()
+    while True:
+        node = cursor.node
+        kind = node.type
+        type_id = types.get(kind)
+        if type_id is None:
+            type_id = types[kind] = len(types)
+        start = node.start_byte
+        # Most fields fit in one byte; only fall back to the loop when not.
+        for value in (type_id << 1 | node.is_named, start - prev_start, node.end_byte - start, node.child_count):
+            if value < 0x80:
+                append(value)
+            else:
+                _put_varint(body, value)
+        prev_start = start
+        count += 1
+
+        if cursor.goto_first_child():
+            continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                break
+        else:
+            continue
+        break
+
+    out = bytearray(MAGIC)
+    _put_varint(out, len(types))
+    for name in types:
+        raw = name.encode("utf-8")
+        _put_varint(out, len(raw))
+        out += raw
+    _put_varint(out, count)
+    out += body
+    return bytes(out)
+
+
+class CstNode:
+    __slots__ = ("_tree", "_idx")
+
+    def __init__(self, tree: CstTree, idx: int):
+        self._tree = tree
+        self._idx = idx
+
+    @property
+    def type(self) -> str:
+        return self._tree.types[self._tree._type_ids[self._idx]]
+
+    @property
+    def is_named(self) -> bool:
+        return bool(self._tree._named[self._idx])
+
+    @property
+    def start_byte(self) -> int:
+        return self._tree._starts[self._idx]
+
+    @property
+    def end_byte(self) -> int:
+        return self._tree._starts[self._idx] + self._tree._lengths[self._idx]
+
+    @property
+    def child_count(self) -> int:
+        return self._tree._child_counts[self._idx]
+
+    @property
+    def children(self) -> list[CstNode]:
+        tree = self._tree
+        out = []
+        child = self._idx + 1
+        for _ in range(tree._child_counts[self._idx]):
+            out.append(CstNode(tree, child))
+            child = tree._ends[child]
+        return out
+
+    @property
+    def parent(self) -> CstNode | None:
+        parent = self._tree._parents[self._idx]
+        return CstNode(self._tree, parent) if parent >= 0 else None
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, CstNode) and other._tree is self._tree and other._idx == self._idx
+
+    def __hash__(self) -> int:
+        return hash((id(self._tree), self._idx))
+
+    def __repr__(self) -> str:
+        return f"<CstNode {self.type} [{self.start_byte}, {self.end_byte})>"
+
+
+class CstTree:
+    """Navigable view over bytes produced by ``encode_tree``."""
+
+    def __init__(self, data: bytes):
+        if data[:4] != MAGIC:
+            raise ValueError("not an encoded CST")
+        self._data = data
+        pos = 4
+        type_count, pos = _get_varint(data, pos)
+        types = []
+        for _ in range(type_count):
+            n, pos = _get_varint(data, pos)
+            types.append(data[pos:pos + n].decode("utf-8"))
+            pos += n
+        self.types = types
+        self.node_count, self._body = _get_varint(data, pos)
+        self._decoded = False
+
+    def _decode(self) -> None:
+        data = self._data
+        count = self.node_count
+        type_ids = array("I", bytes(4 * count))
+        named = bytearray(count)
+        starts = array("q", bytes(8 * count))
+        lengths = array("q", bytes(8 * count))
+        child_counts = array("I", bytes(4 * count))
+        parents = array("q", bytes(8 * count))
+        ends = array("q", bytes(8 * count))
+
+        # Stack of [node idx, children still to visit]; a node's subtree ends
+        # when its last child's subtree does.
+        stack: list[list[int]] = []
+        pos = self._body
+        start = 0
+        for i in range(count):
+            tagged, pos = _get_varint(data, pos)
+            delta, pos = _get_varint(data, pos)
+            length, pos = _get_varint(data, pos)
+            children, pos = _get_varint(data, pos)
+            start += delta
+            type_ids[i] = tagged >> 1
+            named[i] = tagged & 1
+            starts[i] = start
+            lengths[i] = length
+            child_counts[i] = children
+            parents[i] = stack[-1][0] if stack else -1
+            if stack:
+                stack[-1][1] -= 1
+            if children:
+                stack.append([i, children])
+            else:
+                ends[i] = i + 1
+                while stack and stack[-1][1] == 0:
+                    ends[stack.pop()[0]] = i + 1
+
+        self._type_ids = type_ids
+        self._named = named
+        self._starts = starts
+        self._lengths = lengths
+        self._child_counts = child_counts
+        self._parents = parents
+        self._ends = ends
+        self._decoded = True
+
+    @property
+    def root_node(self) -> CstNode:
+        if not self._decoded:
+            self._decode()
+        return CstNode(self, 0)
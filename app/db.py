@@ -1,9 +1,97 @@
+import functools
+import itertools
+import threading
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from .config import settings
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def _once(fn):
+    """Call ``fn`` on first use only, even when several threads get there at once."""
+    lock = threading.Lock()
+    result = []
+
+    @functools.wraps(fn)
+    def wrapper():
+        if not result:
+            with lock:
+                if not result:
+                    result.append(fn())
+        return result[0]
+
+    return wrapper
+
+
+def round_robin(factory, engines):
+    """Session factory that binds each new session to the next of ``engines``.
+
+    ``engines`` is a list, or a callable returning one on the first session.
+    """
+    binds = None
+
+    def make_session(**kw):
+        nonlocal binds
+        if binds is None:
+            binds = itertools.cycle(engines() if callable(engines) else engines)
+        return factory(bind=next(binds), **kw)
+
+    return make_session
+
+
+def lazy_bind(factory, engine):
+    """Session factory that binds to ``engine()`` unless given a ``bind``."""
+
+    def make_session(**kw):
+        kw.setdefault("bind", engine())
+        return factory(**kw)
+
+    return make_session
+
+
+# Engines are created on the first session, not at import: creating one
+# loads the driver, and a process that never queries (the MCP server up to
+# its first tool call, alembic, the CLI's --help) should not pay for it.
+@_once
+def get_engine():
+    return create_engine(settings.database_url, **_pool_options())
+
+
+# Read endpoints run on the event loop through psycopg's async mode; the
+# same URL works for both engines.
+@_once
+def get_async_engine():
+    return create_async_engine(settings.database_url, **_pool_options())
+
+
+# Query and lookup traffic goes to the read replicas, one per session in
+# turn; ingest, jobs and run status stay on the primary. Without replicas
+# reads use the primary too.
+@_once
+def get_replica_engines() -> list:
+    return [create_engine(url, **_pool_options()) for url in settings.database_replica_urls] or [get_engine()]
+
+
+@_once
+def get_async_replica_engines() -> list:
+    return ([create_async_engine(url, **_pool_options()) for url in settings.database_replica_urls]
+            or [get_async_engine()])
+
+
+SessionLocal = lazy_bind(sessionmaker(autoflush=False, autocommit=False), get_engine)
+AsyncSessionLocal = lazy_bind(async_sessionmaker(autoflush=False, expire_on_commit=False), get_async_engine)
+ReadSessionLocal = round_robin(SessionLocal, get_replica_engines)
+AsyncReadSessionLocal = round_robin(AsyncSessionLocal, get_async_replica_engines)
 
 class Base(DeclarativeBase):
     pass
@@ -0,0 +1,202 @@
+"""Server-side source discovery for directory ingests.
+
+``iter_source_files`` walks a tree with ``os.scandir`` (no recursion, sorted
+per directory so runs are reproducible) and yields ``(path, language)`` as
+files are found, so the parse stage can start before the walk finishes.
+``.gitignore`` files are honored per directory; include/exclude globs use the
+same matching rules, relative to the walk root. ``source_language`` applies
+the same rules to a single path, for callers that learn about files one at
+a time (``app.watch``).
+"""
+from __future__ import annotations
+import os
+import re
+from typing import Iterable, Iterator
+
+from .treesitter import LANG_MAP, language_for_path
+
+# Never descended into, regardless of ignore files.
+_ALWAYS_SKIP = {".git", ".hg", ".svn"}
+
+
+def _glob_to_regex(pattern: str) -> str:
+    out = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            out.append("(?:/.*)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:j]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j + 1
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class _Pattern:
+    """One gitignore-style pattern, matched against paths relative to ``base``."""
+
+    __slots__ = ("negated", "dir_only", "regex")
+
+    def __init__(self, pattern: str):
+        self.negated = pattern.startswith("!")
+        if self.negated:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        # Patterns without an inner slash match at any depth.
+        if "/" not in pattern:
+            pattern = "**/" + pattern
+        self.regex = re.compile(_glob_to_regex(pattern.lstrip("/")) + r"\Z")
+
+    def matches(self, rel: str, is_dir: bool) -> bool:
+        return (is_dir or not self.dir_only) and self.regex.match(rel) is not None
+
+
+class _PatternSet:
+    def __init__(self, base: str, patterns: Iterable[str]):
+        self.base = base
+        self.patterns = [_Pattern(p) for p in patterns]
+
+    @classmethod
+    def from_gitignore(cls, directory: str) -> _PatternSet | None:
+        try:
+            with open(os.path.join(directory, ".gitignore"), encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return None
+        patterns = [ln.rstrip() for ln in lines if ln.strip() and not ln.startswith("#")]
+        return cls(directory, patterns) if patterns else None
+
+    def match(self, path: str, is_dir: bool) -> bool | None:
+        """True if ignored, False if re-included by ``!``, None if no pattern applies."""
+        rel = os.path.relpath(path, self.base).replace(os.sep, "/")
+        result = None
+        for p in self.patterns:
+            if p.matches(rel, is_dir):
+                result = not p.negated
+        return result
+
+
+def _ignored(rules: list[_PatternSet], path: str, is_dir: bool) -> bool:
+    ignored = False
+    for rule in rules:
+        m = rule.match(path, is_dir)
+        if m is not None:
+            ignored = m
+    return ignored
+
+
+def iter_source_files(
+    root_path: str,
+    language: str | None = None,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+) -> Iterator[tuple[str, str]]:
+    """Yield ``(path, language)`` for every supported source file under ``root_path``.
+
+    Files are kept when their extension maps to a known language (restricted
+    to ``language``'s grammar when given), they match at least one
+    ``include`` glob (if any), and neither ``exclude`` nor a ``.gitignore``
+    ignores them. Directory symlinks are not followed.
+    """
+    root_path = os.path.abspath(root_path)
+    if not os.path.isdir(root_path):
+        raise ValueError(f"Not a directory: {root_path}")
+    grammar = LANG_MAP.get(language.lower()) if language else None
+    if language and not grammar:
+        raise ValueError(f"Unsupported language: {language}")
+    includes = _PatternSet(root_path, include) if include else None
+    excludes = [_PatternSet(root_path, exclude)] if exclude else []
+
+    stack: list[tuple[str, list[_PatternSet]]] = [(root_path, excludes)]
+    while stack:
+        directory, rules = stack.pop()
+        gitignore = _PatternSet.from_gitignore(directory)
+        if gitignore is not None:
+            rules = rules + [gitignore]
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in _ALWAYS_SKIP and not _ignored(rules, entry.path, True):
+                    subdirs.append((entry.path, rules))
+                continue
+            if not entry.is_file():
+                continue
+            file_language = language_for_path(entry.name)
+            if file_language is None or (grammar and LANG_MAP[file_language] != grammar):
+                continue
+            if includes is not None and not includes.match(entry.path, False):
+                continue
+            if _ignored(rules, entry.path, False):
+                continue
+            yield entry.path, language or file_language
+        # Reverse so the stack pops subdirectories in sorted order.
+        stack.extend(reversed(subdirs))
+
+
+def source_language(
+    root_path: str,
+    path: str,
+    language: str | None = None,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+) -> str | None:
+    """The language ``iter_source_files`` would yield ``path`` with, or None if it would skip it."""
+    root_path = os.path.abspath(root_path)
+    path = os.path.abspath(path)
+    rel = os.path.relpath(path, root_path)
+    if rel == "." or rel.startswith(os.pardir + os.sep) or not os.path.isfile(path):
+        return None
+    grammar = LANG_MAP.get(language.lower()) if language else None
+    if language and not grammar:
+        raise ValueError(f"Unsupported language: {language}")
+    file_language = language_for_path(path)
+    if file_language is None or (grammar and LANG_MAP[file_language] != grammar):
+        return None
+    if include and not _PatternSet(root_path, include).match(path, False):
+        return None
+
+    rules = [_PatternSet(root_path, exclude)] if exclude else []
+    directory = root_path
+    for part in rel.split(os.sep):
+        gitignore = _PatternSet.from_gitignore(directory)
+        if gitignore is not None:
+            rules = rules + [gitignore]
+        entry = os.path.join(directory, part)
+        if entry == path:
+            break
+        if part in _ALWAYS_SKIP or os.path.islink(entry) or _ignored(rules, entry, True):
+            return None
+        directory = entry
+    return None if _ignored(rules, path, False) else language or file_language
@@ -0,0 +1,174 @@
+"""Call graph built from ``call_edges``.
+
+Ingest records one edge per named call inside a definition. When a run
+finishes, ``resolve_callees`` points each edge at the definition it calls if
+the name is unambiguous: a single definition of that name in the caller's
+file, otherwise a single one in the run. Ambiguous edges (typically method
+calls such as ``self.render()``) keep ``callee_id`` NULL and are followed by
+name within the run, so traversals over-approximate rather than miss calls.
+
+``callers`` and ``callees`` walk the graph in one recursive CTE each,
+returning every definition reached with the depth it was first reached at.
+"""
+from __future__ import annotations
+from collections import defaultdict
+from typing import Iterable
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from .ast_extract import DEF_KINDS
+from .models import AstNode, CallEdge
+
+# Upper bound on traversal depth accepted by the API.
+MAX_DEPTH = 10
+
+_RESOLVE_CALLEES_SQL = text("""
+WITH defs AS MATERIALIZED (
+    SELECT n.id, s.name, n.file_id
+    FROM ast_nodes n JOIN symbols s ON s.id = n.name_id
+    WHERE n.run_id = :run_id AND n.kind_id IN (SELECT id FROM node_kinds WHERE kind = ANY(:kinds))
+),
+same_file AS (
+    SELECT file_id, name, min(id) AS id FROM defs GROUP BY file_id, name HAVING count(*) = 1
+),
+same_run AS (
+    SELECT name, min(id) AS id FROM defs GROUP BY name HAVING count(*) = 1
+),
+resolved AS (
+    SELECT e.id AS edge_id, COALESCE(sf.id, sr.id) AS callee_id
+    FROM call_edges e
+    LEFT JOIN same_file sf ON sf.file_id = e.file_id AND sf.name = e.callee_name
+    LEFT JOIN same_run sr ON sr.name = e.callee_name
+    WHERE e.run_id = :run_id
+)
+UPDATE call_edges e SET callee_id = r.callee_id
+FROM resolved r
+WHERE e.id = r.edge_id AND r.callee_id IS NOT NULL
+""")
+
+_SET_CALLEES_SQL = text("""
+UPDATE call_edges e SET callee_id = v.callee_id
+FROM unnest(CAST(:ids AS bigint[]), CAST(:callee_ids AS bigint[])) AS v(id, callee_id)
+WHERE e.id = v.id
+""")
+
+# Both walks start from the :start definitions at depth 0 and select the
+# reached definitions as summary rows plus depth. UNION drops repeated
+# (node, depth) rows, so cycles cost at most one row per node per level.
+# An edge's nodes are in its run's partition; joining on run_id as well
+# lets each lookup skip the other partitions.
+_SUMMARY_SQL = """
+SELECT n.id, n.file_id, k.kind, s.name, n.start_line, n.start_col, n.end_line, n.end_col, r.depth
+FROM (SELECT id, run_id, min(depth) AS depth FROM walk WHERE depth > 0 GROUP BY id, run_id) r
+JOIN ast_nodes n ON n.id = r.id AND n.run_id = r.run_id
+JOIN node_kinds k ON k.id = n.kind_id
+LEFT JOIN symbols s ON s.id = n.name_id
+ORDER BY r.depth, n.id
+LIMIT :limit
+"""
+
+_CALLERS_SQL = text("""
+WITH RECURSIVE walk(id, name, run_id, depth) AS (
+    SELECT n.id, s.name, n.run_id, 0
+    FROM ast_nodes n LEFT JOIN symbols s ON s.id = n.name_id
+    WHERE n.id = ANY(:start)
+    UNION
+    SELECT c.id, s.name, w.run_id, w.depth + 1
+    FROM walk w
+    JOIN call_edges e
+      ON e.callee_id = w.id
+      OR (e.callee_id IS NULL AND e.run_id = w.run_id AND e.callee_name = w.name)
+    JOIN ast_nodes c ON c.id = e.caller_id AND c.run_id = e.run_id
+    LEFT JOIN symbols s ON s.id = c.name_id
+    WHERE w.depth < :depth
+)
+""" + _SUMMARY_SQL)
+
+_CALLEES_SQL = text("""
+WITH RECURSIVE walk(id, run_id, depth) AS (
+    SELECT n.id, n.run_id, 0
+    FROM ast_nodes n
+    WHERE n.id = ANY(:start)
+    UNION
+    SELECT t.id, w.run_id, w.depth + 1
+    FROM walk w
+    JOIN call_edges e ON e.caller_id = w.id
+    CROSS JOIN LATERAL (
+        SELECT e.callee_id AS id WHERE e.callee_id IS NOT NULL
+        UNION ALL
+        SELECT d.id
+        FROM ast_nodes d
+        WHERE e.callee_id IS NULL AND d.run_id = w.run_id
+          AND d.name_id = (SELECT id FROM symbols WHERE name = e.callee_name)
+          AND d.kind_id IN (SELECT id FROM node_kinds WHERE kind = ANY(:kinds))
+    ) t
+    WHERE w.depth < :depth
+)
+""" + _SUMMARY_SQL)
+
+
+def resolve_callees(db: Session, run_id: int, names: Iterable[str] | None = None) -> None:
+    """Set ``callee_id`` on the run's edges whose callee name is unambiguous.
+
+    With ``names``, only edges calling those names are resolved again, from
+    scratch: after files of a finished run are replaced (``app.watch``),
+    pass every definition name they had or have, plus the names their new
+    edges call. That path resolves in Python from two indexed lookups; the
+    set-based statement's plan degrades badly when the planner's estimates
+    for a single run are off.
+    """
+    if names is None:
+        db.execute(_RESOLVE_CALLEES_SQL, {"run_id": run_id, "kinds": DEF_KINDS})
+        return
+    names = sorted(set(names))
+    if not names:
+        return
+    defs = db.execute(
+        select(AstNode.id, AstNode.name, AstNode.file_id)
+        .where(AstNode.run_id == run_id, AstNode.kind.in_(DEF_KINDS), AstNode.name.in_(names))
+    ).all()
+    by_file: dict[tuple[int, str], list[int]] = defaultdict(list)
+    by_name: dict[str, list[int]] = defaultdict(list)
+    for node_id, name, file_id in defs:
+        by_file[file_id, name].append(node_id)
+        by_name[name].append(node_id)
+    edges = db.execute(
+        select(CallEdge.id, CallEdge.file_id, CallEdge.callee_name, CallEdge.callee_id)
+        .where(CallEdge.run_id == run_id, CallEdge.callee_name.in_(names))
+    ).all()
+    ids, callee_ids = [], []
+    for edge_id, file_id, name, current in edges:
+        same_file, same_run = by_file.get((file_id, name), ()), by_name.get(name, ())
+        callee = same_file[0] if len(same_file) == 1 else same_run[0] if len(same_run) == 1 else None
+        if callee != current:
+            ids.append(edge_id)
+            callee_ids.append(callee)
+    if ids:
+        db.execute(_SET_CALLEES_SQL, {"ids": ids, "callee_ids": callee_ids})
+
+
+def find_defs(db: Session, name: str, run_id: int | None = None) -> list[int]:
+    """Ids of definitions named ``name``, optionally within one run."""
+    stmt = select(AstNode.id).where(AstNode.name == name, AstNode.kind.in_(DEF_KINDS))
+    if run_id is not None:
+        stmt = stmt.where(AstNode.run_id == run_id)
+    return list(db.execute(stmt.order_by(AstNode.id)).scalars())
+
+
+def callers(db: Session, start: list[int], depth: int = 3, limit: int = 200):
+    """Definitions that call any of ``start``, transitively up to ``depth`` levels."""
+    if not start:
+        return []
+    return db.execute(_CALLERS_SQL, {"start": start, "depth": depth, "limit": limit}).all()
+
+
+def callees(db: Session, start: list[int], depth: int = 3, limit: int = 200):
+    """Definitions called by any of ``start``, transitively up to ``depth`` levels.
+
+    Calls to names with no definition in the run (builtins, libraries) are
+    not followed.
+    """
+    if not start:
+        return []
+    return db.execute(_CALLEES_SQL, {"start": start, "depth": depth, "limit": limit, "kinds": DEF_KINDS}).all()
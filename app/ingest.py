@@ -1,62 +1,366 @@
 from __future__ import annotations
-import hashlib
+import os
+from contextlib import closing
 from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator, Sized
+from sqlalchemy import case, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
-from .models import Run, SourceFile, CstBlob, AstNode
-from .treesitter import get_ts_parser
-from .ast_extract import extract_ast_like
-import orjson
+from .cache import result_cache
+from .config import settings
+from .discover import iter_source_files
+from .graph import resolve_callees
+from .leases import owner_token
+from .models import Project, Run, SourceFile
+from .blob_codec import compress
+from .parse_pool import hash_bytes, hash_file, iter_parsed
+from .partitions import analyze_partition
+from .retention import DELETING, collect_garbage
+from .snapshots import missing_snapshots, store_snapshots
+from .treesitter import language_for_path
+from .writers import make_writer
 
+# Files hashed and matched against earlier runs per lookup in incremental mode.
+_REUSE_BATCH = 256
 
-def _hash_bytes(b: bytes) -> str:
-    return hashlib.sha256(b).hexdigest()
+# Copy the nodes and call edges of previously ingested files onto new file
+# rows entirely server-side. Fresh ids are drawn from the sequence in old-id
+# order and parent_id and edge endpoints are remapped through the same
+# (old id, new file) mapping, so the copy keeps the original tree shape and
+# node order. The same old file may be copied to several new files
+# (identical content at different paths). Callee ids are not copied; they
+# are resolved against the new run when it finishes.
+_COPY_NODES_SQL = text("""
+WITH m AS (
+    SELECT * FROM unnest(CAST(:old_ids AS bigint[]), CAST(:new_ids AS bigint[]))
+        AS m(old_file_id, new_file_id)
+),
+src AS MATERIALIZED (
+    SELECT n.*, m.new_file_id FROM ast_nodes n JOIN m ON n.file_id = m.old_file_id
+),
+ids AS MATERIALIZED (
+    SELECT o.id AS old_id, o.new_file_id, nextval(pg_get_serial_sequence('ast_nodes', 'id')) AS new_id
+    FROM (SELECT id, new_file_id FROM src ORDER BY new_file_id, id) o
+),
+nodes AS (
+    INSERT INTO ast_nodes (id, run_id, file_id, parent_id, name_id, pre, post, depth, start_byte, end_byte,
+                           start_line, start_col, end_line, end_col, kind_id, meta)
+    SELECT i.new_id, :run_id, s.new_file_id, p.new_id, s.name_id, s.pre, s.post, s.depth, s.start_byte, s.end_byte,
+           s.start_line, s.start_col, s.end_line, s.end_col, s.kind_id, s.meta
+    FROM src s
+    JOIN ids i ON i.old_id = s.id AND i.new_file_id = s.new_file_id
+    LEFT JOIN ids p ON p.old_id = s.parent_id AND p.new_file_id = s.new_file_id
+)
+INSERT INTO call_edges (run_id, file_id, caller_id, call_id, callee_name)
+SELECT :run_id, m.new_file_id, c.new_id, k.new_id, e.callee_name
+FROM m
+JOIN call_edges e ON e.file_id = m.old_file_id
+JOIN ids c ON c.old_id = e.caller_id AND c.new_file_id = m.new_file_id
+JOIN ids k ON k.old_id = e.call_id AND k.new_file_id = m.new_file_id
+""")
 
+_COPY_CST_SQL = text("""
+INSERT INTO cst_blobs (file_id, format, tree, data)
+SELECT m.new_file_id, c.format, c.tree, c.data
+FROM unnest(CAST(:old_ids AS bigint[]), CAST(:new_ids AS bigint[])) AS m(old_file_id, new_file_id)
+JOIN cst_blobs c ON c.file_id = m.old_file_id
+""")
 
-def ingest_files(db: Session, language: str, files: list[str], root_path: str | None = None) -> int:
-    run = Run(language=language, root_path=root_path, created_at=datetime.utcnow().isoformat())
-    db.add(run)
-    db.flush()
 
-    parser = get_ts_parser(language)
+def _find_reusable(db: Session, hashes: list[str]) -> dict[tuple[str, str], int]:
+    """Map (content hash, language) to the newest already-ingested file with that content."""
+    # Files ingested before per-file languages were recorded inherit their run's.
+    language = func.coalesce(SourceFile.language, Run.language)
+    stmt = (
+        select(SourceFile.content_hash, language, SourceFile.id)
+        .join(Run)
+        .where(SourceFile.content_hash.in_(hashes), Run.status != DELETING)
+        .order_by(SourceFile.content_hash, language, SourceFile.id.desc())
+        .distinct(SourceFile.content_hash, language)
+    )
+    return {(h, lang): file_id for h, lang, file_id in db.execute(stmt)}
+
+
+class IngestCancelled(Exception):
+    pass
+
+
+class _Progress:
+    """Counts finished files and commits them in batches.
+
+    Each checkpoint flushes the writer, records progress on the run and
+    commits, so a crash late in a run keeps everything before the last
+    checkpoint. It then re-reads the run status to pick up cancellation
+    requests made from any process.
+    """
+
+    def __init__(self, db: Session, run: Run, writer):
+        self.db = db
+        self.run = run
+        self.writer = writer
+        self.files = 0
+        self.bytes = 0
+        self._since_commit = 0
+
+    def advance(self, size_bytes: int) -> None:
+        self.files += 1
+        self.bytes += size_bytes
+        self._since_commit += 1
+        if self._since_commit >= settings.ingest_commit_files:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        self.writer.flush()
+        self.run.files_done = self.files
+        self.run.bytes_done = self.bytes
+        self.db.commit()
+        # Cross-run queries now see this run's new rows.
+        result_cache.invalidate_run(self.run.id)
+        self._since_commit = 0
+        status = self.db.execute(select(Run.status).where(Run.id == self.run.id)).scalar_one()
+        if status == "cancelling":
+            raise IngestCancelled()
 
-    for path in files:
-        with open(path, "rb") as f:
-            data = f.read()
-        file_rec = SourceFile(
-            run_id=run.id,
-            path=path,
-            content_hash=_hash_bytes(data),
-            size_bytes=len(data),
-        )
-        db.add(file_rec)
-        db.flush()
 
-        tree = parser.parse(data)
-        cst = CstBlob(file_id=file_rec.id, tree=orjson.loads(orjson.dumps(tree.root_node.sexp())))
-        db.add(cst)
-
-        ast_nodes = extract_ast_like(language, tree)
-        node_models: list[AstNode] = []
-        for n in ast_nodes:
-            node_models.append(AstNode(
-                file_id=file_rec.id,
-                kind=n.kind,
-                name=n.name,
-                parent_id=None,
-                start_byte=n.start_byte,
-                end_byte=n.end_byte,
-                start_line=n.start_line,
-                start_col=n.start_col,
-                end_line=n.end_line,
-                end_col=n.end_col,
-                meta=n.meta,
-            ))
-        db.add_all(node_models)
+def _reuse_unchanged(
+    db: Session, run_id: int, files: Iterable[tuple[str, str]], progress: _Progress
+) -> Iterator[tuple[str, str]]:
+    """Copy files whose content was already ingested; yield the rest for parsing.
+
+    Each batch costs one hash lookup plus one server-side copy of nodes and
+    CSTs, independent of how many nodes the reused files hold. Unmatched
+    files are read twice (hash here, parse in the pool); the second read is
+    served from the page cache.
+    """
+    it = iter(files)
+    while batch := list(islice(it, _REUSE_BATCH)):
+        hashed = [(path, language, *hash_file(path)) for path, language in batch]
+        reusable = _find_reusable(db, list({h for _, _, h, _ in hashed}))
+        # Key-share locks keep retention from purging the source files
+        # until this batch is committed; files of runs being purged (whose
+        # nodes may be gone with their partition) are parsed instead.
+        alive = set(db.execute(
+            select(SourceFile.id)
+            .join(Run)
+            .where(SourceFile.id.in_(set(reusable.values())), Run.status != DELETING)
+            .with_for_update(of=SourceFile, read=True, key_share=True)
+        ).scalars()) if reusable else set()
+
+        copies: list[tuple[int, SourceFile]] = []
+        for path, language, content_hash, size in hashed:
+            old_id = reusable.get((content_hash, language))
+            if old_id not in alive:
+                yield path, language
+                continue
+            copies.append((old_id, SourceFile(
+                run_id=run_id, path=path, language=language, content_hash=content_hash, size_bytes=size,
+            )))
+        if not copies:
+            continue
+
+        db.add_all([f for _, f in copies])
         db.flush()
-        # Map parent indices to persisted node ids within the same file.
-        for idx, n in enumerate(ast_nodes):
-            if n.parent_idx is not None:
-                node_models[idx].parent_id = node_models[n.parent_idx].id
+        params = {"old_ids": [old for old, _ in copies], "new_ids": [f.id for _, f in copies]}
+        db.execute(_COPY_NODES_SQL, {**params, "run_id": run_id})
+        db.execute(_COPY_CST_SQL, params)
+        if settings.source_snapshots:
+            # Content first ingested with snapshots off has none to reuse.
+            missing = missing_snapshots(db, {f.content_hash for _, f in copies})
+            store_snapshots(db, [
+                (f.content_hash, compress(data))
+                for f, data in ((f, _read(f.path)) for _, f in copies if f.content_hash in missing)
+                # Skip files that changed since they were hashed.
+                if hash_bytes(data) == f.content_hash
+            ])
+        for _, f in copies:
+            progress.advance(f.size_bytes)
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
 
+def _finish(db: Session, run_id: int, status: str, error: str | None = None) -> None:
+    db.execute(
+        update(Run)
+        .where(Run.id == run_id)
+        .values(status=status, error=error, finished_at=datetime.utcnow().isoformat())
+    )
     db.commit()
-    return run.id
+    result_cache.invalidate_run(run_id)
+
+
+def _ingest(
+    db: Session,
+    run: Run,
+    files: Iterable[tuple[str, str]],
+    workers: int | None,
+    incremental: bool,
+    files_total: int | None = None,
+) -> int:
+    run_id = run.id
+    # Creates the run's partition, committed right away with the status.
+    writer = make_writer(db, run_id)
+    # Conditional so a cancel issued while the job was queued is not lost.
+    db.execute(
+        update(Run)
+        .where(Run.id == run_id, Run.status == "pending")
+        .values(status="running", files_total=files_total)
+    )
+    db.commit()
+
+    if workers is None:
+        workers = settings.ingest_workers
+    progress = _Progress(db, run, writer)
+    try:
+        if db.execute(select(Run.status).where(Run.id == run_id)).scalar_one() == "cancelling":
+            raise IngestCancelled()
+        if incremental:
+            files = _reuse_unchanged(db, run_id, files, progress)
+        parsed_files = iter_parsed(
+            None,
+            files,
+            workers=workers,
+            chunk_size=settings.ingest_chunk_size,
+            cst_format=settings.cst_storage,
+            snapshot=settings.source_snapshots,
+        )
+        # closing() shuts the parse pool down promptly on cancel or error.
+        with closing(parsed_files):
+            for parsed in parsed_files:
+                writer.add(parsed)
+                progress.advance(parsed.size_bytes)
+        run.files_total = progress.files
+        progress.checkpoint()
+        analyze_partition(db, run_id)
+        resolve_callees(db, run_id)
+    except IngestCancelled:
+        db.rollback()
+        analyze_partition(db, run_id)
+        resolve_callees(db, run_id)
+        _finish(db, run_id, "cancelled")
+        return run_id
+    except Exception as exc:
+        db.rollback()
+        _finish(db, run_id, "failed", f"{type(exc).__name__}: {exc}")
+        raise
+
+    # A cancel that lands after the last checkpoint finds all work committed.
+    db.execute(
+        update(Run)
+        .where(Run.id == run_id)
+        .values(
+            status=case((Run.status == "cancelling", "cancelled"), else_="completed"),
+            finished_at=datetime.utcnow().isoformat(),
+        )
+    )
+    db.commit()
+    result_cache.invalidate_run(run_id)
+    if settings.retain_runs and run.project_id is not None:
+        collect_garbage(db, run.project_id)
+    return run_id
+
+
+def _with_languages(files: Iterable[str], language: str | None) -> Iterator[tuple[str, str]]:
+    for path in files:
+        file_language = language or language_for_path(path)
+        if file_language is None:
+            raise ValueError(f"Cannot detect language of {path}")
+        yield path, file_language
+
+
+def project_root(root_path: str) -> str:
+    """The key runs are grouped into projects by."""
+    return os.path.normpath(root_path)
+
+
+def _project_id(db: Session, root_path: str) -> int:
+    root = project_root(root_path)
+    stmt = (
+        insert(Project)
+        .values(root_path=root, created_at=datetime.utcnow().isoformat())
+        .on_conflict_do_nothing(index_elements=["root_path"])
+        .returning(Project.id)
+    )
+    project_id = db.execute(stmt).scalar()
+    if project_id is None:
+        project_id = db.execute(select(Project.id).where(Project.root_path == root)).scalar_one()
+    return project_id
+
+
+def create_run(db: Session, language: str | None, root_path: str | None = None, full_walk: bool = False) -> Run:
+    """Create and commit a pending run so it can be polled before ingest starts.
+
+    Runs with a ``root_path`` join that root's project. ``full_walk`` marks a
+    walk of the whole root, which replaces the project's earlier files in
+    the latest view instead of adding to them. The run is owned by this
+    process, which must ingest it (see ``app.leases``).
+    """
+    run = Run(
+        language=language or "auto",
+        root_path=root_path,
+        created_at=datetime.utcnow().isoformat(),
+        project_id=_project_id(db, root_path) if root_path else None,
+        full_walk=full_walk,
+        status="pending",
+        owner=owner_token(db),
+    )
+    db.add(run)
+    db.commit()
+    return run
+
+
+def _resolve_run(
+    db: Session, run_id: int | None, language: str | None, root_path: str | None, full_walk: bool = False,
+) -> Run:
+    if run_id is None:
+        return create_run(db, language, root_path, full_walk)
+    return db.get(Run, run_id)
+
+
+def ingest_files(
+    db: Session,
+    language: str | None,
+    files: Iterable[str],
+    root_path: str | None = None,
+    workers: int | None = None,
+    incremental: bool = False,
+    run_id: int | None = None,
+) -> int:
+    """Ingest ``files`` into a run and persist their CSTs and AST-like nodes.
+
+    With ``language`` None, each file's language is detected from its
+    extension. With ``incremental`` set, files whose sha256 matches an
+    earlier file of the same language are not parsed; their nodes are
+    copied from that file instead. Pass ``run_id`` of a run made by
+    ``create_run`` to fill it in; otherwise a new run is created.
+
+    Progress is committed every ``INGEST_COMMIT_FILES`` files. A run that is
+    cancelled stops at its next checkpoint and keeps what was committed.
+    """
+    run = _resolve_run(db, run_id, language, root_path)
+    files_total = len(files) if isinstance(files, Sized) else None
+    return _ingest(db, run, _with_languages(files, language), workers, incremental, files_total)
+
+
+def ingest_directory(
+    db: Session,
+    root_path: str,
+    language: str | None = None,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+    workers: int | None = None,
+    incremental: bool = False,
+    run_id: int | None = None,
+) -> int:
+    """Walk ``root_path`` and ingest every supported file as one run.
+
+    Discovery is streamed into the parse stage; see
+    ``app.discover.iter_source_files`` for the filtering rules. The run's
+    ``files_total`` stays unset until the walk completes.
+    """
+    run = _resolve_run(db, run_id, language, root_path, full_walk=not include and not exclude)
+    files = iter_source_files(root_path, language=language, include=include, exclude=exclude)
+    return _ingest(db, run, files, workers, incremental)
@@ -0,0 +1,93 @@
+"""Background ingest jobs.
+
+``submit_ingest`` creates a pending run, hands the ingest to a small thread
+pool and returns the run id immediately. Progress, errors and cancellation
+all live on the ``runs`` row, so any API or MCP process sharing the database
+can poll or cancel a job regardless of which process runs it. Jobs lost
+with their process are failed by ``app.leases``.
+``submit_purge`` runs deletions of superseded runs (``app.retention``) on
+the same pool.
+"""
+from __future__ import annotations
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import SessionLocal
+from .ingest import create_run, ingest_directory, ingest_files
+from .leases import fail_orphaned_runs
+from .models import Run
+from .retention import purge_run
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=settings.ingest_jobs, thread_name_prefix="ingest")
+
+
+def _run_job(run_id: int, files: list[str] | None, options: dict) -> None:
+    db = SessionLocal()
+    try:
+        if files is not None:
+            ingest_files(db, files=files, run_id=run_id, **options)
+        else:
+            ingest_directory(db, run_id=run_id, **options)
+    except Exception:
+        # The failure is already recorded on the run.
+        logger.exception("ingest job for run %s failed", run_id)
+    finally:
+        db.close()
+
+
+def _purge_job(run_ids: list[int]) -> None:
+    db = SessionLocal()
+    try:
+        for run_id in run_ids:
+            purge_run(db, run_id)
+    except Exception:
+        # The runs stay "deleting"; the next collection picks them up.
+        logger.exception("purging runs %s failed", run_ids)
+    finally:
+        db.close()
+
+
+def submit_purge(run_ids: list[int]) -> None:
+    """Purge runs already marked ``deleting`` in the background."""
+    if run_ids:
+        _executor.submit(_purge_job, list(run_ids))
+
+
+def submit_ingest(
+    db: Session,
+    language: str | None,
+    files: list[str] | None = None,
+    root_path: str | None = None,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+    incremental: bool = False,
+) -> int:
+    """Queue an ingest of ``files`` (or a walk of ``root_path``) and return its run id."""
+    run = create_run(db, language, root_path, full_walk=files is None and not include and not exclude)
+    options = {"language": language, "root_path": root_path, "incremental": incremental}
+    if files is None:
+        options.update(include=include, exclude=exclude)
+    _executor.submit(_run_job, run.id, files, options)
+    return run.id
+
+
+def cancel_run(db: Session, run_id: int) -> Run | None:
+    """Ask a pending or running ingest to stop at its next checkpoint.
+
+    A run whose process died is cancelled at once, since no checkpoint
+    will come.
+    """
+    db.execute(
+        update(Run)
+        .where(Run.id == run_id, Run.status.in_(("pending", "running")))
+        .values(status="cancelling")
+    )
+    db.commit()
+    fail_orphaned_runs(db)
+    return db.get(Run, run_id, populate_existing=True)
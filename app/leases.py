@@ -0,0 +1,84 @@
+"""Which process is working on an unfinished run.
+
+A run is created by the process that will ingest it, and records that
+process's ``owner`` token. Each such process holds a session-level advisory
+lock on its token, on a connection of its own, for as long as it lives.
+When the process dies, Postgres closes the connection and releases the lock
+with it. ``fail_orphaned_runs`` can then tell which pending, running or
+cancelling runs have no live process, without heartbeats or timeouts. It
+finishes them: ``cancelled`` if a cancel was pending, otherwise ``failed``.
+Retention can then collect them, and an incremental re-ingest reuses the
+files they committed.
+
+A lock connection that drops while its process lives (say, a database
+restart) also marks that process's runs orphaned. Their ingests lose their
+own connections too, and fail.
+"""
+from __future__ import annotations
+import secrets
+import threading
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .cache import result_cache
+
+# First key of the two-key advisory locks; the token is the second.
+_LOCK_CLASS = 0x72756E  # "run"
+UNFINISHED_STATUSES = ("pending", "running", "cancelling")
+ORPHANED_ERROR = "ingest process exited before finishing"
+
+_TRY_LOCK_SQL = text("SELECT pg_try_advisory_lock(:cls, :token)")
+_ORPHANED_SQL = text("""
+UPDATE runs
+SET status = CASE WHEN status = 'cancelling' THEN 'cancelled' ELSE 'failed' END,
+    error = CASE WHEN status = 'cancelling' THEN error ELSE :error END,
+    finished_at = :now
+WHERE status = ANY(CAST(:statuses AS text[]))
+  AND NOT EXISTS (
+      SELECT 1 FROM pg_locks l
+      WHERE l.locktype = 'advisory' AND l.granted
+        AND l.database = (SELECT oid FROM pg_database WHERE datname = current_database())
+        AND l.classid = CAST(:cls AS oid) AND l.objid = CAST(runs.owner AS oid) AND l.objsubid = 2
+  )
+RETURNING id
+""")
+
+_lock = threading.Lock()
+# Per engine: (token, connection holding its lock).
+_owners: dict = {}
+
+
+def owner_token(db: Session) -> int:
+    """This process's owner token, locked on a dedicated connection on first use."""
+    engine = db.get_bind().engine
+    with _lock:
+        owner = _owners.get(engine)
+        if owner is not None and not owner[1].closed:
+            return owner[0]
+        conn = engine.connect()
+        # A token another process holds already is drawn again.
+        while True:
+            token = secrets.randbits(31)
+            if conn.execute(_TRY_LOCK_SQL, {"cls": _LOCK_CLASS, "token": token}).scalar():
+                break
+        # Session-level locks outlive the transaction; end it so the
+        # connection does not sit idle in one.
+        conn.commit()
+        _owners[engine] = (token, conn)
+        return token
+
+
+def fail_orphaned_runs(db: Session) -> list[int]:
+    """Finish unfinished runs whose process is gone; returns their ids."""
+    run_ids = db.execute(_ORPHANED_SQL, {
+        "cls": _LOCK_CLASS,
+        "statuses": list(UNFINISHED_STATUSES),
+        "error": ORPHANED_ERROR,
+        "now": datetime.utcnow().isoformat(),
+    }).scalars().all()
+    db.commit()
+    for run_id in run_ids:
+        result_cache.invalidate_run(run_id)
+    return run_ids
@@ -1,23 +1,110 @@
-from fastapi import FastAPI, Depends, HTTPException
+import logging
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Literal
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .db import SessionLocal
+from .db import SessionLocal, AsyncSessionLocal, ReadSessionLocal, AsyncReadSessionLocal
 from .schemas import (
     IngestRequest,
     IngestResponse,
     QueryResponse,
+    GraphResponse,
     SourceSliceRequest,
+    SourceBatchRequest,
     FileResponse,
     NodeResponse,
     SourceSliceResponse,
+    SourceBatchResponse,
+    SymbolContextResponse,
+    BatchRequest,
+    BatchResponse,
+    RunResponse,
     RunListResponse,
     FileListResponse,
+    ProjectListResponse,
+    GcResponse,
+    ColumnarRunResponse,
+    ColumnarListResponse,
 )
-from .ingest import ingest_files
-from .query import query_nodes, query_defs, query_calls, list_runs, list_run_files
-from .models import AstNode, SourceFile
-from .serializers import serialize_node_summary, serialize_node_detail, serialize_file, serialize_run
+from .ingest import ingest_files, ingest_directory
+from .jobs import submit_ingest, submit_purge, cancel_run
+from .leases import fail_orphaned_runs
+from .retention import mark_superseded, start_delete
+from .batch import run_batch
+from .cache import result_cache, query_cache_key
+from .columnar import columnar_store
+from .context import symbol_context
+from .mcp_server import mcp, mcp_http
+from .graph import MAX_DEPTH, callers, callees, find_defs
+from .source_slices import slice_cache, read_slices
+from .query import (
+    nodes_statement,
+    defs_statement,
+    calls_statement,
+    query_columnar,
+    RUN_STATE,
+    query_children,
+    query_descendants,
+    query_ancestors,
+    list_runs,
+    list_run_files,
+    list_projects,
+    list_project_files,
+    decode_cursor,
+    page,
+    STREAM_BATCH,
+    SUMMARY_COLUMNS,
+)
+from .models import AstNode, SourceFile, Run, Project
+from .serializers import (
+    serialize_summary_row,
+    serialize_graph_row,
+    serialize_node_detail,
+    serialize_file,
+    serialize_run,
+    serialize_project,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _fail_orphaned_runs() -> None:
+    # Runs left unfinished by a process that died, e.g. this one before a
+    # restart. Startup goes on without a database; the next collection or
+    # cancel sweeps instead.
+    try:
+        with SessionLocal() as db:
+            run_ids = fail_orphaned_runs(db)
+    except Exception:
+        logger.exception("could not check for orphaned runs")
+        return
+    if run_ids:
+        logger.warning("marked runs %s failed: their ingest process exited", run_ids)
+
 
-app = FastAPI(title="reason")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(_fail_orphaned_runs)
+    async with mcp_http.run():
+        yield
+
+
+app = FastAPI(title="reason", lifespan=lifespan)
+
+# The MCP tools over streamable HTTP, and over SSE for older clients (SSE
+# sessions live in one process, so they need a single worker or sticky routing).
+app.add_route("/mcp", mcp_http, methods=["GET", "POST", "DELETE"])
+app.router.routes.extend(mcp.sse_app().routes)
+
+
+DEFAULT_LIMIT = 50
+
+MatchMode = Literal["exact", "prefix", "substring", "fuzzy"]
 
 
 def get_db():
@@ -28,47 +115,221 @@ def get_db():
         db.close()
 
 
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+def _ndjson(db: Session, fetch, after_id: int | None, limit: int | None):
+    # Runs after get_db has closed the session; the session reconnects for
+    # the server-side cursor and is closed again once the stream ends.
+    try:
+        lines = []
+        for row in fetch(limit=limit, after_id=after_id, stream=True, columns=SUMMARY_COLUMNS):
+            lines.append(orjson.dumps(serialize_summary_row(row)))
+            if len(lines) >= STREAM_BATCH:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+    finally:
+        db.close()
+
+
+async def _ndjson_async(db: AsyncSession, stmt):
+    # Like _ndjson, the closed session reconnects for the stream.
+    try:
+        result = await db.stream(stmt.execution_options(yield_per=STREAM_BATCH))
+        async for rows in result.partitions():
+            yield b"\n".join(orjson.dumps(serialize_summary_row(r)) for r in rows) + b"\n"
+    finally:
+        await db.close()
+
+
+def _after_id(cursor: str | None, ranked: bool) -> int | None:
+    if ranked and cursor:
+        raise HTTPException(status_code=400, detail="fuzzy matches cannot be paged")
+    try:
+        return decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def _node_results(db: Session, fetch, limit: int | None, cursor: str | None, stream: bool, ranked: bool = False):
+    """Serve a node query as one keyset page or, with ``stream``, as NDJSON.
+
+    Only summary columns are selected and rows go straight to orjson. A
+    page is fetched with one extra row to tell whether a next cursor is
+    needed. Streams are unbounded unless ``limit`` is given. ``ranked``
+    (fuzzy) results are not in id order, so they come as a single page.
+    """
+    after_id = _after_id(cursor, ranked)
+    if stream:
+        return StreamingResponse(_ndjson(db, fetch, after_id, limit), media_type="application/x-ndjson")
+    limit = DEFAULT_LIMIT if limit is None else limit
+    if ranked:
+        rows, next_cursor = fetch(limit=limit, after_id=None, columns=SUMMARY_COLUMNS), None
+    else:
+        rows, next_cursor = page(fetch(limit=limit + 1, after_id=after_id, columns=SUMMARY_COLUMNS), limit)
+    # Returning a Response skips re-validating every row against QueryResponse.
+    return ORJSONResponse({"results": [serialize_summary_row(r) for r in rows], "next_cursor": next_cursor})
+
+
+async def _node_results_async(
+    db: AsyncSession, build, limit: int | None, cursor: str | None, stream: bool, ranked: bool = False,
+):
+    """``_node_results`` on the event loop; ``build`` is a ``*_statement`` partial.
+
+    The statement is built in ``run_sync`` (name resolution may query the
+    database) and executed through the async driver. Pages go through the
+    result cache, keyed on the statement's parameters (see ``app.cache``).
+    """
+    after_id = _after_id(cursor, ranked)
+    if stream:
+        stmt = await db.run_sync(build, limit=limit, after_id=after_id, columns=SUMMARY_COLUMNS)
+        return StreamingResponse(_ndjson_async(db, stmt), media_type="application/x-ndjson")
+    limit = DEFAULT_LIMIT if limit is None else limit
+
+    filters = {k: v for k, v in build.keywords.items() if k != "run_id"}
+    run_id = build.keywords.get("run_id")
+    state = None
+    if run_id in columnar_store or result_cache.needs_status(run_id):
+        state = (await db.execute(RUN_STATE, {"run_id": run_id})).first()
+    rows = query_columnar(run_id, state, limit=limit if ranked else limit + 1, after_id=after_id, **filters)
+    if rows is not None:
+        rows, next_cursor = (rows, None) if ranked else page(rows, limit)
+        return ORJSONResponse({"results": [serialize_summary_row(r) for r in rows], "next_cursor": next_cursor})
+
+    tag = result_cache.tag_for(run_id, state.status if state is not None else None)
+    key = query_cache_key(build.func.__name__, **build.keywords, limit=limit, cursor=cursor,
+                          version=state.version if state is not None else None)
+    if tag is not None:
+        body = result_cache.get(key, tag)
+        if body is not None:
+            return Response(body, media_type="application/json")
+    generation = result_cache.generation
+
+    if ranked:
+        stmt = await db.run_sync(build, limit=limit, after_id=None, columns=SUMMARY_COLUMNS)
+        rows, next_cursor = (await db.execute(stmt)).all(), None
+    else:
+        stmt = await db.run_sync(build, limit=limit + 1, after_id=after_id, columns=SUMMARY_COLUMNS)
+        rows, next_cursor = page((await db.execute(stmt)).all(), limit)
+    body = orjson.dumps({"results": [serialize_summary_row(r) for r in rows], "next_cursor": next_cursor})
+    if tag is not None:
+        result_cache.put(key, tag, body, generation)
+    return Response(body, media_type="application/json")
+
+
 @app.post("/ingest", response_model=IngestResponse)
 def ingest(req: IngestRequest, db: Session = Depends(get_db)):
-    run_id = ingest_files(db, req.language, req.files, req.root_path)
-    return IngestResponse(run_id=run_id, files_indexed=len(req.files))
+    if req.background:
+        run_id = submit_ingest(
+            db, req.language, req.files, req.root_path, req.include, req.exclude, req.incremental,
+        )
+        return IngestResponse(run_id=run_id, files_indexed=0, status="pending")
+    if req.files is not None:
+        run_id = ingest_files(db, req.language, req.files, req.root_path, incremental=req.incremental)
+    else:
+        run_id = ingest_directory(
+            db, req.root_path, req.language, req.include, req.exclude, incremental=req.incremental,
+        )
+    run = db.get(Run, run_id)
+    return IngestResponse(run_id=run_id, files_indexed=run.files_done, status=run.status)
 
 
 @app.get("/query", response_model=QueryResponse)
-def query(
+async def query(
     kind: str | None = None,
     name: str | None = None,
-    limit: int = 50,
+    limit: int | None = None,
     run_id: int | None = None,
     file_id: int | None = None,
-    db: Session = Depends(get_db),
+    project_id: int | None = None,
+    cursor: str | None = None,
+    stream: bool = False,
+    match: MatchMode = "exact",
+    ignore_case: bool = False,
+    db: AsyncSession = Depends(get_async_read_db),
 ):
-    nodes = query_nodes(db, kind=kind, name=name, limit=limit, run_id=run_id, file_id=file_id)
-    return QueryResponse(results=[serialize_node_summary(n) for n in nodes])
+    build = partial(nodes_statement, kind=kind, name=name, run_id=run_id, file_id=file_id, project_id=project_id,
+                    match=match, ignore_case=ignore_case)
+    return await _node_results_async(db, build, limit, cursor, stream, ranked=bool(name) and match == "fuzzy")
 
 
 @app.get("/files/{file_id}", response_model=FileResponse)
-def get_file(file_id: int, db: Session = Depends(get_db)):
-    file = db.get(SourceFile, file_id)
+async def get_file(file_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    file = await db.get(SourceFile, file_id)
     if not file:
         raise HTTPException(status_code=404, detail="file not found")
     return FileResponse(**serialize_file(file))
 
 
-@app.get("/nodes/{node_id}", response_model=NodeResponse)
-def get_node(node_id: int, db: Session = Depends(get_db)):
+def _get_node_or_404(db: Session, node_id: int) -> AstNode:
     node = db.get(AstNode, node_id)
+    if not node:
+        raise HTTPException(status_code=404, detail="node not found")
+    return node
+
+
+@app.get("/nodes/{node_id}", response_model=NodeResponse)
+async def get_node(node_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    node = await db.get(AstNode, node_id)
     if not node:
         raise HTTPException(status_code=404, detail="node not found")
     return NodeResponse(**serialize_node_detail(node))
 
 
+@app.get("/nodes/{node_id}/children", response_model=QueryResponse)
+def get_node_children(
+    node_id: int,
+    limit: int | None = None,
+    cursor: str | None = None,
+    stream: bool = False,
+    db: Session = Depends(get_read_db),
+):
+    fetch = partial(query_children, db, _get_node_or_404(db, node_id))
+    return _node_results(db, fetch, limit, cursor, stream)
+
+
+@app.get("/nodes/{node_id}/descendants", response_model=QueryResponse)
+def get_node_descendants(
+    node_id: int,
+    kind: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    stream: bool = False,
+    db: Session = Depends(get_read_db),
+):
+    fetch = partial(query_descendants, db, _get_node_or_404(db, node_id), kind=kind)
+    return _node_results(db, fetch, limit, cursor, stream)
+
+
+@app.get("/nodes/{node_id}/ancestors", response_model=QueryResponse)
+def get_node_ancestors(node_id: int, kind: str | None = None, db: Session = Depends(get_read_db)):
+    rows = query_ancestors(db, _get_node_or_404(db, node_id), kind=kind, columns=SUMMARY_COLUMNS)
+    return ORJSONResponse({"results": [serialize_summary_row(r) for r in rows], "next_cursor": None})
+
+
 @app.post("/source", response_model=SourceSliceResponse)
 def get_source(req: SourceSliceRequest):
-    with open(req.path, "rb") as f:
-        f.seek(req.start_byte)
-        data = f.read(max(0, req.end_byte - req.start_byte))
-    text = data.decode("utf-8", errors="replace")
+    try:
+        text = slice_cache.read(req.path, req.start_byte, req.end_byte)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="file not found")
     return SourceSliceResponse(
         path=req.path,
         start_byte=req.start_byte,
@@ -77,37 +338,197 @@ def get_source(req: SourceSliceRequest):
     )
 
 
+@app.post("/source/batch", response_model=SourceBatchResponse)
+def get_source_batch(req: SourceBatchRequest, db: Session = Depends(get_read_db)):
+    slices = [(s.path, s.start_byte, s.end_byte) for s in req.slices]
+    return ORJSONResponse({"results": read_slices(db, slices, req.node_ids)})
+
+
+@app.post("/batch", response_model=BatchResponse)
+def batch(req: BatchRequest, db: Session = Depends(get_read_db)):
+    try:
+        return ORJSONResponse({"results": run_batch(db, req.operations)})
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
 @app.get("/query/defs", response_model=QueryResponse)
-def query_defs_endpoint(
+async def query_defs_endpoint(
     name: str | None = None,
-    limit: int = 50,
+    limit: int | None = None,
     run_id: int | None = None,
     file_id: int | None = None,
-    db: Session = Depends(get_db),
+    project_id: int | None = None,
+    cursor: str | None = None,
+    stream: bool = False,
+    match: MatchMode = "exact",
+    ignore_case: bool = False,
+    db: AsyncSession = Depends(get_async_read_db),
 ):
-    nodes = query_defs(db, name=name, limit=limit, run_id=run_id, file_id=file_id)
-    return QueryResponse(results=[serialize_node_summary(n) for n in nodes])
+    build = partial(defs_statement, name=name, run_id=run_id, file_id=file_id, project_id=project_id,
+                    match=match, ignore_case=ignore_case)
+    return await _node_results_async(db, build, limit, cursor, stream, ranked=bool(name) and match == "fuzzy")
 
 
 @app.get("/query/calls", response_model=QueryResponse)
-def query_calls_endpoint(
+async def query_calls_endpoint(
     name: str | None = None,
-    limit: int = 50,
+    limit: int | None = None,
     run_id: int | None = None,
     file_id: int | None = None,
-    db: Session = Depends(get_db),
+    project_id: int | None = None,
+    cursor: str | None = None,
+    stream: bool = False,
+    match: MatchMode = "exact",
+    ignore_case: bool = False,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    build = partial(calls_statement, name=name, run_id=run_id, file_id=file_id, project_id=project_id,
+                    match=match, ignore_case=ignore_case)
+    return await _node_results_async(db, build, limit, cursor, stream, ranked=bool(name) and match == "fuzzy")
+
+
+def _graph_start(db: Session, node_id: int | None, name: str | None, run_id: int | None) -> list[int]:
+    if node_id is not None:
+        if db.get(AstNode, node_id) is None:
+            raise HTTPException(status_code=404, detail="node not found")
+        return [node_id]
+    if not name:
+        raise HTTPException(status_code=400, detail="node_id or name is required")
+    return find_defs(db, name, run_id)
+
+
+@app.get("/graph/callers", response_model=GraphResponse)
+def graph_callers(
+    node_id: int | None = None,
+    name: str | None = None,
+    run_id: int | None = None,
+    depth: int = Query(3, ge=1, le=MAX_DEPTH),
+    limit: int = 200,
+    db: Session = Depends(get_read_db),
+):
+    rows = callers(db, _graph_start(db, node_id, name, run_id), depth=depth, limit=limit)
+    return ORJSONResponse({"results": [serialize_graph_row(r) for r in rows]})
+
+
+@app.get("/graph/callees", response_model=GraphResponse)
+def graph_callees(
+    node_id: int | None = None,
+    name: str | None = None,
+    run_id: int | None = None,
+    depth: int = Query(3, ge=1, le=MAX_DEPTH),
+    limit: int = 200,
+    db: Session = Depends(get_read_db),
+):
+    rows = callees(db, _graph_start(db, node_id, name, run_id), depth=depth, limit=limit)
+    return ORJSONResponse({"results": [serialize_graph_row(r) for r in rows]})
+
+
+@app.get("/symbols/{name}/context", response_model=SymbolContextResponse)
+def get_symbol_context(
+    name: str,
+    run_id: int | None = None,
+    project_id: int | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    max_bytes: int | None = Query(None, ge=0),
+    db: Session = Depends(get_read_db),
 ):
-    nodes = query_calls(db, name=name, limit=limit, run_id=run_id, file_id=file_id)
-    return QueryResponse(results=[serialize_node_summary(n) for n in nodes])
+    out = symbol_context(db, name, run_id=run_id, project_id=project_id, limit=limit, max_bytes=max_bytes)
+    if not out["definitions"] and not out["call_sites"]:
+        raise HTTPException(status_code=404, detail="symbol not found")
+    return ORJSONResponse(out)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return result_cache.stats()
 
 
 @app.get("/runs", response_model=RunListResponse)
-def list_runs_endpoint(limit: int = 50, db: Session = Depends(get_db)):
-    runs = list_runs(db, limit=limit)
+async def list_runs_endpoint(limit: int = 50, db: AsyncSession = Depends(get_async_db)):
+    runs = await db.run_sync(list_runs, limit=limit)
     return RunListResponse(results=[serialize_run(r) for r in runs])
 
 
+@app.get("/runs/{run_id}", response_model=RunResponse)
+async def get_run(run_id: int, db: AsyncSession = Depends(get_async_db)):
+    # Progress changes under us; never serve a cached identity-map copy.
+    run = await db.get(Run, run_id, populate_existing=True)
+    if not run:
+        raise HTTPException(status_code=404, detail="run not found")
+    return RunResponse(**serialize_run(run))
+
+
+@app.post("/runs/{run_id}/cancel", response_model=RunResponse)
+def cancel_run_endpoint(run_id: int, db: Session = Depends(get_db)):
+    run = cancel_run(db, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="run not found")
+    return RunResponse(**serialize_run(run))
+
+
+@app.delete("/runs/{run_id}", response_model=RunResponse)
+def delete_run_endpoint(run_id: int, db: Session = Depends(get_db)):
+    try:
+        start_delete(db, run_id)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="run not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    run = db.get(Run, run_id, populate_existing=True)
+    submit_purge([run_id])
+    return RunResponse(**serialize_run(run))
+
+
+@app.post("/gc", response_model=GcResponse)
+def gc(project_id: int | None = None, keep: int | None = Query(None, ge=1), db: Session = Depends(get_db)):
+    run_ids = mark_superseded(db, project_id, keep)
+    submit_purge(run_ids)
+    return GcResponse(runs=run_ids)
+
+
+@app.get("/projects", response_model=ProjectListResponse)
+async def list_projects_endpoint(limit: int = 50, db: AsyncSession = Depends(get_async_db)):
+    rows = await db.run_sync(list_projects, limit=limit)
+    return ProjectListResponse(results=[serialize_project(p, latest) for p, latest in rows])
+
+
+@app.get("/projects/{project_id}/files", response_model=FileListResponse)
+async def list_project_files_endpoint(
+    project_id: int, limit: int = 200, db: AsyncSession = Depends(get_async_read_db),
+):
+    if await db.get(Project, project_id) is None:
+        raise HTTPException(status_code=404, detail="project not found")
+    files = await db.run_sync(list_project_files, project_id=project_id, limit=limit)
+    return FileListResponse(results=[serialize_file(f) for f in files])
+
+
+@app.post("/runs/{run_id}/columnar", response_model=ColumnarRunResponse)
+def load_run_columnar(run_id: int, db: Session = Depends(get_read_db)):
+    try:
+        columns = columnar_store.load(db, run_id)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="run not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    return ColumnarRunResponse(run_id=run_id, nodes=len(columns), names=len(columns.names), bytes=columns.nbytes)
+
+
+@app.delete("/runs/{run_id}/columnar")
+def drop_run_columnar(run_id: int):
+    if not columnar_store.drop(run_id):
+        raise HTTPException(status_code=404, detail="run not loaded")
+    return {"run_id": run_id, "dropped": True}
+
+
+@app.get("/columnar", response_model=ColumnarListResponse)
+def list_columnar_runs():
+    return ColumnarListResponse(results=columnar_store.loaded())
+
+
 @app.get("/runs/{run_id}/files", response_model=FileListResponse)
-def list_run_files_endpoint(run_id: int, limit: int = 200, db: Session = Depends(get_db)):
-    files = list_run_files(db, run_id=run_id, limit=limit)
+async def list_run_files_endpoint(run_id: int, limit: int = 200, db: AsyncSession = Depends(get_async_db)):
+    files = await db.run_sync(list_run_files, run_id=run_id, limit=limit)
     return FileListResponse(results=[serialize_file(f) for f in files])
@@ -1,56 +1,264 @@
 """Reason MCP Server -- exposes code indexing tools over Model Context Protocol."""
+import functools
 import json
 import logging
 import sys
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 
+import anyio
+import orjson
 from mcp.server.fastmcp import FastMCP
-
-from .db import SessionLocal
-from .models import AstNode, SourceFile
-from .ingest import ingest_files
-from .query import query_nodes, query_defs, query_calls, list_runs, list_run_files
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+from .batch import cached_summaries, run_batch
+from .columnar import columnar_store
+from .config import settings
+from .context import symbol_context
+from .db import SessionLocal, ReadSessionLocal
+from .models import AstNode, SourceFile, Run
+from .graph import MAX_DEPTH, callers, callees, find_defs
+from .source_slices import slice_cache, read_slices
+from .query import (
+    query_nodes,
+    query_defs,
+    query_calls,
+    query_children,
+    query_descendants,
+    query_ancestors,
+    list_runs,
+    list_run_files,
+    list_projects,
+    list_project_files,
+    SUMMARY_COLUMNS,
+    MATCH_MODES,
+)
 from .serializers import (
-    serialize_node_summary,
+    serialize_summary_row,
+    serialize_graph_row,
     serialize_node_detail,
     serialize_file,
     serialize_run,
+    serialize_project,
 )
 
-logging.basicConfig(stream=sys.stderr, level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-mcp = FastMCP("reason")
+
+class _ClosedStreamFilter(logging.Filter):
+    """Drop the ClosedResourceError traceback some mcp releases log after every stateless request."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not (record.exc_info and isinstance(record.exc_info[1], anyio.ClosedResourceError))
+
+
+logging.getLogger("mcp.server.streamable_http").addFilter(_ClosedStreamFilter())
+
+mcp = FastMCP(
+    "reason",
+    # Over HTTP (see StreamableHTTP below), /mcp and /mcp/sse in app.main.
+    streamable_http_path="/mcp",
+    sse_path="/mcp/sse",
+    message_path="/mcp/messages/",
+    stateless_http=settings.mcp_stateless_http,
+    json_response=settings.mcp_json_response,
+)
+
+
+def _tool(fn):
+    """Register ``fn`` as a tool that runs on a worker thread.
+
+    FastMCP calls synchronous tools on the event loop, where one slow query
+    would stall every other HTTP session of the process. ``fn`` itself is
+    returned unchanged.
+    """
+    @functools.wraps(fn)
+    async def run(**kwargs):
+        return await anyio.to_thread.run_sync(functools.partial(fn, **kwargs))
+
+    mcp.add_tool(run)
+    return fn
+
+
+class StreamableHTTP:
+    """ASGI endpoint serving the tools over streamable HTTP from another app.
+
+    Enter ``run()`` in the host app's lifespan; each lifespan gets a fresh
+    session manager, since one can only be run once. Stateless mode (the
+    default, ``MCP_STATELESS_HTTP``) keeps no session state between requests,
+    so any uvicorn worker can answer any request.
+    """
+
+    def __init__(self):
+        self._manager: StreamableHTTPSessionManager | None = None
+
+    @asynccontextmanager
+    async def run(self):
+        manager = StreamableHTTPSessionManager(
+            app=mcp._mcp_server,
+            json_response=mcp.settings.json_response,
+            stateless=mcp.settings.stateless_http,
+        )
+        async with manager.run():
+            self._manager = manager
+            try:
+                yield
+            finally:
+                self._manager = None
+
+    async def __call__(self, scope, receive, send):
+        if self._manager is None:
+            raise RuntimeError("StreamableHTTP.run() has not been entered")
+        await self._manager.handle_request(scope, receive, send)
+
+
+mcp_http = StreamableHTTP()
 
 
 @contextmanager
-def _get_db():
-    db = SessionLocal()
+def _get_db(read: bool = False):
+    """Session on the primary, or with ``read`` on a read replica if any are configured."""
+    db = ReadSessionLocal() if read else SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
 
+def _summaries_json(rows) -> str:
+    return orjson.dumps([serialize_summary_row(r) for r in rows]).decode()
+
+
+def _cached_query(fetch, run_id: int | None, **params) -> str:
+    """Summaries from ``fetch`` (``query_nodes`` etc.), through the result cache."""
+    with _get_db(read=True) as db:
+        return cached_summaries(db, fetch, run_id, **params).decode()
+
+
 # ── ingest ───────────────────────────────────────────────────
 
-@mcp.tool()
-def reason_ingest(language: str, files: list[str], root_path: str | None = None) -> str:
+@_tool
+def reason_ingest(
+    language: str,
+    files: list[str],
+    root_path: str | None = None,
+    incremental: bool = False,
+    background: bool = False,
+) -> str:
     """Ingest source files into the Reason index for a given language.
 
     Args:
         language: Programming language (python, javascript, js, ts, tsx, css, scss)
         files: List of absolute file paths to ingest
         root_path: Optional root path for the project
+        incremental: Reuse parsed nodes of files whose content was already ingested
+        background: Return a pending run_id immediately; poll with reason_get_run
+    """
+    # Ingest brings in tree-sitter and its grammars; only ingest tools load it.
+    from .ingest import ingest_files
+    from .jobs import submit_ingest
+
+    with _get_db() as db:
+        if background:
+            run_id = submit_ingest(db, language, files, root_path, incremental=incremental)
+            return json.dumps({"run_id": run_id, "files_indexed": 0, "status": "pending"})
+        run_id = ingest_files(db, language, files, root_path, incremental=incremental)
+        return _ingest_result(db, run_id)
+
+
+@_tool
+def reason_ingest_directory(
+    root_path: str,
+    language: str | None = None,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+    incremental: bool = False,
+    background: bool = False,
+) -> str:
+    """Walk a directory server-side and ingest every supported source file.
+
+    Languages are detected from file extensions, so one run can cover mixed
+    Python/JS/CSS trees. .gitignore files are honored.
+
+    Args:
+        root_path: Absolute path of the directory to walk
+        language: Only ingest files of this language (default: all supported)
+        include: Glob patterns a file must match, relative to root_path (e.g. 'src/**/*.py')
+        exclude: Glob patterns to skip, relative to root_path (e.g. 'tests/', '*.min.js')
+        incremental: Reuse parsed nodes of files whose content was already ingested
+        background: Return a pending run_id immediately; poll with reason_get_run
     """
+    from .ingest import ingest_directory
+    from .jobs import submit_ingest
+
+    with _get_db() as db:
+        if background:
+            run_id = submit_ingest(db, language, None, root_path, include, exclude, incremental)
+            return json.dumps({"run_id": run_id, "files_indexed": 0, "status": "pending"})
+        run_id = ingest_directory(db, root_path, language, include, exclude, incremental=incremental)
+        return _ingest_result(db, run_id)
+
+
+def _ingest_result(db, run_id: int) -> str:
+    run = db.get(Run, run_id)
+    return json.dumps({"run_id": run_id, "files_indexed": run.files_done, "status": run.status})
+
+
+@_tool
+def reason_get_run(run_id: int) -> str:
+    """Get an ingestion run with its status and progress.
+
+    Status is one of pending, running, completed, failed, cancelling, cancelled,
+    or deleting while a finished run is being purged.
+
+    Args:
+        run_id: The ID of the ingestion run
+    """
+    with _get_db() as db:
+        run = db.get(Run, run_id, populate_existing=True)
+        if not run:
+            return json.dumps({"error": "run not found"})
+        return json.dumps(serialize_run(run))
+
+
+@_tool
+def reason_cancel_run(run_id: int) -> str:
+    """Cancel a pending or running ingestion; it stops at its next progress commit.
+
+    Args:
+        run_id: The ID of the ingestion run
+    """
+    from .jobs import cancel_run
+
     with _get_db() as db:
-        run_id = ingest_files(db, language, files, root_path)
-        return json.dumps({"run_id": run_id, "files_indexed": len(files)})
+        run = cancel_run(db, run_id)
+        if not run:
+            return json.dumps({"error": "run not found"})
+        return json.dumps(serialize_run(run))
+
+
+@_tool
+def reason_load_run(run_id: int, unload: bool = False) -> str:
+    """Load a finished run into memory so queries scoped to it skip the database.
+
+    Worth it for a run you will query many times; other runs keep using Postgres.
+
+    Args:
+        run_id: The ID of a completed, cancelled or failed ingestion run
+        unload: Release the run's memory instead
+    """
+    if unload:
+        return json.dumps({"run_id": run_id, "dropped": columnar_store.drop(run_id)})
+    with _get_db(read=True) as db:
+        try:
+            columns = columnar_store.load(db, run_id)
+        except (LookupError, ValueError, RuntimeError) as exc:
+            return json.dumps({"error": str(exc)})
+    return json.dumps({"run_id": run_id, "nodes": len(columns), "names": len(columns.names), "bytes": columns.nbytes})
 
 
 # ── discovery ────────────────────────────────────────────────
 
-@mcp.tool()
+@_tool
 def reason_list_runs(limit: int = 50) -> str:
     """List ingestion runs, most recent first.
 
@@ -62,7 +270,7 @@ def reason_list_runs(limit: int = 50) -> str:
         return json.dumps([serialize_run(r) for r in runs])
 
 
-@mcp.tool()
+@_tool
 def reason_list_run_files(run_id: int, limit: int = 200) -> str:
     """List files that belong to a specific ingestion run.
 
@@ -75,101 +283,277 @@ def reason_list_run_files(run_id: int, limit: int = 200) -> str:
         return json.dumps([serialize_file(f) for f in files])
 
 
+@_tool
+def reason_list_projects(limit: int = 50) -> str:
+    """List projects (one per ingested root path) with their newest completed run.
+
+    Pass a project's id as project_id to the query tools to search its latest
+    version: each path's newest file, without picking a run.
+
+    Args:
+        limit: Maximum number of projects to return (default 50)
+    """
+    with _get_db() as db:
+        rows = list_projects(db, limit=limit)
+        return json.dumps([serialize_project(p, latest) for p, latest in rows])
+
+
+@_tool
+def reason_list_project_files(project_id: int, limit: int = 200) -> str:
+    """List a project's current files: the newest version of each path across its runs.
+
+    Args:
+        project_id: The ID of the project
+        limit: Maximum number of files to return (default 200)
+    """
+    with _get_db(read=True) as db:
+        files = list_project_files(db, project_id=project_id, limit=limit)
+        return json.dumps([serialize_file(f) for f in files])
+
+
 # ── queries ──────────────────────────────────────────────────
 
-@mcp.tool()
+@_tool
 def reason_query_nodes(
     kind: str | None = None,
     name: str | None = None,
     limit: int = 50,
     run_id: int | None = None,
     file_id: int | None = None,
+    project_id: int | None = None,
+    match: str = "exact",
+    ignore_case: bool = False,
 ) -> str:
     """Search AST nodes by kind and/or name.
 
     Args:
         kind: Node kind filter (e.g. function_definition, class_definition, call_expression, import_statement)
-        name: Exact name filter
+        name: Name filter, compared according to match
         limit: Maximum results (default 50)
         run_id: Filter to a specific ingestion run
         file_id: Filter to a specific file
+        project_id: Search the latest version of a project (see reason_list_projects) instead of a run
+        match: How name is compared: exact (default), prefix, substring, or fuzzy (ranked by similarity)
+        ignore_case: Case-insensitive name comparison for exact/prefix/substring
     """
-    with _get_db() as db:
-        nodes = query_nodes(db, kind=kind, name=name, limit=limit, run_id=run_id, file_id=file_id)
-        return json.dumps([serialize_node_summary(n) for n in nodes])
+    if match not in MATCH_MODES:
+        return json.dumps({"error": f"Unsupported match mode: {match}"})
+    return _cached_query(query_nodes, run_id, kind=kind, name=name, limit=limit, file_id=file_id,
+                         project_id=project_id, match=match, ignore_case=ignore_case)
 
 
-@mcp.tool()
+@_tool
 def reason_query_defs(
     name: str | None = None,
     limit: int = 50,
     run_id: int | None = None,
     file_id: int | None = None,
+    project_id: int | None = None,
+    match: str = "exact",
+    ignore_case: bool = False,
 ) -> str:
     """Search for function/class definitions.
 
     Args:
-        name: Exact name filter (e.g. 'MyClass', 'process_data')
+        name: Name filter (e.g. 'MyClass', 'process_data'), compared according to match
         limit: Maximum results (default 50)
         run_id: Filter to a specific ingestion run
         file_id: Filter to a specific file
+        project_id: Search the latest version of a project (see reason_list_projects) instead of a run
+        match: How name is compared: exact (default), prefix, substring, or fuzzy (ranked by similarity)
+        ignore_case: Case-insensitive name comparison for exact/prefix/substring
     """
-    with _get_db() as db:
-        nodes = query_defs(db, name=name, limit=limit, run_id=run_id, file_id=file_id)
-        return json.dumps([serialize_node_summary(n) for n in nodes])
+    if match not in MATCH_MODES:
+        return json.dumps({"error": f"Unsupported match mode: {match}"})
+    return _cached_query(query_defs, run_id, name=name, limit=limit, file_id=file_id,
+                         project_id=project_id, match=match, ignore_case=ignore_case)
 
 
-@mcp.tool()
+@_tool
 def reason_query_calls(
     name: str | None = None,
     limit: int = 50,
     run_id: int | None = None,
     file_id: int | None = None,
+    project_id: int | None = None,
+    match: str = "exact",
+    ignore_case: bool = False,
 ) -> str:
     """Search for function/method call sites.
 
     Args:
-        name: Name of the function being called
+        name: Name of the function being called, compared according to match
         limit: Maximum results (default 50)
         run_id: Filter to a specific ingestion run
         file_id: Filter to a specific file
+        project_id: Search the latest version of a project (see reason_list_projects) instead of a run
+        match: How name is compared: exact (default), prefix, substring, or fuzzy (ranked by similarity)
+        ignore_case: Case-insensitive name comparison for exact/prefix/substring
     """
-    with _get_db() as db:
-        nodes = query_calls(db, name=name, limit=limit, run_id=run_id, file_id=file_id)
-        return json.dumps([serialize_node_summary(n) for n in nodes])
+    if match not in MATCH_MODES:
+        return json.dumps({"error": f"Unsupported match mode: {match}"})
+    return _cached_query(query_calls, run_id, name=name, limit=limit, file_id=file_id,
+                         project_id=project_id, match=match, ignore_case=ignore_case)
+
+
+# ── tree navigation ──────────────────────────────────────────
+
+@_tool
+def reason_get_children(node_id: int, limit: int = 200) -> str:
+    """List the direct child nodes of an AST node.
+
+    Args:
+        node_id: The database ID of the parent node
+        limit: Maximum results (default 200)
+    """
+    with _get_db(read=True) as db:
+        node = db.get(AstNode, node_id)
+        if not node:
+            return json.dumps({"error": "node not found"})
+        return _summaries_json(query_children(db, node, limit=limit, columns=SUMMARY_COLUMNS))
+
+
+@_tool
+def reason_get_descendants(node_id: int, kind: str | None = None, limit: int = 200) -> str:
+    """List nodes anywhere inside an AST node, e.g. all calls inside a function.
+
+    Args:
+        node_id: The database ID of the enclosing node
+        kind: Node kind filter (e.g. call_expression, function_definition)
+        limit: Maximum results (default 200)
+    """
+    with _get_db(read=True) as db:
+        node = db.get(AstNode, node_id)
+        if not node:
+            return json.dumps({"error": "node not found"})
+        return _summaries_json(query_descendants(db, node, kind=kind, limit=limit, columns=SUMMARY_COLUMNS))
+
+
+@_tool
+def reason_get_ancestors(node_id: int, kind: str | None = None) -> str:
+    """List the nodes enclosing an AST node, outermost first (e.g. its class and function).
+
+    Args:
+        node_id: The database ID of the node
+        kind: Only return enclosing nodes of this kind (e.g. class_definition)
+    """
+    with _get_db(read=True) as db:
+        node = db.get(AstNode, node_id)
+        if not node:
+            return json.dumps({"error": "node not found"})
+        return _summaries_json(query_ancestors(db, node, kind=kind, columns=SUMMARY_COLUMNS))
+
+
+# ── call graph ───────────────────────────────────────────────
+
+def _graph_json(walk, node_id: int | None, name: str | None, run_id: int | None, depth: int, limit: int) -> str:
+    if node_id is None and not name:
+        return json.dumps({"error": "node_id or name is required"})
+    with _get_db(read=True) as db:
+        start = [node_id] if node_id is not None else find_defs(db, name, run_id)
+        rows = walk(db, start, depth=max(1, min(depth, MAX_DEPTH)), limit=limit)
+        return orjson.dumps([serialize_graph_row(r) for r in rows]).decode()
+
+
+@_tool
+def reason_callers(
+    node_id: int | None = None,
+    name: str | None = None,
+    run_id: int | None = None,
+    depth: int = 3,
+    limit: int = 200,
+) -> str:
+    """Find definitions that call a function or class, transitively.
+
+    Args:
+        node_id: ID of the definition node to start from
+        name: Definition name to start from, when node_id is not given
+        run_id: Restrict name lookup to a specific ingestion run
+        depth: How many call levels to follow (1-10, default 3)
+        limit: Maximum results (default 200)
+    """
+    return _graph_json(callers, node_id, name, run_id, depth, limit)
+
+
+@_tool
+def reason_callees(
+    node_id: int | None = None,
+    name: str | None = None,
+    run_id: int | None = None,
+    depth: int = 3,
+    limit: int = 200,
+) -> str:
+    """Find definitions called by a function or class, transitively.
+
+    Args:
+        node_id: ID of the definition node to start from
+        name: Definition name to start from, when node_id is not given
+        run_id: Restrict name lookup to a specific ingestion run
+        depth: How many call levels to follow (1-10, default 3)
+        limit: Maximum results (default 200)
+    """
+    return _graph_json(callees, node_id, name, run_id, depth, limit)
+
+
+# ── symbol context ───────────────────────────────────────────
+
+@_tool
+def reason_symbol_context(
+    name: str,
+    run_id: int | None = None,
+    project_id: int | None = None,
+    limit: int = 50,
+    max_bytes: int | None = None,
+) -> str:
+    """Everything about a symbol in one call: definitions with source, call sites, callees and imports.
+
+    Call sites carry their enclosing definition ("caller") and their line of
+    source. Source text is capped by max_bytes; "truncated" says whether
+    anything was cut.
+
+    Args:
+        name: Exact name of the function or class
+        run_id: Restrict to a specific ingestion run
+        project_id: Restrict to the latest version of a project (see reason_list_projects)
+        limit: Maximum entries per list (default 50)
+        max_bytes: Budget for source text (default 32 KiB)
+    """
+    with _get_db(read=True) as db:
+        return orjson.dumps(symbol_context(db, name, run_id=run_id, project_id=project_id, limit=limit,
+                                           max_bytes=max_bytes)).decode()
 
 
 # ── lookups ──────────────────────────────────────────────────
 
-@mcp.tool()
+@_tool
 def reason_get_file(file_id: int) -> str:
     """Get metadata for a source file by its ID.
 
     Args:
         file_id: The database ID of the source file
     """
-    with _get_db() as db:
+    with _get_db(read=True) as db:
         f = db.get(SourceFile, file_id)
         if not f:
             return json.dumps({"error": "file not found"})
         return json.dumps(serialize_file(f))
 
 
-@mcp.tool()
+@_tool
 def reason_get_node(node_id: int) -> str:
     """Get detailed information about an AST node by its ID.
 
     Args:
         node_id: The database ID of the AST node
     """
-    with _get_db() as db:
+    with _get_db(read=True) as db:
         n = db.get(AstNode, node_id)
         if not n:
             return json.dumps({"error": "node not found"})
         return json.dumps(serialize_node_detail(n))
 
 
-@mcp.tool()
+@_tool
 def reason_get_source(path: str, start_byte: int, end_byte: int) -> str:
     """Fetch a source code slice by file path and byte range.
 
@@ -179,14 +563,59 @@ def reason_get_source(path: str, start_byte: int, end_byte: int) -> str:
         end_byte: End byte offset (exclusive)
     """
     try:
-        with open(path, "rb") as f:
-            f.seek(start_byte)
-            data = f.read(max(0, end_byte - start_byte))
-        text = data.decode("utf-8", errors="replace")
+        text = slice_cache.read(path, start_byte, end_byte)
         return json.dumps({"path": path, "start_byte": start_byte, "end_byte": end_byte, "text": text})
     except FileNotFoundError:
         return json.dumps({"error": f"file not found: {path}"})
 
 
+@_tool
+def reason_get_sources(slices: list[dict] | None = None, node_ids: list[int] | None = None) -> str:
+    """Fetch many source slices in one call, by byte range and/or by node id.
+
+    Results come back in request order (ranges first, then node ids). Entries
+    that fail carry an "error" instead of "text".
+
+    Args:
+        slices: Ranges as objects with path, start_byte and end_byte
+        node_ids: AST node IDs whose full source text to return
+    """
+    try:
+        ranges = [(s["path"], int(s["start_byte"]), int(s["end_byte"])) for s in slices or ()]
+    except (KeyError, TypeError, ValueError):
+        return json.dumps({"error": "each slice needs path, start_byte and end_byte"})
+    with _get_db(read=True) as db:
+        return orjson.dumps(read_slices(db, ranges, node_ids)).decode()
+
+
+# ── batches ──────────────────────────────────────────────────
+
+@_tool
+def reason_batch(operations: list[dict]) -> str:
+    """Run many read operations in one call and one consistent snapshot.
+
+    Each operation is an object with "op" set to a tool name without the
+    reason_ prefix, plus that tool's arguments, e.g.
+    {"op": "query_defs", "name": "parse", "run_id": 3} or
+    {"op": "get_sources", "node_ids": [10, 11]}. Supported ops: query_nodes,
+    query_defs, query_calls, get_node, get_file, get_run, get_children,
+    get_descendants, get_ancestors, callers, callees, get_source,
+    get_sources, list_run_files, list_project_files, symbol_context. Results
+    come back as a list in request order, each shaped like the tool's own
+    output; a failed operation yields {"error": ...} without failing the
+    others.
+
+    Args:
+        operations: The operations to run (at most 100 by default)
+    """
+    with _get_db(read=True) as db:
+        try:
+            return orjson.dumps(run_batch(db, operations)).decode()
+        except ValueError as exc:
+            return json.dumps({"error": str(exc)})
+
+
 if __name__ == "__main__":
+    # stdout carries the protocol; logs go to stderr.
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
     mcp.run(transport="stdio")
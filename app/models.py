@@ -1,14 +1,42 @@
-from sqlalchemy import String, Integer, BigInteger, ForeignKey, Text
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import (
+    String, Integer, BigInteger, SmallInteger, Boolean, ForeignKey, Text, LargeBinary, Index, select, text,
+)
+from sqlalchemy.orm import Mapped, column_property, mapped_column, relationship
+from sqlalchemy.orm.properties import ColumnProperty
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from .db import Base
 
+class Project(Base):
+    """A workspace, keyed by its normalized root path; every run ingested with that root belongs to it."""
+    __tablename__ = "projects"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    root_path: Mapped[str] = mapped_column(Text, unique=True)
+    created_at: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
 class Run(Base):
     __tablename__ = "runs"
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     language: Mapped[str] = mapped_column(String(32), index=True)
     root_path: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    project_id: Mapped[int | None] = mapped_column(ForeignKey("projects.id"), nullable=True, index=True)
+    # Walked the whole root (no include/exclude), so paths missing from it
+    # were deleted; see query.latest_files.
+    full_walk: Mapped[bool] = mapped_column(Boolean, default=False, server_default=text("false"))
+
+    # pending -> running -> completed | failed | cancelling -> cancelled;
+    # finished runs -> deleting while retention purges them (app.retention)
+    status: Mapped[str] = mapped_column(String(16), default="pending", index=True)
+    files_total: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    files_done: Mapped[int] = mapped_column(Integer, default=0)
+    bytes_done: Mapped[int] = mapped_column(BigInteger, default=0)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    finished_at: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # Token of the process ingesting the run; see app.leases.
+    owner: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # Bumped whenever a finished run's rows change in place (app.watch), so
+    # other processes can tell their snapshots and cached results are stale.
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default=text("0"))
 
     files = relationship("SourceFile", back_populates="run", cascade="all, delete-orphan")
 
@@ -17,6 +45,7 @@ class SourceFile(Base):
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     run_id: Mapped[int] = mapped_column(ForeignKey("runs.id", ondelete="CASCADE"), index=True)
     path: Mapped[str] = mapped_column(Text, index=True)
+    language: Mapped[str | None] = mapped_column(String(32), nullable=True)
     content_hash: Mapped[str] = mapped_column(String(64), index=True)
     size_bytes: Mapped[int] = mapped_column(Integer)
 
@@ -27,17 +56,103 @@ class SourceFile(Base):
 class CstBlob(Base):
     __tablename__ = "cst_blobs"
     file_id: Mapped[int] = mapped_column(ForeignKey("source_files.id", ondelete="CASCADE"), primary_key=True)
-    tree: Mapped[dict] = mapped_column(JSONB)
+    # "sexp" rows keep the S-expression in ``tree``; "binary" rows keep
+    # app.cst_codec output in ``data``.
+    format: Mapped[str] = mapped_column(String(16), default="sexp", server_default="sexp")
+    tree: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    data: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
 
     file = relationship("SourceFile", back_populates="cst")
 
+class NodeKind(Base):
+    """Interned node kinds; ``ast_nodes.kind_id`` points here (see app.symbols)."""
+    __tablename__ = "node_kinds"
+    id: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(64), unique=True)
+
+class Symbol(Base):
+    """Interned node names; ``ast_nodes.name_id`` points here (see app.symbols)."""
+    __tablename__ = "symbols"
+    __table_args__ = (
+        # Exact and prefix (LIKE 'abc%') matches, case-sensitive and
+        # case-insensitive. The pg_trgm GIN index for substring/fuzzy
+        # lookups lives in migration 0010.
+        Index("ix_symbols_name", "name", unique=True, postgresql_ops={"name": "text_pattern_ops"}),
+        Index("ix_symbols_name_lower", text("lower(name) text_pattern_ops")),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(256))
+
+class _Interned(ColumnProperty.Comparator):
+    """Compares an interned value by its id, so filters stay on the node indexes.
+
+    ``AstNode.kind == "call_expression"`` becomes ``kind_id = (SELECT id FROM
+    node_kinds WHERE kind = ...)`` and ``in_`` a semi-join on the lookup
+    table, instead of comparing the per-row subquery that loads the string.
+    Anything else (LIKE, functions) falls back to that subquery; pattern
+    matches go through ``Symbol.name`` instead (see app.query).
+    """
+
+    def _id_column(self):
+        return getattr(self._parententity.entity, self.prop.info["id_column"])
+
+    def _ids(self, where):
+        table = self.prop.info["table"]
+        return select(table.c.id).where(where(table.c[self.prop.info["value_column"]]))
+
+    def __eq__(self, other):
+        if other is None:
+            return self._id_column().is_(None)
+        return self._id_column() == self._ids(lambda c: c == other).scalar_subquery()
+
+    def in_(self, other):
+        return self._id_column().in_(self._ids(lambda c: c.in_(other)))
+
+    def is_(self, other):
+        return self._id_column().is_(other)
+
+    def is_not(self, other):
+        return self._id_column().is_not(other)
+
+def _interned(id_attr: str, id_column, table, value_column: str):
+    return column_property(
+        # Never correlated to the lookup table, so queries may join it too.
+        select(table.c[value_column]).where(table.c.id == id_column).correlate_except(table).scalar_subquery(),
+        comparator_factory=_Interned,
+        info={"id_column": id_attr, "table": table, "value_column": value_column},
+    )
+
 class AstNode(Base):
+    """One AST-like node.
+
+    The table is list-partitioned by ``run_id``, one partition per run
+    (``ast_nodes_r<run_id>``, see app.partitions), so purging a run drops its
+    partition instead of deleting rows. Kinds and names are stored as ids of
+    ``node_kinds`` and ``symbols``; ``kind`` and ``name`` read and compare
+    the strings. Columns are ordered widest first so rows carry no padding.
+    """
     __tablename__ = "ast_nodes"
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
-    file_id: Mapped[int] = mapped_column(ForeignKey("source_files.id", ondelete="CASCADE"), index=True)
-    kind: Mapped[str] = mapped_column(String(64), index=True)
-    name: Mapped[str | None] = mapped_column(String(256), index=True)
-    parent_id: Mapped[int | None] = mapped_column(BigInteger, index=True)
+    __table_args__ = (
+        # Name first: most lookups give a name and maybe kinds; listing a
+        # kind without a name walks the primary key in id order instead.
+        Index("ix_ast_nodes_name_kind", "name_id", "kind_id"),
+        Index("ix_ast_nodes_file_kind", "file_id", "kind_id"),
+        Index("ix_ast_nodes_file_pre", "file_id", "pre"),
+        {"postgresql_partition_by": "LIST (run_id)"},
+    )
+    # Unique constraints on a partitioned table include the partition key;
+    # the ORM identifies nodes by id alone.
+    __mapper_args__ = {"primary_key": ["id"]}
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    run_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    file_id: Mapped[int] = mapped_column(ForeignKey("source_files.id", ondelete="CASCADE"))
+    parent_id: Mapped[int | None] = mapped_column(BigInteger)
+    name_id: Mapped[int | None] = mapped_column(Integer)
+    # Pre-order position within the file, last position of the node's
+    # subtree, and distance from the top level (see tree_intervals).
+    pre: Mapped[int] = mapped_column(Integer)
+    post: Mapped[int] = mapped_column(Integer)
+    depth: Mapped[int] = mapped_column(Integer)
 
     start_byte: Mapped[int] = mapped_column(Integer)
     end_byte: Mapped[int] = mapped_column(Integer)
@@ -45,7 +160,39 @@ class AstNode(Base):
     start_col: Mapped[int] = mapped_column(Integer)
     end_line: Mapped[int] = mapped_column(Integer)
     end_col: Mapped[int] = mapped_column(Integer)
+    kind_id: Mapped[int] = mapped_column(SmallInteger)
 
     meta: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
 
+    kind: Mapped[str] = _interned("kind_id", kind_id, NodeKind.__table__, "kind")
+    name: Mapped[str | None] = _interned("name_id", name_id, Symbol.__table__, "name")
+
     file = relationship("SourceFile", back_populates="ast_nodes")
+
+class CallEdge(Base):
+    """A named call made inside a definition.
+
+    ``caller_id`` is the innermost enclosing definition and ``call_id`` the
+    ``call_expression`` node. ``callee_id`` is filled in when the run
+    finishes if ``callee_name`` resolves to a single definition; see
+    ``app.graph.resolve_callees``.
+    """
+    __tablename__ = "call_edges"
+    __table_args__ = (Index("ix_call_edges_run_callee_name", "run_id", "callee_name"),)
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    run_id: Mapped[int] = mapped_column(ForeignKey("runs.id", ondelete="CASCADE"), index=True)
+    file_id: Mapped[int] = mapped_column(ForeignKey("source_files.id", ondelete="CASCADE"), index=True)
+    caller_id: Mapped[int] = mapped_column(BigInteger, index=True)
+    call_id: Mapped[int] = mapped_column(BigInteger)
+    callee_name: Mapped[str] = mapped_column(String(256))
+    callee_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True, index=True)
+
+class FileBlob(Base):
+    """File contents stored once per sha256, in app.blob_codec's chunked layout."""
+    __tablename__ = "file_blobs"
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    codec: Mapped[str] = mapped_column(String(16))
+    size_bytes: Mapped[int] = mapped_column(BigInteger)
+    chunk_size: Mapped[int] = mapped_column(Integer)
+    chunk_ends: Mapped[list[int]] = mapped_column(ARRAY(BigInteger))
+    data: Mapped[bytes] = mapped_column(LargeBinary)
@@ -0,0 +1,199 @@
+"""Substring and fuzzy name matching.
+
+With the ``pg_trgm`` extension installed, both run in Postgres against the
+GIN index on ``symbols.name`` (migrations 0005 and 0010). Without it, ``substring_names`` and
+``fuzzy_names`` use an in-process trigram index over the distinct names in
+scope: substring candidates come from intersecting trigram posting lists,
+and fuzzy ranking uses the same similarity measure as pg_trgm, so both
+paths return the same ordering. The caller then filters nodes with
+``name IN (...)``, which resolves the names through the unique index on
+``symbols.name`` and finds the nodes by ``name_id``.
+"""
+from __future__ import annotations
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from itertools import chain
+from typing import Iterable
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from .models import AstNode, Run, Symbol
+
+# pg_trgm's default similarity threshold (pg_trgm.similarity_threshold).
+SIMILARITY_THRESHOLD = 0.3
+# Names kept per fuzzy lookup; each may match several nodes.
+MAX_FUZZY_NAMES = 1000
+# Above this many matching names a LIKE scan is cheaper than a huge IN list.
+MAX_SUBSTRING_NAMES = 5000
+# Cached fallback indexes (one per query scope).
+_MAX_INDEXES = 16
+
+_WORD = re.compile(r"[^\W_]+")
+
+_trgm_available: dict[str, bool] = {}
+_indexes: OrderedDict[tuple, tuple[int, TrigramIndex]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def trigrams(s: str) -> set[str]:
+    """Trigrams as pg_trgm extracts them: lowercased words padded '  w '."""
+    out = set()
+    for word in _WORD.findall(s.lower()):
+        padded = f"  {word} "
+        out.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return out
+
+
+def _raw_trigrams(s: str) -> set[str]:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self, names: Iterable[str]):
+        self.names: list[str] = []
+        self._grams: list[set[str]] = []
+        # Word-padded trigrams for similarity; raw lowercase ones for substrings.
+        self._postings: dict[str, list[int]] = defaultdict(list)
+        self._raw_postings: dict[str, list[int]] = defaultdict(list)
+        for name in names:
+            idx = len(self.names)
+            grams = trigrams(name)
+            self.names.append(name)
+            self._grams.append(grams)
+            for g in grams:
+                self._postings[g].append(idx)
+            for g in _raw_trigrams(name.lower()):
+                self._raw_postings[g].append(idx)
+
+    def containing(self, sub: str, ignore_case: bool = False) -> list[str] | None:
+        """Names containing ``sub``, or None if ``sub`` is under three characters."""
+        grams = _raw_trigrams(sub.lower())
+        if not grams:
+            return None
+        postings = sorted((self._raw_postings.get(g, ()) for g in grams), key=len)
+        candidates = set(postings[0])
+        for p in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(p)
+        names = self.names
+        if ignore_case:
+            low = sub.lower()
+            return [names[i] for i in candidates if low in names[i].lower()]
+        return [names[i] for i in candidates if sub in names[i]]
+
+    def search(self, query: str, threshold: float = SIMILARITY_THRESHOLD, limit: int = MAX_FUZZY_NAMES) -> list[str]:
+        """Names with similarity >= ``threshold``, best first."""
+        q = trigrams(query)
+        if not q:
+            return []
+        # Counter over the chained posting lists counts shared trigrams in C.
+        shared = Counter(chain.from_iterable(self._postings.get(g, ()) for g in q))
+        grams = self._grams
+        scored = []
+        for idx, common in shared.items():
+            score = common / (len(q) + len(grams[idx]) - common)
+            if score >= threshold:
+                scored.append((-score, self.names[idx]))
+        scored.sort()
+        return [name for _, name in scored[:limit]]
+
+
+def has_pg_trgm(db: Session) -> bool:
+    key = str(db.get_bind().url)
+    available = _trgm_available.get(key)
+    if available is None:
+        available = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+        _trgm_available[key] = available
+    return available
+
+
+def _scope_index(
+    db: Session,
+    run_id: int | None,
+    file_id: int | None,
+    kinds: tuple[str, ...] | None,
+    project_id: int | None = None,
+) -> TrigramIndex:
+    """Index of the distinct node names in scope.
+
+    Indexes are cached per scope and rebuilt when new nodes have been
+    ingested since (tracked by the highest node id) or, for a project, when
+    another of its runs completed and so changed its latest files.
+    """
+    version = db.execute(select(func.max(AstNode.id))).scalar() or 0
+    if project_id is not None:
+        newest = select(func.max(Run.id)).where(Run.project_id == project_id, Run.status == "completed")
+        version = (version, db.execute(newest).scalar())
+    key = (str(db.get_bind().url), run_id, file_id, kinds, project_id)
+    with _lock:
+        cached = _indexes.get(key)
+        if cached is not None and cached[0] == version:
+            _indexes.move_to_end(key)
+            return cached[1]
+
+    named = select(AstNode.name_id)
+    if run_id is not None:
+        named = named.where(AstNode.run_id == run_id)
+    if file_id is not None:
+        named = named.where(AstNode.file_id == file_id)
+    if kinds:
+        named = named.where(AstNode.kind.in_(kinds))
+    if project_id is not None:
+        from .query import latest_files
+
+        named = named.where(AstNode.file_id.in_(latest_files(project_id)))
+    stmt = select(Symbol.name).where(Symbol.id.in_(named))
+    index = TrigramIndex(db.execute(stmt).scalars())
+
+    with _lock:
+        _indexes[key] = (version, index)
+        _indexes.move_to_end(key)
+        while len(_indexes) > _MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def fuzzy_names(
+    db: Session,
+    query: str,
+    run_id: int | None = None,
+    file_id: int | None = None,
+    kinds: tuple[str, ...] | None = None,
+    project_id: int | None = None,
+    limit: int | None = None,
+) -> list[str]:
+    """Distinct names in scope similar to ``query``, best first.
+
+    Every indexed name has at least one node in scope, so the top ``limit``
+    names are enough to fill a ``limit``-node result.
+    """
+    return _scope_index(db, run_id, file_id, kinds, project_id).search(query, limit=min(limit or MAX_FUZZY_NAMES, MAX_FUZZY_NAMES))
+
+
+def substring_names(
+    db: Session,
+    sub: str,
+    ignore_case: bool = False,
+    run_id: int | None = None,
+    file_id: int | None = None,
+    kinds: tuple[str, ...] | None = None,
+    project_id: int | None = None,
+) -> list[str] | None:
+    """Distinct names in scope containing ``sub``.
+
+    Returns None when the index cannot narrow the search (``sub`` shorter
+    than a trigram, or too many matches); the caller should scan with LIKE.
+    """
+    names = _scope_index(db, run_id, file_id, kinds, project_id).containing(sub, ignore_case)
+    if names is None or len(names) > MAX_SUBSTRING_NAMES:
+        return None
+    return names
+
+
+def invalidate() -> None:
+    """Drop cached fallback indexes, e.g. after nodes were deleted."""
+    with _lock:
+        _indexes.clear()
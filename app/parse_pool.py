@@ -0,0 +1,157 @@
+"""Parse/extract stage of the ingest pipeline.
+
+Files are read, parsed with tree-sitter and run through ``extract_ast_like``
+either inline or fanned out to a process pool. Results always come back in
+input order so the single writer in ``app.ingest`` persists a deterministic
+sequence of files and nodes.
+
+This module is imported by pool workers, so it must stay free of database
+and web-framework imports.
+"""
+from __future__ import annotations
+import hashlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable, Iterator
+
+from .ast_extract import AstLikeNode, call_edges, extract_ast_like
+from .blob_codec import Snapshot, compress
+from .cst_codec import encode_tree
+from .treesitter import get_ts_parser
+
+# One parser per language per process; tree-sitter parsers are not picklable
+# and are cheap to reuse across files.
+_PARSERS: dict[str, object] = {}
+
+
+@dataclass
+class ParsedFile:
+    path: str
+    language: str
+    content_hash: str
+    size_bytes: int
+    cst: bytes | str | None
+    nodes: list[AstLikeNode]
+    # (caller node idx, call node idx) pairs; see ``call_edges``.
+    edges: list[tuple[int, int]] = field(default_factory=list)
+    # Compressed file contents, when snapshots are enabled.
+    snapshot: Snapshot | None = None
+
+
+def _get_parser(language: str):
+    parser = _PARSERS.get(language)
+    if parser is None:
+        parser = _PARSERS[language] = get_ts_parser(language)
+    return parser
+
+
+def hash_bytes(b: bytes) -> str:
+    return hashlib.sha256(b).hexdigest()
+
+
+def hash_file(path: str) -> tuple[str, int]:
+    """Return ``(sha256 hexdigest, size in bytes)`` without parsing."""
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256")
+        return digest.hexdigest(), f.tell()
+
+
+def _encode_cst(tree, cst_format: str) -> bytes | str | None:
+    if cst_format == "binary":
+        return encode_tree(tree)
+    if cst_format == "sexp":
+        return tree.root_node.sexp()
+    if cst_format == "none":
+        return None
+    raise ValueError(f"Unsupported CST storage format: {cst_format}")
+
+
+def parse_data(
+    language: str, path: str, data: bytes, cst_format: str = "binary", snapshot: bool = False, old_tree=None,
+) -> tuple[ParsedFile, object]:
+    """Parse ``data``, the contents of ``path``; returns the parsed file and its tree.
+
+    ``old_tree`` is an earlier tree of the same file, already ``edit``-ed to
+    match ``data``; tree-sitter then reuses its unchanged subtrees.
+    """
+    parser = _get_parser(language)
+    tree = parser.parse(data) if old_tree is None else parser.parse(data, old_tree)
+    nodes = extract_ast_like(language, tree)
+    parsed = ParsedFile(
+        path=path,
+        language=language,
+        content_hash=hash_bytes(data),
+        size_bytes=len(data),
+        cst=_encode_cst(tree, cst_format),
+        nodes=nodes,
+        edges=call_edges(nodes),
+        snapshot=compress(data) if snapshot else None,
+    )
+    return parsed, tree
+
+
+def parse_file(language: str, path: str, cst_format: str = "binary", snapshot: bool = False) -> ParsedFile:
+    with open(path, "rb") as f:
+        data = f.read()
+    return parse_data(language, path, data, cst_format, snapshot)[0]
+
+
+def _parse_chunk(items: list[tuple[str, str]], cst_format: str, snapshot: bool) -> list[ParsedFile]:
+    return [parse_file(language, path, cst_format, snapshot) for path, language in items]
+
+
+def iter_parsed(
+    language: str | None,
+    paths: Iterable[str] | Iterable[tuple[str, str]],
+    workers: int = 1,
+    chunk_size: int = 16,
+    cst_format: str = "binary",
+    snapshot: bool = False,
+) -> Iterator[ParsedFile]:
+    """Yield a ``ParsedFile`` for each path, in input order.
+
+    When ``language`` is None each item of ``paths`` is a ``(path, language)``
+    pair, so one call can cover files of several languages.
+
+    With ``workers > 1`` paths are sent to a process pool in chunks of
+    ``chunk_size``. At most ``2 * workers`` chunks are in flight at once, so
+    ``paths`` may be a lazy iterator and is never fully materialized. Inputs
+    too small to fill two chunks are parsed inline to skip pool startup.
+    With ``snapshot`` the file contents are compressed in the same stage.
+    """
+    it = iter(paths) if language is None else ((p, language) for p in paths)
+    if workers <= 1:
+        for path, lang in it:
+            yield parse_file(lang, path, cst_format, snapshot)
+        return
+
+    head = list(islice(it, chunk_size * 2))
+    if len(head) < chunk_size * 2:
+        for path, lang in head:
+            yield parse_file(lang, path, cst_format, snapshot)
+        return
+
+    def chunks() -> Iterator[list[tuple[str, str]]]:
+        yield head[:chunk_size]
+        yield head[chunk_size:]
+        while chunk := list(islice(it, chunk_size)):
+            yield chunk
+
+    # spawn keeps workers from inheriting the caller's threads and open
+    # database sockets.
+    ctx = multiprocessing.get_context("spawn")
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+    try:
+        pending: deque = deque()
+        for chunk in chunks():
+            pending.append(pool.submit(_parse_chunk, chunk, cst_format, snapshot))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # Drop queued chunks if the consumer stops early.
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,78 @@
+"""One ``ast_nodes`` partition per run.
+
+``ast_nodes`` is list-partitioned by ``run_id``. A run's partition is made
+with its first writer (``app.writers.make_writer``), and purging the run
+(``app.retention``) detaches and drops it: a catalog change, where deleting
+the rows would write, index and later vacuum every one of them.
+
+Neither blocks queries. The partition is created as a plain table and then
+attached, which takes SHARE UPDATE EXCLUSIVE on ``ast_nodes``; ``CREATE
+TABLE ... PARTITION OF`` takes ACCESS EXCLUSIVE, which would queue every
+query behind the running ones. Attaching also adds the partition's foreign
+key to ``source_files``, so it waits for ingests writing files to reach
+their next checkpoint. Partitions are detached CONCURRENTLY.
+"""
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Sample size for ``name_id`` statistics. At the default (100) ANALYZE
+# guesses a tenth of a run's distinct names, so the planner expects dozens
+# of nodes per name and prefers scanning in id order to probing by name.
+# Partitions do not inherit the setting; each is given it on creation.
+NAME_STATISTICS = 1000
+
+_EXISTS_SQL = text("SELECT to_regclass(:name) IS NOT NULL")
+# NULL when the table exists but is detached already.
+_DETACH_PENDING_SQL = text("SELECT inhdetachpending FROM pg_inherits WHERE inhrelid = to_regclass(:name)")
+
+
+def partition_name(run_id: int) -> str:
+    return f"ast_nodes_r{int(run_id)}"
+
+
+def ensure_partition(db: Session, run_id: int) -> bool:
+    """Create and attach the run's partition unless it exists; returns whether it was created.
+
+    Runs in the session's transaction. Commit soon: until then other runs
+    cannot attach theirs.
+    """
+    name = partition_name(run_id)
+    if db.execute(_EXISTS_SQL, {"name": name}).scalar():
+        return False
+    db.execute(text(f"CREATE TABLE {name} (LIKE ast_nodes INCLUDING DEFAULTS)"))
+    db.execute(text(f"ALTER TABLE {name} ALTER COLUMN name_id SET STATISTICS {NAME_STATISTICS}"))
+    db.execute(text(f"ALTER TABLE ast_nodes ATTACH PARTITION {name} FOR VALUES IN ({int(run_id)})"))
+    return True
+
+
+def analyze_partition(db: Session, run_id: int) -> None:
+    """Gather the run's planner statistics now rather than when autovacuum gets to it.
+
+    A partition filled by an ingest has none until then, and the planner
+    takes it for a few pages: resolving callees right after the ingest
+    picked nested loops over the whole run.
+    """
+    db.execute(text(f"ANALYZE {partition_name(run_id)}"))
+
+
+def drop_partition(db: Session, run_id: int) -> int:
+    """Detach and drop the run's partition; returns the number of nodes it held.
+
+    Commits the session first, since a concurrent detach waits for every
+    transaction that may still read the partition.
+    """
+    name = partition_name(run_id)
+    db.commit()
+    if not db.execute(_EXISTS_SQL, {"name": name}).scalar():
+        return 0
+    nodes = db.execute(text(f"SELECT count(*) FROM {name}")).scalar_one()
+    pending = db.execute(_DETACH_PENDING_SQL, {"name": name}).scalar()
+    db.commit()
+    # DETACH ... CONCURRENTLY cannot run inside a transaction block.
+    with db.get_bind().engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if pending is not None:
+            # An interrupted concurrent detach must be finalized instead.
+            mode = "FINALIZE" if pending else "CONCURRENTLY"
+            conn.execute(text(f"ALTER TABLE ast_nodes DETACH PARTITION {name} {mode}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+    return nodes
@@ -1,45 +1,346 @@
+import base64
+import orjson
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from .models import AstNode, SourceFile, Run
+from functools import partial
+from sqlalchemy import bindparam, select, func, case, false
+from .ast_extract import DEF_KINDS
+from .cache import FINAL_STATUSES
+from .columnar import columnar_store
+from .models import AstNode, SourceFile, Run, Project, Symbol
+from .name_index import has_pg_trgm, fuzzy_names, substring_names
 
+# Exactly the columns serialize_summary_row reads, in its order. Selecting
+# these instead of AstNode skips meta (JSONB) and ORM hydration.
+SUMMARY_COLUMNS = (
+    AstNode.id,
+    AstNode.file_id,
+    AstNode.kind,
+    AstNode.name,
+    AstNode.start_line,
+    AstNode.start_col,
+    AstNode.end_line,
+    AstNode.end_col,
+)
 
-def query_nodes(
+# How ``name`` is compared: exact, LIKE 'name%', LIKE '%name%', or ranked
+# by trigram similarity (best first, not cursor-pageable).
+MATCH_MODES = ("exact", "prefix", "substring", "fuzzy")
+
+# Rows fetched per round trip from the server-side cursor when streaming.
+STREAM_BATCH = 1000
+
+# A run's status and version, read before serving it from memory or the
+# result cache. Built once: compiling the ORM statement per call costs more
+# than the lookup itself.
+RUN_STATE = select(Run.status, Run.version).where(Run.id == bindparam("run_id"))
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps({"id": last_id})).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Return the last node id of the previous page; raises ValueError if malformed."""
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(payload["id"])
+    except Exception as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def page(nodes: list, limit: int) -> tuple[list, str | None]:
+    """Trim a ``limit + 1`` fetch to ``limit`` rows plus the cursor for the next page."""
+    if len(nodes) > limit:
+        nodes = nodes[:limit]
+        return nodes, encode_cursor(nodes[-1].id)
+    return nodes, None
+
+
+def _execute(db: Session, stmt, stream: bool, entities: bool):
+    if stream:
+        # yield_per streams through a server-side cursor in fixed-size batches.
+        stmt = stmt.execution_options(yield_per=STREAM_BATCH)
+    result = db.execute(stmt)
+    if entities:
+        result = result.scalars()
+    return result if stream else result.all()
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _symbols(clause):
+    """Nodes whose name is one of the symbols matching ``clause``."""
+    return AstNode.name_id.in_(select(Symbol.id).where(clause))
+
+
+def _name_clause(db: Session, name: str, match: str, ignore_case: bool, scope: tuple):
+    # Patterns are matched against the distinct names in ``symbols``, then
+    # nodes are found by id.
+    column = Symbol.name
+    if match == "exact":
+        return _symbols(func.lower(column) == name.lower()) if ignore_case else AstNode.name == name
+    if match == "prefix":
+        # Both forms are served by the text_pattern_ops btree indexes.
+        pattern = _escape_like(name) + "%"
+        if ignore_case:
+            return _symbols(func.lower(column).like(pattern.lower(), escape="\\"))
+        return _symbols(column.like(pattern, escape="\\"))
+    if not has_pg_trgm(db):
+        names = substring_names(db, name, ignore_case, *scope)
+        if names is not None:
+            return AstNode.name.in_(names) if names else false()
+    pattern = "%" + _escape_like(name) + "%"
+    return _symbols(column.ilike(pattern, escape="\\") if ignore_case else column.like(pattern, escape="\\"))
+
+
+def _fuzzy(db: Session, stmt, name: str, scope: tuple, limit: int | None):
+    if has_pg_trgm(db):
+        return stmt.join(Symbol, Symbol.id == AstNode.name_id).where(Symbol.name.op("%")(name)).order_by(
+            func.similarity(Symbol.name, name).desc(), AstNode.id,
+        )
+    names = fuzzy_names(db, name, *scope, limit=limit)
+    if not names:
+        return stmt.where(false())
+    rank = case({n: i for i, n in enumerate(names)}, value=Symbol.name)
+    return stmt.join(Symbol, Symbol.id == AstNode.name_id).where(Symbol.name.in_(names)).order_by(rank, AstNode.id)
+
+
+def latest_files(project_id: int, columns: tuple = (SourceFile.id,)):
+    """The project's current files: for each path, its newest file among completed runs.
+
+    Only runs since the project's last completed full walk count, so paths
+    that walk no longer found drop out. Runs still in progress are not
+    visible until they complete.
+    """
+    last_walk = (
+        select(func.max(Run.id))
+        .where(Run.project_id == project_id, Run.status == "completed", Run.full_walk)
+        .scalar_subquery()
+    )
+    return (
+        select(*columns)
+        .join(Run, Run.id == SourceFile.run_id)
+        .where(Run.project_id == project_id, Run.status == "completed", Run.id >= func.coalesce(last_walk, 0))
+        .order_by(SourceFile.path, SourceFile.run_id.desc())
+        .distinct(SourceFile.path)
+    )
+
+
+def nodes_statement(
     db: Session,
     kind: str | None = None,
     name: str | None = None,
-    limit: int = 50,
+    limit: int | None = 50,
     kinds: list[str] | None = None,
     run_id: int | None = None,
     file_id: int | None = None,
+    after_id: int | None = None,
+    columns: tuple | None = None,
+    match: str = "exact",
+    ignore_case: bool = False,
+    project_id: int | None = None,
 ):
-    stmt = select(AstNode)
+    """The SELECT behind ``query_nodes``, for callers that execute it themselves.
+
+    ``db`` is only used to resolve substring and fuzzy names (see
+    ``app.name_index``); async callers build the statement via ``run_sync``.
+    """
+    ranked = _check_match(name, match, after_id)
+    stmt = select(*columns) if columns else select(AstNode)
     if run_id is not None:
-        stmt = stmt.join(SourceFile).where(SourceFile.run_id == run_id)
+        stmt = stmt.where(AstNode.run_id == run_id)
+    if project_id is not None:
+        stmt = stmt.where(AstNode.file_id.in_(latest_files(project_id)))
     if file_id is not None:
         stmt = stmt.where(AstNode.file_id == file_id)
     if kinds:
         stmt = stmt.where(AstNode.kind.in_(kinds))
     elif kind:
         stmt = stmt.where(AstNode.kind == kind)
-    if name:
-        stmt = stmt.where(AstNode.name == name)
-    stmt = stmt.limit(limit)
-    return db.execute(stmt).scalars().all()
+    # Scope of the in-process name index used when pg_trgm is missing. It
+    # must match the filters above: fuzzy lookups keep only the top
+    # ``limit`` names in scope.
+    scope = (run_id, file_id, tuple(kinds) if kinds else (kind,) if kind else None, project_id)
+    if ranked:
+        stmt = _fuzzy(db, stmt, name, scope, limit)
+    else:
+        if name:
+            stmt = stmt.where(_name_clause(db, name, match, ignore_case, scope))
+        if after_id is not None:
+            stmt = stmt.where(AstNode.id > after_id)
+        stmt = stmt.order_by(AstNode.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
 
+defs_statement = partial(nodes_statement, kinds=DEF_KINDS)
+calls_statement = partial(nodes_statement, kind="call_expression")
 
-def query_defs(db: Session, name: str | None = None, limit: int = 50, run_id: int | None = None, file_id: int | None = None):
-    kinds = [
-        "function_definition",
-        "class_definition",
-        "function_declaration",
-        "class_declaration",
-        "method_definition",
-    ]
-    return query_nodes(db, name=name, limit=limit, kinds=kinds, run_id=run_id, file_id=file_id)
 
+def _check_match(name: str | None, match: str, after_id: int | None) -> bool:
+    """Validate ``match``; returns whether results are ranked (fuzzy)."""
+    if match not in MATCH_MODES:
+        raise ValueError(f"Unsupported match mode: {match}")
+    ranked = bool(name) and match == "fuzzy"
+    if ranked and after_id is not None:
+        raise ValueError("fuzzy matches are ranked and cannot be paged by cursor")
+    return ranked
 
-def query_calls(db: Session, name: str | None = None, limit: int = 50, run_id: int | None = None, file_id: int | None = None):
-    return query_nodes(db, kind="call_expression", name=name, limit=limit, run_id=run_id, file_id=file_id)
+
+def query_columnar(run_id: int | None, state, **filters):
+    """Summary rows from the run's columnar snapshot (``app.columnar``).
+
+    ``state`` is the run's current ``RUN_STATE`` row, None if the run is
+    gone. A snapshot that no longer matches it, or of a run being deleted,
+    is dropped. Returns None when the run is not loaded or the query needs
+    Postgres.
+    """
+    if filters.pop("project_id", None) is not None or run_id is None:
+        return None
+    finished = state is not None and state.status in FINAL_STATUSES
+    loaded = columnar_store.get(run_id, state.version if finished else None)
+    return loaded.query(**filters) if loaded is not None else None
+
+
+def query_nodes(
+    db: Session,
+    kind: str | None = None,
+    name: str | None = None,
+    limit: int | None = 50,
+    kinds: list[str] | None = None,
+    run_id: int | None = None,
+    file_id: int | None = None,
+    after_id: int | None = None,
+    stream: bool = False,
+    columns: tuple | None = None,
+    match: str = "exact",
+    ignore_case: bool = False,
+    project_id: int | None = None,
+):
+    """Nodes matching the filters in id order, starting after ``after_id``.
+
+    ``match`` selects how ``name`` is compared (see ``MATCH_MODES``);
+    ``fuzzy`` results are ordered by similarity instead and take no
+    ``after_id``. ``project_id`` restricts results to the project's latest
+    files (see ``latest_files``). Returns ``AstNode`` entities, or plain
+    rows of ``columns`` when given (e.g. ``SUMMARY_COLUMNS``). Returns a
+    list, or with ``stream`` an iterator fed from a server-side cursor that
+    must be consumed while the session is open. Summary queries on a run
+    with a columnar snapshot loaded are answered from memory.
+    """
+    if columns is SUMMARY_COLUMNS and not stream:
+        _check_match(name, match, after_id)
+        if run_id in columnar_store:
+            state = db.execute(RUN_STATE, {"run_id": run_id}).first()
+            rows = query_columnar(run_id, state, kind=kind, name=name, limit=limit, kinds=kinds, file_id=file_id,
+                                  after_id=after_id, match=match, ignore_case=ignore_case, project_id=project_id)
+            if rows is not None:
+                return rows
+    stmt = nodes_statement(db, kind=kind, name=name, limit=limit, kinds=kinds, run_id=run_id, file_id=file_id,
+                           after_id=after_id, columns=columns, match=match, ignore_case=ignore_case,
+                           project_id=project_id)
+    return _execute(db, stmt, stream, entities=not columns)
+
+
+def query_defs(
+    db: Session,
+    name: str | None = None,
+    limit: int | None = 50,
+    run_id: int | None = None,
+    file_id: int | None = None,
+    after_id: int | None = None,
+    stream: bool = False,
+    columns: tuple | None = None,
+    match: str = "exact",
+    ignore_case: bool = False,
+    project_id: int | None = None,
+):
+    return query_nodes(db, name=name, limit=limit, kinds=DEF_KINDS, run_id=run_id, file_id=file_id,
+                       after_id=after_id, stream=stream, columns=columns, match=match, ignore_case=ignore_case,
+                       project_id=project_id)
+
+
+def query_calls(
+    db: Session,
+    name: str | None = None,
+    limit: int | None = 50,
+    run_id: int | None = None,
+    file_id: int | None = None,
+    after_id: int | None = None,
+    stream: bool = False,
+    columns: tuple | None = None,
+    match: str = "exact",
+    ignore_case: bool = False,
+    project_id: int | None = None,
+):
+    return query_nodes(db, kind="call_expression", name=name, limit=limit, run_id=run_id, file_id=file_id,
+                       after_id=after_id, stream=stream, columns=columns, match=match, ignore_case=ignore_case,
+                       project_id=project_id)
+
+
+def query_children(
+    db: Session,
+    node: AstNode,
+    limit: int | None = 50,
+    after_id: int | None = None,
+    stream: bool = False,
+    columns: tuple | None = None,
+):
+    stmt = select(*columns) if columns else select(AstNode)
+    # The children are the subtree's nodes one level down, so this is the
+    # same range scan as query_descendants.
+    stmt = stmt.where(
+        AstNode.run_id == node.run_id,
+        AstNode.file_id == node.file_id,
+        AstNode.pre > node.pre,
+        AstNode.pre <= node.post,
+        AstNode.depth == node.depth + 1,
+    )
+    if after_id is not None:
+        stmt = stmt.where(AstNode.id > after_id)
+    stmt = stmt.order_by(AstNode.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return _execute(db, stmt, stream, entities=not columns)
+
+
+def query_descendants(
+    db: Session,
+    node: AstNode,
+    kind: str | None = None,
+    limit: int | None = 50,
+    after_id: int | None = None,
+    stream: bool = False,
+    columns: tuple | None = None,
+):
+    """Nodes inside ``node``'s subtree: one range scan on (file_id, pre)."""
+    stmt = select(*columns) if columns else select(AstNode)
+    stmt = stmt.where(
+        AstNode.run_id == node.run_id, AstNode.file_id == node.file_id, AstNode.pre > node.pre, AstNode.pre <= node.post,
+    )
+    if kind:
+        stmt = stmt.where(AstNode.kind == kind)
+    if after_id is not None:
+        stmt = stmt.where(AstNode.id > after_id)
+    # Ids follow pre-order within a file, so this is also document order.
+    stmt = stmt.order_by(AstNode.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return _execute(db, stmt, stream, entities=not columns)
+
+
+def query_ancestors(db: Session, node: AstNode, kind: str | None = None, columns: tuple | None = None):
+    """Nodes whose subtree contains ``node``, outermost first."""
+    stmt = select(*columns) if columns else select(AstNode)
+    stmt = stmt.where(
+        AstNode.run_id == node.run_id, AstNode.file_id == node.file_id, AstNode.pre < node.pre, AstNode.post >= node.pre,
+    )
+    if kind:
+        stmt = stmt.where(AstNode.kind == kind)
+    return _execute(db, stmt.order_by(AstNode.depth), stream=False, entities=not columns)
 
 
 def list_runs(db: Session, limit: int = 50) -> list[Run]:
@@ -50,3 +351,19 @@ def list_runs(db: Session, limit: int = 50) -> list[Run]:
 def list_run_files(db: Session, run_id: int, limit: int = 200) -> list[SourceFile]:
     stmt = select(SourceFile).where(SourceFile.run_id == run_id).limit(limit)
     return db.execute(stmt).scalars().all()
+
+
+def list_projects(db: Session, limit: int = 50) -> list[tuple[Project, int | None]]:
+    """Projects, most recently created first, each with its newest completed run id."""
+    latest_run = (
+        select(func.max(Run.id))
+        .where(Run.project_id == Project.id, Run.status == "completed")
+        .scalar_subquery()
+    )
+    stmt = select(Project, latest_run).order_by(Project.id.desc()).limit(limit)
+    return db.execute(stmt).all()
+
+
+def list_project_files(db: Session, project_id: int, limit: int = 200) -> list[SourceFile]:
+    stmt = select(SourceFile).where(SourceFile.id.in_(latest_files(project_id))).order_by(SourceFile.path)
+    return db.execute(stmt.limit(limit)).scalars().all()
@@ -0,0 +1,161 @@
+"""Garbage collection of superseded runs.
+
+A project's runs are collected after each completed ingest into it when
+``RETAIN_RUNS`` is set, or on demand (``POST /gc``). A run is kept if it
+
+- is one of the project's ``RETAIN_RUNS`` newest completed runs,
+- holds a file of the project's latest view (``query.latest_files``), or
+- is newer than the project's newest completed run (still in progress, or
+  a failure worth inspecting).
+
+Every other finished run of the project is purged. Its status is first set
+to ``deleting``, which hides it from the latest view and from incremental
+reuse. Every process stops serving it from its result cache and columnar
+snapshot, since both read the run's status first. Its nodes go with its
+``ast_nodes`` partition, detached and dropped without deleting a row
+(``app.partitions``). The remaining rows are deleted one batch of
+``GC_BATCH_FILES`` files at a time, each batch in its own short
+transaction, so ingests and queries running at the same time barely wait.
+
+Snapshots that no file refers to any more are deleted last. A concurrent
+ingest that found such a snapshot already stored, moments before, loses
+it; slices of that file are then read from the workspace.
+"""
+from __future__ import annotations
+from itertools import islice
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from . import name_index
+from .cache import FINAL_STATUSES, result_cache
+from .columnar import columnar_store
+from .config import settings
+from .leases import fail_orphaned_runs
+from .models import CallEdge, CstBlob, FileBlob, Project, Run, SourceFile
+from .partitions import drop_partition
+from .query import latest_files
+
+DELETING = "deleting"
+
+
+def runs_to_collect(db: Session, project_id: int, keep: int | None = None) -> list[int]:
+    """Finished runs of the project that the retention policy no longer keeps."""
+    keep = settings.retain_runs if keep is None else keep
+    completed = db.execute(
+        select(Run.id).where(Run.project_id == project_id, Run.status == "completed").order_by(Run.id.desc())
+    ).scalars().all()
+    if not completed or keep < 1:
+        return []
+    live = set(completed[:keep])
+    live.update(db.execute(latest_files(project_id, (SourceFile.run_id,))).scalars())
+    candidates = db.execute(
+        select(Run.id)
+        .where(Run.project_id == project_id, Run.status.in_(FINAL_STATUSES), Run.id < completed[0])
+        .order_by(Run.id)
+    ).scalars()
+    return [run_id for run_id in candidates if run_id not in live]
+
+
+def mark_deleting(db: Session, run_ids: list[int]) -> list[int]:
+    """Mark finished runs for purging and return those marked; others are left alone."""
+    if not run_ids:
+        return []
+    marked = db.execute(
+        update(Run)
+        .where(Run.id.in_(run_ids), Run.status.in_(FINAL_STATUSES))
+        .values(status=DELETING)
+        .returning(Run.id)
+    ).scalars().all()
+    db.commit()
+    # Other processes see the status and stop serving these runs.
+    for run_id in marked:
+        result_cache.invalidate_run(run_id, deleted=True)
+        columnar_store.drop(run_id)
+    return marked
+
+
+def _delete_where(db: Session, stmt) -> int:
+    return db.execute(stmt.execution_options(synchronize_session=False)).rowcount
+
+
+def purge_run(db: Session, run_id: int, batch_files: int | None = None) -> int:
+    """Delete a run marked ``deleting``, a batch of files per transaction; returns nodes deleted."""
+    batch_files = batch_files or settings.gc_batch_files
+    # Waits for incremental ingests that locked the run's files before it
+    # was marked to finish copying their nodes.
+    db.execute(select(SourceFile.id).where(SourceFile.run_id == run_id).with_for_update()).all()
+    nodes = drop_partition(db, run_id)
+    hashes: set[str] = set()
+    while True:
+        # Locks the batch's files against incremental ingests copying them.
+        files = db.execute(
+            select(SourceFile.id, SourceFile.content_hash)
+            .where(SourceFile.run_id == run_id)
+            .order_by(SourceFile.id)
+            .limit(batch_files)
+            .with_for_update()
+        ).all()
+        if not files:
+            break
+        file_ids = [file_id for file_id, _ in files]
+        hashes.update(content_hash for _, content_hash in files)
+        _delete_where(db, delete(CallEdge).where(CallEdge.file_id.in_(file_ids)))
+        _delete_where(db, delete(CstBlob).where(CstBlob.file_id.in_(file_ids)))
+        _delete_where(db, delete(SourceFile).where(SourceFile.id.in_(file_ids)))
+        db.commit()
+    _delete_where(db, delete(CallEdge).where(CallEdge.run_id == run_id))
+    _delete_where(db, delete(Run).where(Run.id == run_id, Run.status == DELETING))
+    db.commit()
+
+    it = iter(hashes)
+    while batch := list(islice(it, batch_files)):
+        in_use = select(SourceFile.id).where(SourceFile.content_hash == FileBlob.content_hash).exists()
+        _delete_where(db, delete(FileBlob).where(FileBlob.content_hash.in_(batch), ~in_use))
+        db.commit()
+
+    name_index.invalidate()
+    result_cache.invalidate_run(run_id, deleted=True)
+    columnar_store.drop(run_id)
+    return nodes
+
+
+def mark_superseded(db: Session, project_id: int | None = None, keep: int | None = None) -> list[int]:
+    """Apply the retention policy to one project, or to all; returns every run now awaiting a purge.
+
+    That includes runs left ``deleting`` by an interrupted collection.
+    Runs whose ingest process died are failed first, so they can be
+    collected (``app.leases``).
+    """
+    fail_orphaned_runs(db)
+    if project_id is None:
+        projects = db.execute(select(Project.id)).scalars().all()
+    else:
+        projects = [project_id]
+    for pid in projects:
+        mark_deleting(db, runs_to_collect(db, pid, keep))
+    stmt = select(Run.id).where(Run.status == DELETING).order_by(Run.id)
+    if project_id is not None:
+        stmt = stmt.where(Run.project_id == project_id)
+    return db.execute(stmt).scalars().all()
+
+
+def collect_garbage(db: Session, project_id: int | None = None, keep: int | None = None) -> list[int]:
+    """``mark_superseded`` and purge those runs; returns their ids."""
+    run_ids = mark_superseded(db, project_id, keep)
+    for run_id in run_ids:
+        purge_run(db, run_id)
+    return run_ids
+
+
+def start_delete(db: Session, run_id: int) -> None:
+    """Mark one finished run for purging regardless of retention.
+
+    Raises LookupError if the run does not exist and ValueError if it is
+    still being ingested.
+    """
+    status = db.execute(select(Run.status).where(Run.id == run_id)).scalar()
+    if status is None:
+        raise LookupError(f"run {run_id} not found")
+    if status != DELETING and not mark_deleting(db, [run_id]):
+        raise ValueError(f"run {run_id} is {status}; only finished runs can be deleted")
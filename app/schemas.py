@@ -1,17 +1,39 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from typing import Any
 
 class IngestRequest(BaseModel):
-    language: str
+    # Omit to detect each file's language from its extension.
+    language: str | None = None
     root_path: str | None = None
-    files: list[str]
+    # Omit to walk root_path server-side, filtered by include/exclude globs
+    # and .gitignore files.
+    files: list[str] | None = None
+    include: list[str] | None = None
+    exclude: list[str] | None = None
+    incremental: bool = False
+    # Return immediately with a pending run; poll GET /runs/{run_id}.
+    background: bool = False
+
+    @model_validator(mode="after")
+    def _files_or_root(self):
+        if self.files is None and not self.root_path:
+            raise ValueError("either files or root_path is required")
+        return self
 
 class IngestResponse(BaseModel):
     run_id: int
     files_indexed: int
+    status: str = "completed"
 
 class QueryResponse(BaseModel):
     results: list[dict[str, Any]]
+    # Opaque; pass back as ?cursor= for the next page. None on the last page.
+    next_cursor: str | None = None
+
+
+class GraphResponse(BaseModel):
+    # Node summaries plus the call depth each definition was first reached at.
+    results: list[dict[str, Any]]
 
 
 class SourceSliceRequest(BaseModel):
@@ -19,10 +41,16 @@ class SourceSliceRequest(BaseModel):
     start_byte: int
     end_byte: int
 
+class SourceBatchRequest(BaseModel):
+    slices: list[SourceSliceRequest] = []
+    # Slice each node's own byte range from its file.
+    node_ids: list[int] = []
+
 class FileResponse(BaseModel):
     id: int
     run_id: int
     path: str
+    language: str | None = None
     content_hash: str
     size_bytes: int
 
@@ -44,11 +72,66 @@ class SourceSliceResponse(BaseModel):
     end_byte: int
     text: str
 
+class SourceBatchResponse(BaseModel):
+    # One entry per requested slice, then per node id, in request order;
+    # failed entries carry "error" instead of "text".
+    results: list[dict[str, Any]]
+
+class SymbolContextResponse(BaseModel):
+    name: str
+    # Node details plus path and body "text" (or "error"); "truncated" when
+    # the byte budget cut the body.
+    definitions: list[dict[str, Any]]
+    # Node summaries plus path, enclosing "caller" and source "line".
+    call_sites: list[dict[str, Any]]
+    # Names called from the definitions, with the resolved definition id if any.
+    callees: list[dict[str, Any]]
+    imports: list[dict[str, Any]]
+    truncated: bool
+
+class BatchRequest(BaseModel):
+    # Each entry is {"op": <operation>, **arguments}; see app.batch.OPERATIONS.
+    operations: list[dict[str, Any]]
+
+class BatchResponse(BaseModel):
+    # One result per operation, in request order; failed operations carry "error".
+    results: list[Any]
+
 class RunResponse(BaseModel):
     id: int
     language: str
     root_path: str | None
+    project_id: int | None = None
     created_at: str | None
+    status: str
+    files_total: int | None
+    files_done: int
+    bytes_done: int
+    error: str | None
+    finished_at: str | None
+
+class ProjectResponse(BaseModel):
+    id: int
+    root_path: str
+    created_at: str | None
+    # Newest completed run; the latest view may also draw on earlier ones.
+    latest_run_id: int | None
+
+class ProjectListResponse(BaseModel):
+    results: list[ProjectResponse]
+
+class GcResponse(BaseModel):
+    # Runs marked "deleting"; their rows are purged in the background.
+    runs: list[int]
+
+class ColumnarRunResponse(BaseModel):
+    run_id: int
+    nodes: int
+    names: int
+    bytes: int
+
+class ColumnarListResponse(BaseModel):
+    results: list[ColumnarRunResponse]
 
 class RunListResponse(BaseModel):
     results: list[RunResponse]
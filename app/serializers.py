@@ -1,4 +1,4 @@
-from .models import AstNode, SourceFile, Run
+from .models import AstNode, SourceFile, Run, Project
 
 
 def serialize_node_summary(n: AstNode) -> dict:
@@ -13,6 +13,26 @@ def serialize_node_summary(n: AstNode) -> dict:
     }
 
 
+def serialize_summary_row(row) -> dict:
+    """Same shape as ``serialize_node_summary`` for a ``SUMMARY_COLUMNS`` row."""
+    node_id, file_id, kind, name, start_line, start_col, end_line, end_col = row
+    return {
+        "id": node_id,
+        "file_id": file_id,
+        "kind": kind,
+        "name": name,
+        "start": [start_line, start_col],
+        "end": [end_line, end_col],
+    }
+
+
+def serialize_graph_row(row) -> dict:
+    """Summary plus ``depth`` for a row from ``app.graph`` traversals."""
+    out = serialize_summary_row(row[:8])
+    out["depth"] = row[8]
+    return out
+
+
 def serialize_node_detail(n: AstNode) -> dict:
     """Full node representation including byte offsets and meta."""
     return {
@@ -34,6 +54,7 @@ def serialize_file(f: SourceFile) -> dict:
         "id": f.id,
         "run_id": f.run_id,
         "path": f.path,
+        "language": f.language,
         "content_hash": f.content_hash,
         "size_bytes": f.size_bytes,
     }
@@ -44,5 +65,21 @@ def serialize_run(r: Run) -> dict:
         "id": r.id,
         "language": r.language,
         "root_path": r.root_path,
+        "project_id": r.project_id,
         "created_at": r.created_at,
+        "status": r.status,
+        "files_total": r.files_total,
+        "files_done": r.files_done,
+        "bytes_done": r.bytes_done,
+        "error": r.error,
+        "finished_at": r.finished_at,
+    }
+
+
+def serialize_project(p: Project, latest_run_id: int | None) -> dict:
+    return {
+        "id": p.id,
+        "root_path": p.root_path,
+        "created_at": p.created_at,
+        "latest_run_id": latest_run_id,
     }
@@ -0,0 +1,160 @@
+"""Content-addressed source snapshots.
+
+With ``SOURCE_SNAPSHOTS`` enabled, ingest stores each distinct file content
+once in ``file_blobs``, keyed by its sha256 and compressed in chunks (see
+``app.blob_codec``). Node slices are then served from the exact bytes that
+were parsed, even after the workspace changed or on hosts without it.
+
+Reads fetch only the compressed chunks a slice overlaps, via ``substring``
+on the ``bytea`` column (stored uncompressed by TOAST, so Postgres reads
+just those pages), and keep decompressed chunks in a byte-budgeted LRU.
+Blobs never change once written, so neither cache needs invalidation.
+"""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .blob_codec import Snapshot, decompress_chunk
+from .config import settings
+from .models import FileBlob
+
+# Compressed byte ranges for many (hash, offset, length) requests in one round trip.
+_FETCH_RANGES_SQL = text("""
+SELECT r.ord, substring(b.data FROM r.off + 1 FOR r.len)
+FROM unnest(CAST(:hashes AS text[]), CAST(:offsets AS int[]), CAST(:lengths AS int[]))
+    WITH ORDINALITY AS r(content_hash, off, len, ord)
+JOIN file_blobs b ON b.content_hash = r.content_hash
+""")
+
+
+def store_snapshots(db: Session, snapshots: Iterable[tuple[str, Snapshot]]) -> None:
+    """Insert ``(content_hash, snapshot)`` pairs, skipping contents already stored."""
+    rows = {
+        content_hash: {
+            "content_hash": content_hash,
+            "codec": snap.codec,
+            "size_bytes": snap.size_bytes,
+            "chunk_size": snap.chunk_size,
+            "chunk_ends": snap.chunk_ends,
+            "data": snap.data,
+        }
+        for content_hash, snap in snapshots
+    }
+    if rows:
+        db.execute(insert(FileBlob).on_conflict_do_nothing(index_elements=["content_hash"]), list(rows.values()))
+
+
+def missing_snapshots(db: Session, hashes: Iterable[str]) -> set[str]:
+    hashes = set(hashes)
+    if not hashes:
+        return set()
+    stored = db.execute(select(FileBlob.content_hash).where(FileBlob.content_hash.in_(hashes))).scalars()
+    return hashes - set(stored)
+
+
+class SnapshotCache:
+    """Blob metadata plus an LRU of decompressed chunks, bounded in bytes."""
+
+    def __init__(self, max_bytes: int | None = None):
+        self.max_bytes = settings.snapshot_cache_bytes if max_bytes is None else max_bytes
+        self._meta: dict[str, tuple[str, int, int, list[int]]] = {}
+        self._chunks: OrderedDict[tuple[str, int], bytes] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _load_meta(self, db: Session, hashes: set[str]) -> None:
+        with self._lock:
+            missing = [h for h in hashes if h not in self._meta]
+        if not missing:
+            return
+        rows = db.execute(
+            select(FileBlob.content_hash, FileBlob.codec, FileBlob.size_bytes, FileBlob.chunk_size,
+                   FileBlob.chunk_ends)
+            .where(FileBlob.content_hash.in_(missing))
+        ).all()
+        with self._lock:
+            for content_hash, codec, size, chunk_size, ends in rows:
+                self._meta[content_hash] = (codec, size, chunk_size, list(ends))
+
+    def _put_chunk(self, key: tuple[str, int], chunk: bytes) -> None:
+        with self._lock:
+            if key in self._chunks:
+                return
+            self._chunks[key] = chunk
+            self._bytes += len(chunk)
+            while self._bytes > self.max_bytes and len(self._chunks) > 1:
+                _, old = self._chunks.popitem(last=False)
+                self._bytes -= len(old)
+
+    def read_many(self, db: Session, requests: list[tuple[str, int, int]]) -> list[str | None]:
+        """Text for each ``(content_hash, start_byte, end_byte)``; None where no snapshot exists."""
+        self._load_meta(db, {h for h, _, _ in requests})
+
+        # Chunks each request needs, and which of those are not cached yet.
+        needed: list[tuple[str, range] | None] = []
+        chunks: dict[tuple[str, int], bytes] = {}
+        fetch: list[tuple[str, int]] = []
+        with self._lock:
+            for content_hash, start, end in requests:
+                meta = self._meta.get(content_hash)
+                if meta is None:
+                    needed.append(None)
+                    continue
+                _, size, chunk_size, _ = meta
+                start, end = max(0, min(start, size)), max(0, min(end, size))
+                span = range(start // chunk_size, (end - 1) // chunk_size + 1) if end > start else range(0)
+                needed.append((content_hash, span))
+                for idx in span:
+                    key = (content_hash, idx)
+                    if key in chunks:
+                        continue
+                    cached = self._chunks.get(key)
+                    if cached is None:
+                        fetch.append(key)
+                        chunks[key] = b""
+                    else:
+                        self._chunks.move_to_end(key)
+                        chunks[key] = cached
+
+        if fetch:
+            params = {"hashes": [], "offsets": [], "lengths": []}
+            for content_hash, idx in fetch:
+                ends = self._meta[content_hash][3]
+                begin = ends[idx - 1] if idx else 0
+                params["hashes"].append(content_hash)
+                params["offsets"].append(begin)
+                params["lengths"].append(ends[idx] - begin)
+            for ordinal, compressed in db.execute(_FETCH_RANGES_SQL, params):
+                key = fetch[ordinal - 1]
+                chunk = decompress_chunk(self._meta[key[0]][0], bytes(compressed))
+                chunks[key] = chunk
+                self._put_chunk(key, chunk)
+
+        out: list[str | None] = []
+        for (content_hash, start, end), need in zip(requests, needed):
+            if need is None:
+                out.append(None)
+                continue
+            content_hash, span = need
+            if not span:
+                out.append("")
+                continue
+            chunk_size = self._meta[content_hash][2]
+            joined = b"".join(chunks[(content_hash, idx)] for idx in span)
+            offset = span.start * chunk_size
+            out.append(joined[max(0, start) - offset:end - offset].decode("utf-8", errors="replace"))
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._meta.clear()
+            self._chunks.clear()
+            self._bytes = 0
+
+
+snapshot_cache = SnapshotCache()
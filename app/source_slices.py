@@ -0,0 +1,144 @@
+"""Source slices read through memory-mapped files.
+
+Files are mapped once and kept in a small LRU keyed by path. Every read
+stats the file and remaps it if its mtime or size changed, so an edited
+file is never served from a stale mapping. Slices are decoded straight out
+of the mapping without an intermediate ``bytes`` copy.
+
+Evicted mappings are not closed explicitly; they are released once the
+last reader drops its reference, so eviction never races a concurrent read.
+"""
+from __future__ import annotations
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import AstNode, SourceFile
+from .snapshots import snapshot_cache
+
+
+class _Mapped:
+    __slots__ = ("buf", "mtime_ns", "size")
+
+    def __init__(self, buf, mtime_ns: int, size: int):
+        self.buf = buf
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+
+class SliceCache:
+    """LRU of memory-mapped source files, validated by mtime and size."""
+
+    def __init__(self, max_files: int | None = None):
+        self.max_files = settings.source_cache_files if max_files is None else max_files
+        self._files: OrderedDict[str, _Mapped] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _map(self, path: str):
+        st = os.stat(path)
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size:
+                self._files.move_to_end(path)
+                return entry.buf
+        with open(path, "rb") as f:
+            # Empty files cannot be mapped.
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else b""
+        with self._lock:
+            self._files[path] = _Mapped(buf, st.st_mtime_ns, st.st_size)
+            self._files.move_to_end(path)
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+        return buf
+
+    def read(self, path: str, start_byte: int, end_byte: int) -> str:
+        """Text of ``[start_byte, end_byte)``; raises OSError if the file is unreadable."""
+        buf = self._map(path)
+        with memoryview(buf) as view:
+            return str(view[max(0, start_byte):max(0, end_byte)], "utf-8", "replace")
+
+    def read_many(self, slices: Iterable[tuple[str, int, int]]) -> list[str | OSError]:
+        """Read several slices; files are stat-ed and mapped once per batch.
+
+        Unreadable files yield their ``OSError`` in place of the text.
+        """
+        maps: dict[str, object] = {}
+        out: list[str | OSError] = []
+        for path, start_byte, end_byte in slices:
+            buf = maps.get(path)
+            if buf is None:
+                try:
+                    buf = maps[path] = self._map(path)
+                except OSError as exc:
+                    buf = maps[path] = exc
+            if isinstance(buf, OSError):
+                out.append(buf)
+                continue
+            with memoryview(buf) as view:
+                out.append(str(view[max(0, start_byte):max(0, end_byte)], "utf-8", "replace"))
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._files.clear()
+
+
+slice_cache = SliceCache()
+
+
+def _slice_result(path: str, start_byte: int, end_byte: int, text: str | OSError) -> dict:
+    out = {"path": path, "start_byte": start_byte, "end_byte": end_byte}
+    if isinstance(text, OSError):
+        out["error"] = f"file not found: {path}" if isinstance(text, FileNotFoundError) else str(text)
+    else:
+        out["text"] = text
+    return out
+
+
+def read_ingested(db: Session, ranges: list[tuple[str, str, int, int]]) -> list[str | OSError]:
+    """Text of ``(path, content_hash, start_byte, end_byte)`` ranges as they were ingested.
+
+    Each range comes from the stored snapshot of that content when there is
+    one (see ``app.snapshots``), otherwise from the file on disk. Unreadable
+    files yield their ``OSError`` in place of the text.
+    """
+    texts = snapshot_cache.read_many(db, [(h, s, e) for _, h, s, e in ranges])
+    live = iter(slice_cache.read_many([(p, s, e) for (p, _, s, e), t in zip(ranges, texts) if t is None]))
+    return [t if t is not None else next(live) for t in texts]
+
+
+def read_slices(
+    db: Session,
+    slices: list[tuple[str, int, int]] | None = None,
+    node_ids: list[int] | None = None,
+) -> list[dict]:
+    """Slice results for explicit ranges followed by node ids, in request order.
+
+    Node ranges, paths and content hashes are looked up in one query and
+    read with ``read_ingested``; explicit ranges read the live file. Missing
+    nodes and unreadable files produce an entry with ``error`` instead of
+    ``text``.
+    """
+    slices = list(slices or ())
+    results = [_slice_result(p, s, e, t) for (p, s, e), t in zip(slices, slice_cache.read_many(slices))]
+    if node_ids:
+        rows = db.execute(
+            select(AstNode.id, SourceFile.path, SourceFile.content_hash, AstNode.start_byte, AstNode.end_byte)
+            .join(SourceFile)
+            .where(AstNode.id.in_(node_ids))
+        ).all()
+        found = {node_id: (path, h, s, e) for node_id, path, h, s, e in rows}
+        texts = iter(read_ingested(db, [found[n] for n in node_ids if n in found]))
+        for node_id in node_ids:
+            if node_id not in found:
+                results.append({"node_id": node_id, "error": "node not found"})
+                continue
+            path, _, s, e = found[node_id]
+            results.append({"node_id": node_id, **_slice_result(path, s, e, next(texts))})
+    return results
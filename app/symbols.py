@@ -0,0 +1,67 @@
+"""Interned node kinds and names.
+
+``ast_nodes`` stores ``kind_id`` (a smallint into ``node_kinds``) and
+``name_id`` (into ``symbols``) instead of the strings. A name is stored once
+however many nodes carry it, and so are its prefix and trigram index
+entries; the node indexes hold 2- and 4-byte ids. ``AstNode.kind`` and
+``AstNode.name`` read the strings back and compare through the ids (see
+``app.models``).
+
+Writers intern each batch's kinds and names before copying its nodes.
+Interning commits on a connection of its own: the rows are visible to every
+ingest at once, and an ingest never waits on another's uncommitted names,
+so concurrent ingests cannot deadlock on ``symbols``. Ids are never reused
+or deleted, so a writer caches them for its run. A failed ingest may leave
+names no node refers to; they cost one row each.
+"""
+from __future__ import annotations
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Values that are not interned yet are inserted in sorted order, so two
+# ingests interning overlapping sets lock rows in the same order. Existing
+# values are skipped before the insert: ON CONFLICT alone would still burn a
+# sequence value per conflict, and node_kinds ids are smallints.
+_INTERN_SQL = """
+INSERT INTO {table} ({column})
+SELECT v FROM unnest(CAST(:values AS text[])) AS v
+WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{column} = v)
+ORDER BY v
+ON CONFLICT DO NOTHING
+"""
+_LOOKUP_SQL = "SELECT {column}, id FROM {table} WHERE {column} = ANY(CAST(:values AS text[]))"
+
+
+class Interner:
+    """Ids of one lookup table's values, cached for the life of a writer."""
+
+    def __init__(self, db: Session, table: str, column: str):
+        self.db = db
+        self.ids: dict[str, int] = {}
+        self._intern = text(_INTERN_SQL.format(table=table, column=column))
+        self._lookup = text(_LOOKUP_SQL.format(table=table, column=column))
+
+    def add(self, values: Iterable[str | None]) -> None:
+        """Intern every value not seen yet; None is skipped."""
+        missing = sorted({v for v in values if v is not None and v not in self.ids})
+        if not missing:
+            return
+        # Any engine the session is bound to; a Connection exposes its own.
+        with self.db.get_bind().engine.begin() as conn:
+            conn.execute(self._intern, {"values": missing})
+            # A fresh snapshot: values a concurrent ingest committed while
+            # this insert waited on them are visible now.
+            self.ids.update(conn.execute(self._lookup, {"values": missing}).all())
+
+    def get(self, value: str | None) -> int | None:
+        return None if value is None else self.ids[value]
+
+
+def kind_interner(db: Session) -> Interner:
+    return Interner(db, "node_kinds", "kind")
+
+
+def name_interner(db: Session) -> Interner:
+    return Interner(db, "symbols", "name")
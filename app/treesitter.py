@@ -1,3 +1,4 @@
+import os
 from tree_sitter_languages import get_parser
 
 LANG_MAP = {
@@ -11,8 +12,27 @@ LANG_MAP = {
     "scss": "scss",
 }
 
+# File extension -> LANG_MAP key, for directory ingests.
+EXT_MAP = {
+    ".py": "python",
+    ".pyi": "python",
+    ".js": "javascript",
+    ".mjs": "javascript",
+    ".cjs": "javascript",
+    ".jsx": "jsx",
+    ".ts": "ts",
+    ".mts": "ts",
+    ".cts": "ts",
+    ".tsx": "tsx",
+    ".css": "css",
+    ".scss": "scss",
+}
+
 def get_ts_parser(language: str):
     lang = LANG_MAP.get(language.lower())
     if not lang:
         raise ValueError(f"Unsupported language: {language}")
     return get_parser(lang)
+
+def language_for_path(path: str) -> str | None:
+    return EXT_MAP.get(os.path.splitext(path)[1].lower())
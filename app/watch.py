@@ -0,0 +1,433 @@
+"""Watch mode: keep a project's index live as files change.
+
+``Watcher`` ingests ``root_path`` once (incrementally, so unchanged files
+are copied from earlier runs) and then updates that run in place. File
+events come from ``watchdog`` when it is installed, otherwise from polling
+the tree's mtimes and sizes every ``WATCH_POLL_SECONDS``. Events are
+debounced for ``WATCH_DEBOUNCE_SECONDS``, so an editor's save burst is one
+update.
+
+Each update re-checks the touched paths with the walk's filtering rules,
+re-parses the ones whose contents changed and replaces their ``SourceFile``
+rows, and with them their nodes, call edges and CSTs, in a single
+transaction; readers see the old or the new version of a batch, never a
+mix. Trees of recently parsed files are kept (``WATCH_TREE_CACHE_FILES``),
+so a file edited again is re-parsed incrementally: the old tree is
+``edit``-ed with the changed byte range and handed to tree-sitter, which
+reuses every subtree outside it.
+
+Each update first locks the run's row and checks it is still completed.
+Once retention marks it ``deleting`` (a later run of the project made it
+collectable), the watcher re-ingests the root into a new run and keeps that
+one live instead.
+
+Run it with ``python -m app.watch ROOT [--language L] [--include G]
+[--exclude G] [--poll]``.
+"""
+from __future__ import annotations
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from . import name_index
+from .ast_extract import DEF_KINDS
+from .cache import result_cache
+from .columnar import columnar_store
+from .config import settings
+from .db import SessionLocal
+from .discover import iter_source_files, source_language
+from .graph import resolve_callees
+from .ingest import ingest_directory, project_root
+from .models import AstNode, Project, Run, SourceFile
+from .parse_pool import hash_bytes, parse_data
+from .writers import make_writer
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover - optional dependency
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+
+def _common_prefix(a: bytes, b: bytes, limit: int) -> int:
+    # Bisection over slice compares: O(log n) memcmp calls instead of a
+    # Python loop over every byte.
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: bytes, b: bytes, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _point(data: bytes, offset: int) -> tuple[int, int]:
+    """tree-sitter (row, column in bytes) of ``offset``."""
+    return data.count(b"\n", 0, offset), offset - (data.rfind(b"\n", 0, offset) + 1)
+
+
+def edit_tree(tree, old: bytes, new: bytes) -> None:
+    """Record on ``tree`` (parsed from ``old``) the single byte range that differs in ``new``."""
+    start = _common_prefix(old, new, min(len(old), len(new)))
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - start)
+    old_end, new_end = len(old) - suffix, len(new) - suffix
+    tree.edit(
+        start_byte=start,
+        old_end_byte=old_end,
+        new_end_byte=new_end,
+        start_point=_point(old, start),
+        old_end_point=_point(old, old_end),
+        new_end_point=_point(new, new_end),
+    )
+
+
+class TreeCache:
+    """Last parsed contents and tree per path, least recently used evicted."""
+
+    def __init__(self, max_files: int | None = None):
+        self.max_files = settings.watch_tree_cache_files if max_files is None else max_files
+        self._trees: OrderedDict[str, tuple[str, bytes, object]] = OrderedDict()
+
+    def get(self, path: str, language: str) -> tuple[bytes, object] | None:
+        entry = self._trees.get(path)
+        if entry is None or entry[0] != language:
+            return None
+        self._trees.move_to_end(path)
+        return entry[1], entry[2]
+
+    def put(self, path: str, language: str, data: bytes, tree) -> None:
+        if self.max_files < 1:
+            return
+        self._trees[path] = (language, data, tree)
+        self._trees.move_to_end(path)
+        while len(self._trees) > self.max_files:
+            self._trees.popitem(last=False)
+
+    def discard(self, path: str) -> None:
+        self._trees.pop(path, None)
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: Watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        if event.is_directory:
+            # A directory created, moved or deleted touches files that get
+            # no events of their own.
+            self.watcher.notify_rescan()
+            return
+        self.watcher.notify(event.src_path)
+        if getattr(event, "dest_path", ""):
+            self.watcher.notify(event.dest_path)
+
+
+class WatchedRunGone(RuntimeError):
+    """The watched run is no longer completed (being deleted, or gone)."""
+
+
+class Watcher:
+    """Keeps one run of ``root_path`` in step with the files on disk.
+
+    ``start`` ingests the root (or adopts ``run_id``, a completed run of
+    it) and ``run_forever`` applies changes until ``stop`` is called.
+    ``apply`` can also be called directly with paths known to have changed.
+    """
+
+    def __init__(
+        self,
+        root_path: str,
+        language: str | None = None,
+        include: list[str] | None = None,
+        exclude: list[str] | None = None,
+        run_id: int | None = None,
+        debounce: float | None = None,
+        poll_interval: float | None = None,
+        use_watchdog: bool = True,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.root_path = root_path
+        self.language = language
+        self.include = include
+        self.exclude = exclude
+        self.run_id = run_id
+        self.debounce = settings.watch_debounce_seconds if debounce is None else debounce
+        self.poll_interval = settings.watch_poll_seconds if poll_interval is None else poll_interval
+        self.use_watchdog = use_watchdog and Observer is not None
+        self.session_factory = session_factory
+        self.trees = TreeCache()
+        self._stat: dict[str, tuple[int, int]] = {}
+        self._pending: set[str] = set()
+        self._rescan = False
+        self._last_event = 0.0
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+
+    def _snapshot(self) -> dict[str, tuple[int, int]]:
+        stat = {}
+        for path, _ in iter_source_files(
+            self.root_path, language=self.language, include=self.include, exclude=self.exclude,
+        ):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stat[path] = (st.st_mtime_ns, st.st_size)
+        return stat
+
+    def start(self) -> int:
+        """Ingest the root unless a run was given; returns the run id kept live."""
+        self._stat = self._snapshot()
+        with self.session_factory() as db:
+            if self.run_id is None:
+                self.run_id = ingest_directory(
+                    db, self.root_path, language=self.language, include=self.include, exclude=self.exclude,
+                    incremental=True,
+                )
+            row = db.execute(
+                select(Run.status, Project.root_path)
+                .outerjoin(Project, Project.id == Run.project_id)
+                .where(Run.id == self.run_id)
+            ).first()
+            status, root = row if row is not None else (None, None)
+            if status != "completed":
+                raise ValueError(f"run {self.run_id} is {status}; only completed runs can be watched")
+            if root != project_root(self.root_path):
+                raise ValueError(f"run {self.run_id} is of {root}, not {project_root(self.root_path)}")
+        # Files changed while the initial ingest walked the tree.
+        self.notify_rescan()
+        return self.run_id
+
+    def _path(self, path: str) -> str:
+        # Absolute, as iter_source_files yields and rows store.
+        return os.path.abspath(path)
+
+    def notify(self, path: str) -> None:
+        with self._cond:
+            self._pending.add(self._path(path))
+            self._last_event = time.monotonic()
+            self._cond.notify()
+
+    def notify_rescan(self) -> None:
+        with self._cond:
+            self._rescan = True
+            self._last_event = time.monotonic()
+            self._cond.notify()
+
+    def poll(self) -> set[str]:
+        """Paths added, changed or removed since the last snapshot."""
+        stat = self._snapshot()
+        changed = {p for p, s in stat.items() if self._stat.get(p) != s}
+        changed.update(p for p in self._stat if p not in stat)
+        self._stat = stat
+        return changed
+
+    def apply(self, paths: Iterable[str]) -> dict:
+        """Bring the run's rows for ``paths`` up to date in one transaction.
+
+        Returns counts of files ``parsed`` (and how many of those
+        ``incremental``-ly) and ``removed``; paths whose contents are
+        unchanged are skipped. Raises ``WatchedRunGone`` once the run is no
+        longer completed.
+        """
+        paths = sorted({self._path(p) for p in paths})
+        stats = {"parsed": 0, "incremental": 0, "removed": 0}
+        if not paths:
+            return stats
+        with self.session_factory() as db:
+            # Held until commit, so retention cannot mark the run deleting
+            # (and purge its partition) halfway through. The row is updated
+            # below; locking it for update now avoids upgrading a share lock.
+            status = db.execute(
+                select(Run.status).where(Run.id == self.run_id).with_for_update(key_share=True)
+            ).scalar()
+            if status != "completed":
+                raise WatchedRunGone(f"run {self.run_id} is {status}")
+            stored = {
+                path: (file_id, content_hash, size)
+                for file_id, path, content_hash, size in db.execute(
+                    select(SourceFile.id, SourceFile.path, SourceFile.content_hash, SourceFile.size_bytes)
+                    .where(SourceFile.run_id == self.run_id, SourceFile.path.in_(paths))
+                )
+            }
+            stale: list[int] = []
+            parsed_files = []
+            for path in paths:
+                language = source_language(self.root_path, path, self.language, self.include, self.exclude)
+                data = None
+                if language is not None:
+                    try:
+                        with open(path, "rb") as f:
+                            data = f.read()
+                    except OSError:
+                        pass
+                old = stored.get(path)
+                if data is None:
+                    self.trees.discard(path)
+                    if old is not None:
+                        stale.append(old[0])
+                        stats["removed"] += 1
+                    continue
+                if old is not None and old[1] == hash_bytes(data):
+                    continue
+                cached = self.trees.get(path, language)
+                old_tree = None
+                if cached is not None:
+                    old_tree = cached[1]
+                    edit_tree(old_tree, cached[0], data)
+                    stats["incremental"] += 1
+                parsed, tree = parse_data(
+                    language, path, data, settings.cst_storage, settings.source_snapshots, old_tree=old_tree,
+                )
+                self.trees.put(path, language, data, tree)
+                parsed_files.append(parsed)
+                if old is not None:
+                    stale.append(old[0])
+            if not stale and not parsed_files:
+                return stats
+
+            # Every name whose resolution the swap can change: definitions
+            # that go away or appear, and calls made by the new files.
+            names = set(db.execute(
+                select(AstNode.name).distinct()
+                .where(AstNode.file_id.in_(stale), AstNode.kind.in_(DEF_KINDS), AstNode.name.is_not(None))
+            ).scalars())
+            for parsed in parsed_files:
+                names.update(n.name for n in parsed.nodes if n.kind in DEF_KINDS and n.name)
+                names.update(parsed.nodes[call].name for _, call in parsed.edges)
+
+            removed_bytes = sum(size for file_id, _, size in stored.values() if file_id in stale)
+            # Nodes, call edges and CSTs go with their files (ON DELETE CASCADE).
+            db.execute(delete(SourceFile).where(SourceFile.id.in_(stale)).execution_options(synchronize_session=False))
+            writer = make_writer(db, self.run_id)
+            for parsed in parsed_files:
+                writer.add(parsed)
+            writer.flush()
+            resolve_callees(db, self.run_id, sorted(names))
+            db.execute(
+                update(Run)
+                .where(Run.id == self.run_id)
+                .values(
+                    files_done=Run.files_done + len(parsed_files) - len(stale),
+                    files_total=Run.files_total + len(parsed_files) - len(stale),
+                    bytes_done=Run.bytes_done + sum(p.size_bytes for p in parsed_files) - removed_bytes,
+                    version=Run.version + 1,
+                )
+            )
+            db.commit()
+        stats["parsed"] = len(parsed_files)
+
+        # Other processes see the new version and stop serving the old rows;
+        # this one drops them now.
+        result_cache.invalidate_run(self.run_id, deleted=True)
+        columnar_store.drop(self.run_id)
+        name_index.invalidate()
+        return stats
+
+    def _wait_for_batch(self) -> tuple[set[str], bool] | None:
+        """Block until events have been quiet for ``debounce`` seconds; None once stopped."""
+        timeout = None if self.use_watchdog else self.poll_interval
+        with self._cond:
+            while not self._stopped.is_set():
+                if self._pending or self._rescan:
+                    quiet = time.monotonic() - self._last_event
+                    if quiet >= self.debounce:
+                        paths, rescan = self._pending, self._rescan
+                        self._pending, self._rescan = set(), False
+                        return paths, rescan
+                    self._cond.wait(self.debounce - quiet)
+                elif not self._cond.wait(timeout):
+                    return set(), True
+        return None
+
+    def run_forever(self) -> None:
+        """Apply changes as they happen until ``stop``; call ``start`` first."""
+        observer = None
+        if self.use_watchdog:
+            observer = Observer()
+            observer.schedule(_EventHandler(self), self.root_path, recursive=True)
+            observer.start()
+        try:
+            while (batch := self._wait_for_batch()) is not None:
+                paths, rescan = batch
+                if rescan:
+                    paths |= self.poll()
+                if not paths:
+                    continue
+                t0 = time.perf_counter()
+                try:
+                    stats = self.apply(paths)
+                except WatchedRunGone as exc:
+                    logger.warning("%s; re-ingesting %s into a new run", exc, self.root_path)
+                    self.run_id = None
+                    self.start()
+                    continue
+                except Exception:
+                    logger.exception("watch update of %d paths failed", len(paths))
+                    continue
+                if stats["parsed"] or stats["removed"]:
+                    logger.info(
+                        "run %s: %d parsed (%d incremental), %d removed in %.1f ms", self.run_id,
+                        stats["parsed"], stats["incremental"], stats["removed"], (time.perf_counter() - t0) * 1e3,
+                    )
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped.set()
+            self._cond.notify_all()
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m app.watch", description=__doc__.splitlines()[0])
+    ap.add_argument("root_path")
+    ap.add_argument("--language")
+    ap.add_argument("--include", action="append")
+    ap.add_argument("--exclude", action="append")
+    ap.add_argument("--run-id", type=int, help="completed run of the root to keep live instead of ingesting")
+    ap.add_argument("--poll", action="store_true", help="poll even if watchdog is installed")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    watcher = Watcher(
+        args.root_path, language=args.language, include=args.include, exclude=args.exclude,
+        run_id=args.run_id, use_watchdog=not args.poll,
+    )
+    run_id = watcher.start()
+    logger.info("watching %s as run %d (%s)", args.root_path, run_id,
+                "watchdog" if watcher.use_watchdog else f"polling every {watcher.poll_interval}s")
+    try:
+        watcher.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
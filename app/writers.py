@@ -0,0 +1,199 @@
+"""Persist parsed files for an ingest run.
+
+``CopyWriter`` buffers files and writes each batch with psycopg ``COPY``:
+file and node ids are reserved from their sequences up front, so
+``parent_id`` and call-edge endpoints are resolved in memory and no row is
+touched twice.
+``OrmWriter`` is the portable fallback for non-psycopg drivers.
+Both intern node kinds and names first (``app.symbols``) and write into
+the run's ``ast_nodes`` partition, which ``make_writer`` creates.
+"""
+from __future__ import annotations
+import orjson
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .ast_extract import tree_intervals
+from .config import settings
+from .models import SourceFile, CstBlob, AstNode, CallEdge
+from .parse_pool import ParsedFile
+from .partitions import ensure_partition
+from .snapshots import store_snapshots
+from .symbols import kind_interner, name_interner
+
+_NODE_COLUMNS = (
+    "id", "run_id", "file_id", "parent_id", "name_id", "pre", "post", "depth", "start_byte", "end_byte",
+    "start_line", "start_col", "end_line", "end_col", "kind_id", "meta",
+)
+
+# One round trip reserves ids for every file and node in a batch.
+_RESERVE_IDS_SQL = text("""
+SELECT
+    ARRAY(SELECT nextval(pg_get_serial_sequence('source_files', 'id')) FROM generate_series(1, :files)),
+    ARRAY(SELECT nextval(pg_get_serial_sequence('ast_nodes', 'id')) FROM generate_series(1, :nodes))
+""")
+
+
+class OrmWriter:
+    """Write each file through the ORM as it arrives."""
+
+    def __init__(self, db: Session, run_id: int):
+        self.db = db
+        self.run_id = run_id
+        self.kinds = kind_interner(db)
+        self.names = name_interner(db)
+
+    def add(self, parsed: ParsedFile) -> None:
+        db = self.db
+        self.kinds.add(n.kind for n in parsed.nodes)
+        self.names.add(n.name for n in parsed.nodes)
+        file_rec = SourceFile(
+            run_id=self.run_id,
+            path=parsed.path,
+            language=parsed.language,
+            content_hash=parsed.content_hash,
+            size_bytes=parsed.size_bytes,
+        )
+        db.add(file_rec)
+        db.flush()
+
+        if isinstance(parsed.cst, bytes):
+            db.add(CstBlob(file_id=file_rec.id, format="binary", data=parsed.cst))
+        elif parsed.cst is not None:
+            db.add(CstBlob(file_id=file_rec.id, format="sexp", tree=parsed.cst))
+
+        node_models: list[AstNode] = []
+        post, depth = tree_intervals(parsed.nodes)
+        for idx, n in enumerate(parsed.nodes):
+            node_models.append(AstNode(
+                run_id=self.run_id,
+                file_id=file_rec.id,
+                kind_id=self.kinds.get(n.kind),
+                name_id=self.names.get(n.name),
+                parent_id=None,
+                pre=idx,
+                post=post[idx],
+                depth=depth[idx],
+                start_byte=n.start_byte,
+                end_byte=n.end_byte,
+                start_line=n.start_line,
+                start_col=n.start_col,
+                end_line=n.end_line,
+                end_col=n.end_col,
+                meta=n.meta,
+            ))
+        db.add_all(node_models)
+        db.flush()
+        # Map parent indices to persisted node ids within the same file.
+        for idx, n in enumerate(parsed.nodes):
+            if n.parent_idx is not None:
+                node_models[idx].parent_id = node_models[n.parent_idx].id
+        db.add_all([
+            CallEdge(
+                run_id=self.run_id,
+                file_id=file_rec.id,
+                caller_id=node_models[caller].id,
+                call_id=node_models[call].id,
+                callee_name=parsed.nodes[call].name,
+            )
+            for caller, call in parsed.edges
+        ])
+        if parsed.snapshot is not None:
+            store_snapshots(db, [(parsed.content_hash, parsed.snapshot)])
+
+    def flush(self) -> None:
+        self.db.flush()
+
+
+class CopyWriter:
+    """Buffer files and write them in batches with ``COPY ... FROM STDIN``."""
+
+    def __init__(self, db: Session, run_id: int, batch_nodes: int | None = None):
+        self.db = db
+        self.run_id = run_id
+        self.batch_nodes = settings.ingest_batch_nodes if batch_nodes is None else batch_nodes
+        self.kinds = kind_interner(db)
+        self.names = name_interner(db)
+        self._files: list[ParsedFile] = []
+        self._node_count = 0
+
+    def add(self, parsed: ParsedFile) -> None:
+        self._files.append(parsed)
+        self._node_count += len(parsed.nodes)
+        if self._node_count >= self.batch_nodes:
+            self.flush()
+
+    def flush(self) -> None:
+        files, self._files = self._files, []
+        node_count, self._node_count = self._node_count, 0
+        if not files:
+            return
+
+        # Pending ORM state (the Run row, reused files) must land first.
+        self.db.flush()
+        conn = self.db.connection()
+        file_ids, node_ids = conn.execute(_RESERVE_IDS_SQL, {"files": len(files), "nodes": node_count}).one()
+        self.kinds.add(n.kind for p in files for n in p.nodes)
+        self.names.add(n.name for p in files for n in p.nodes)
+        kind_ids, name_ids = self.kinds.ids, self.names.ids
+
+        cur = conn.connection.driver_connection.cursor()
+        with cur.copy("COPY source_files (id, run_id, path, language, content_hash, size_bytes) FROM STDIN") as copy:
+            for file_id, parsed in zip(file_ids, files):
+                copy.write_row((file_id, self.run_id, parsed.path, parsed.language, parsed.content_hash,
+                                parsed.size_bytes))
+
+        with cur.copy("COPY cst_blobs (file_id, format, tree, data) FROM STDIN") as copy:
+            for file_id, parsed in zip(file_ids, files):
+                if isinstance(parsed.cst, bytes):
+                    copy.write_row((file_id, "binary", None, parsed.cst))
+                elif parsed.cst is not None:
+                    copy.write_row((file_id, "sexp", orjson.dumps(parsed.cst).decode(), None))
+
+        with cur.copy(f"COPY ast_nodes ({', '.join(_NODE_COLUMNS)}) FROM STDIN") as copy:
+            base = 0
+            for file_id, parsed in zip(file_ids, files):
+                post, depth = tree_intervals(parsed.nodes)
+                for idx, n in enumerate(parsed.nodes):
+                    copy.write_row((
+                        node_ids[base + idx],
+                        self.run_id,
+                        file_id,
+                        node_ids[base + n.parent_idx] if n.parent_idx is not None else None,
+                        name_ids[n.name] if n.name is not None else None,
+                        idx,
+                        post[idx],
+                        depth[idx],
+                        n.start_byte,
+                        n.end_byte,
+                        n.start_line,
+                        n.start_col,
+                        n.end_line,
+                        n.end_col,
+                        kind_ids[n.kind],
+                        orjson.dumps(n.meta).decode() if n.meta is not None else None,
+                    ))
+                base += len(parsed.nodes)
+
+        with cur.copy("COPY call_edges (run_id, file_id, caller_id, call_id, callee_name) FROM STDIN") as copy:
+            base = 0
+            for file_id, parsed in zip(file_ids, files):
+                for caller, call in parsed.edges:
+                    copy.write_row((self.run_id, file_id, node_ids[base + caller], node_ids[base + call],
+                                    parsed.nodes[call].name))
+                base += len(parsed.nodes)
+
+        # Snapshots dedupe on content_hash, which COPY cannot skip.
+        store_snapshots(self.db, [(p.content_hash, p.snapshot) for p in files if p.snapshot is not None])
+
+
+def make_writer(db: Session, run_id: int, kind: str | None = None) -> OrmWriter | CopyWriter:
+    """Return the configured writer, falling back to the ORM off psycopg.
+
+    Creates the run's ``ast_nodes`` partition if needed, in the session's
+    transaction (see ``app.partitions.ensure_partition``).
+    """
+    ensure_partition(db, run_id)
+    kind = kind or settings.ingest_writer
+    if kind == "copy" and db.get_bind().dialect.driver == "psycopg":
+        return CopyWriter(db, run_id)
+    return OrmWriter(db, run_id)
@@ -0,0 +1,118 @@
+"""Exploring symbols with one MCP tool call per read vs one reason_batch call.
+
+Usage: DATABASE_URL=... python scripts/bench_batch.py [--run-id N] [--symbols 5] [--repeat 5]
+
+Picks ``--symbols`` definitions of a finished run (default: the newest
+completed one) and, for each, issues what an agent typically asks next:
+the definition by name, its node, its source, its enclosing nodes and its
+direct callers. Times those reads as sequential tool calls and as a single
+batch, and counts the SQL statements each sends. The result cache is
+cleared before every pass, so both sides hit Postgres.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import event, func, select  # noqa: E402
+
+from app.ast_extract import DEF_KINDS  # noqa: E402
+from app.cache import result_cache  # noqa: E402
+from app.db import ReadSessionLocal, get_engine  # noqa: E402
+from app.mcp_server import (  # noqa: E402
+    reason_batch,
+    reason_callers,
+    reason_get_ancestors,
+    reason_get_node,
+    reason_get_sources,
+    reason_query_defs,
+)
+from app.models import AstNode, Run, SourceFile  # noqa: E402
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(get_engine(), "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def workload(run_id: int, symbols: list[tuple[int, str]]) -> list[dict]:
+    ops = []
+    for node_id, name in symbols:
+        ops += [
+            {"op": "query_defs", "name": name, "run_id": run_id},
+            {"op": "get_node", "node_id": node_id},
+            {"op": "get_sources", "node_ids": [node_id]},
+            {"op": "get_ancestors", "node_id": node_id},
+            {"op": "callers", "node_id": node_id, "depth": 1},
+        ]
+    return ops
+
+
+TOOLS = {
+    "query_defs": reason_query_defs,
+    "get_node": reason_get_node,
+    "get_sources": reason_get_sources,
+    "get_ancestors": reason_get_ancestors,
+    "callers": reason_callers,
+}
+
+
+def sequential(ops: list[dict]) -> list:
+    return [json.loads(TOOLS[op["op"]](**{k: v for k, v in op.items() if k != "op"})) for op in ops]
+
+
+def batched(ops: list[dict]) -> list:
+    return json.loads(reason_batch(ops))
+
+
+def _best(fn, repeat, counter):
+    best, statements, result = float("inf"), 0, None
+    for _ in range(repeat):
+        result_cache.clear()
+        before = counter.count
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+        statements = counter.count - before
+    return best, statements, result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--run-id", type=int)
+    ap.add_argument("--symbols", type=int, default=5)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    with ReadSessionLocal() as db:
+        run_id = args.run_id or db.execute(
+            select(func.max(Run.id)).where(Run.status == "completed")
+        ).scalar_one()
+        symbols = db.execute(
+            select(AstNode.id, AstNode.name)
+            .join(SourceFile)
+            .where(SourceFile.run_id == run_id, AstNode.kind.in_(DEF_KINDS), AstNode.name.is_not(None))
+            .order_by(AstNode.id)
+            .limit(args.symbols)
+        ).all()
+    ops = workload(run_id, symbols)
+    counter = StatementCounter()
+    seq, seq_statements, seq_results = _best(lambda: sequential(ops), args.repeat, counter)
+    bat, bat_statements, bat_results = _best(lambda: batched(ops), args.repeat, counter)
+    assert seq_results == bat_results
+
+    print(f"run={run_id} symbols={len(symbols)} operations={len(ops)}")
+    print(f"sequential tools  calls={len(ops):>3}  statements={seq_statements:>4}  time={seq * 1e3:8.2f}ms")
+    print(f"reason_batch      calls=  1  statements={bat_statements:>4}  time={bat * 1e3:8.2f}ms  "
+          f"speedup={seq / bat:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
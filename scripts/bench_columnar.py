@@ -0,0 +1,98 @@
+"""Query latency on a run's in-memory columnar snapshot against Postgres, plus its memory.
+
+Usage: DATABASE_URL=... python scripts/bench_columnar.py [--run-id N] [--repeat 20]
+
+Defaults to the finished run with the most nodes (e.g. one created by
+bench_names.py). Memory is what the snapshot retains after loading, as
+measured by tracemalloc, scaled to one million nodes.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app.columnar import columnar_store  # noqa: E402
+from app.db import SessionLocal  # noqa: E402
+from app.models import AstNode, Run, SourceFile  # noqa: E402
+from app.query import SUMMARY_COLUMNS, query_calls, query_defs, query_nodes  # noqa: E402
+
+CASES = [
+    ("defs exact", query_defs, {"name": "helper7_3"}),
+    ("calls exact", query_calls, {"name": "helper7_3"}),
+    ("defs prefix", query_defs, {"name": "helper12_", "match": "prefix"}),
+    ("nodes substring", query_nodes, {"name": "get12_3", "match": "substring"}),
+    ("nodes ignore_case", query_nodes, {"name": "WIDGET12_3", "ignore_case": True}),
+    ("defs page", query_defs, {}),
+]
+
+
+def _best(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--run-id", type=int)
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    with SessionLocal() as db:
+        run_id = args.run_id or db.execute(
+            select(SourceFile.run_id)
+            .join(AstNode, AstNode.file_id == SourceFile.id)
+            .join(Run, Run.id == SourceFile.run_id)
+            .where(Run.status == "completed")
+            .group_by(SourceFile.run_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        ).scalar_one()
+
+        def run_cases():
+            out = {}
+            for label, fn, filters in CASES:
+                out[label] = _best(lambda: fn(db, run_id=run_id, limit=args.limit, columns=SUMMARY_COLUMNS,
+                                              **filters), args.repeat)
+            return out
+
+        postgres = run_cases()
+
+        t0 = time.perf_counter()
+        columns = columnar_store.load(db, run_id)
+        load_time = time.perf_counter() - t0
+        # Build the lazily created name arrays before measuring memory.
+        columns.query(name="x", match="substring", ignore_case=True)
+        columns.query(name="x", ignore_case=True)
+        columnar_store.clear()
+
+        tracemalloc.start()
+        columns = columnar_store.load(db, run_id)
+        columns.query(name="x", match="substring", ignore_case=True)
+        columns.query(name="x", ignore_case=True)
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        memory = run_cases()
+
+    nodes = len(columns)
+    print(f"run={run_id} nodes={nodes:,} names={len(columns.names):,} load={load_time:.2f}s")
+    print(f"memory: {retained / 2**20:.1f} MiB retained, {retained / nodes * 1e6 / 2**20:.1f} MiB per million nodes "
+          f"(estimate {columns.nbytes / 2**20:.1f} MiB)")
+    for label, _, _ in CASES:
+        (pg, pg_rows), (mem, mem_rows) = postgres[label], memory[label]
+        assert [tuple(r) for r in pg_rows] == [tuple(r) for r in mem_rows], label
+        print(f"{label:<18} postgres={pg * 1e3:7.3f}ms  columnar={mem * 1e3:7.3f}ms  rows={len(mem_rows)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""One symbol-context call vs the tool chain it replaces.
+
+Usage: DATABASE_URL=... python scripts/bench_context.py [--files 200] [--callers 20] [--repeat 5]
+
+Generates ``--files`` modules in a temporary directory, where
+``--callers`` of them call a shared ``target`` function, and ingests them.
+The chain is what an agent does without ``reason_symbol_context``:
+``reason_query_defs`` -> ``reason_get_node`` -> ``reason_get_source`` for
+the body -> ``reason_query_calls`` -> ``reason_get_ancestors`` and
+``reason_get_source`` for each call site's line. Reports tool calls, SQL
+statements and time for both, with the result cache cleared each pass.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import event  # noqa: E402
+
+from app.cache import result_cache  # noqa: E402
+from app.db import SessionLocal, get_engine  # noqa: E402
+from app.ingest import ingest_directory  # noqa: E402
+from app.mcp_server import (  # noqa: E402
+    reason_get_ancestors,
+    reason_get_file,
+    reason_get_node,
+    reason_get_source,
+    reason_query_calls,
+    reason_query_defs,
+    reason_symbol_context,
+)
+
+TARGET = '''import os
+
+
+def target(path):
+    """Normalize a path."""
+    return os.path.normpath(path).strip()
+'''
+CALLER = '''from target import target
+
+
+class Worker{i}:
+    def run(self, path):
+        return target(path) + str({i})
+
+
+def helper{i}(x):
+    return [x] * {i}
+'''
+
+
+def chain(name: str, run_id: int) -> int:
+    """The per-step tool calls; returns how many were made."""
+    calls = 0
+
+    def call(tool, *args, **kwargs):
+        nonlocal calls
+        calls += 1
+        return json.loads(tool(*args, **kwargs))
+
+    for d in call(reason_query_defs, name=name, run_id=run_id):
+        node = call(reason_get_node, d["id"])
+        f = call(reason_get_file, node["file_id"])
+        call(reason_get_source, f["path"], node["start_byte"], node["end_byte"])
+    files = {}
+    for site in call(reason_query_calls, name=name, run_id=run_id):
+        call(reason_get_ancestors, site["id"], kind="function_definition")
+        node = call(reason_get_node, site["id"])
+        if node["file_id"] not in files:
+            files[node["file_id"]] = call(reason_get_file, node["file_id"])["path"]
+        line_start = node["start_byte"] - node["start"][1]
+        call(reason_get_source, files[node["file_id"]], line_start, line_start + 240)
+    return calls
+
+
+def _best(fn, repeat, counter):
+    best, statements, result = float("inf"), 0, None
+    for _ in range(repeat):
+        result_cache.clear()
+        before = counter[0]
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+        statements = counter[0] - before
+    return best, statements, result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=200)
+    ap.add_argument("--callers", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        with open(os.path.join(root, "target.py"), "w") as f:
+            f.write(TARGET)
+        for i in range(args.files):
+            text = CALLER.format(i=i)
+            if i >= args.callers:
+                text = text.replace("target(path)", "path")
+            with open(os.path.join(root, f"mod_{i}.py"), "w") as f:
+                f.write(text)
+        with SessionLocal() as db:
+            run_id = ingest_directory(db, root, "python")
+
+        counter = [0]
+        event.listen(get_engine(), "before_cursor_execute", lambda *a: counter.__setitem__(0, counter[0] + 1))
+        seq, seq_statements, calls = _best(lambda: chain("target", run_id), args.repeat, counter)
+        one, one_statements, out = _best(
+            lambda: json.loads(reason_symbol_context("target", run_id=run_id)), args.repeat, counter,
+        )
+        assert len(out["call_sites"]) == args.callers and all("line" in s for s in out["call_sites"])
+
+    print(f"run={run_id} files={args.files + 1} call sites={args.callers}")
+    print(f"tool chain             calls={calls:>3}  statements={seq_statements:>4}  time={seq * 1e3:8.2f}ms")
+    print(f"reason_symbol_context  calls=  1  statements={one_statements:>4}  time={one * 1e3:8.2f}ms  "
+          f"speedup={seq / one:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compare CST storage formats: encode time and bytes stored per file.
+
+Usage: python scripts/bench_cst.py [--files N] [PATH ...]
+
+"sexp" is measured as the JSON text written to cst_blobs.tree (before
+TOAST compression); "binary" is the app.cst_codec payload written to
+cst_blobs.data.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import orjson
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.cst_codec import CstTree, encode_tree  # noqa: E402
+from app.treesitter import get_ts_parser  # noqa: E402
+from bench_parse import _synthetic  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="*")
+    ap.add_argument("--files", type=int, default=100)
+    ap.add_argument("--language", default="python")
+    args = ap.parse_args()
+
+    parser = get_ts_parser(args.language)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = args.paths or _synthetic(tmpdir, args.files)
+        trees = []
+        source_bytes = 0
+        for path in paths:
+            with open(path, "rb") as f:
+                data = f.read()
+            source_bytes += len(data)
+            trees.append(parser.parse(data))
+
+    t0 = time.perf_counter()
+    sexp_bytes = sum(len(orjson.dumps(t.root_node.sexp())) for t in trees)
+    sexp_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    blobs = [encode_tree(t) for t in trees]
+    binary_time = time.perf_counter() - t0
+    binary_bytes = sum(len(b) for b in blobs)
+
+    t0 = time.perf_counter()
+    for b in blobs:
+        CstTree(b).root_node
+    decode_time = time.perf_counter() - t0
+
+    print(f"files={len(trees)} source={source_bytes:,}B")
+    print(f"sexp    bytes={sexp_bytes:,} ({sexp_bytes / source_bytes:.2f}x source) encode={sexp_time:.2f}s")
+    print(f"binary  bytes={binary_bytes:,} ({binary_bytes / source_bytes:.2f}x source) encode={binary_time:.2f}s "
+          f"decode={decode_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
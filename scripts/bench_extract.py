@@ -0,0 +1,134 @@
+"""Extraction time per language: the single-pass cursor walk vs recursive visiting.
+
+Usage: python scripts/bench_extract.py [--scale 400] [--repeat 5] [PATH ...]
+
+Without paths, one large synthetic file per language is generated
+(``--scale`` copies of a sample, plus a long chained call). The baseline
+is the previous extractor's shape: a recursive visit over
+``node.children`` that re-walks a callee subtree for every call to find
+its last identifier. Both must produce the same nodes. Parsing is not
+timed.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.ast_extract import _CSS, _JAVASCRIPT, _PYTHON, AstLikeNode, _extract, _ts_range  # noqa: E402
+from app.parse_pool import _get_parser  # noqa: E402
+from app.treesitter import language_for_path  # noqa: E402
+
+GRAMMARS = {"python": _PYTHON, "javascript": _JAVASCRIPT, "jsx": _JAVASCRIPT, "ts": _JAVASCRIPT,
+            "tsx": _JAVASCRIPT, "css": _CSS, "scss": _CSS}
+
+SAMPLES = {
+    "python": '''
+class Widget{i}:
+    def render(self, ctx):
+        return ctx.draw(self.a).then(self.b).finish(helper{i}(self))
+
+
+def helper{i}(w):
+    return [str(x) for x in range(w.a)] + list(map(str, range(w.b)))
+''',
+    "javascript": '''
+import {{ h{i} }} from "./h{i}";
+class Widget{i} {{
+  render(ctx) {{ return ctx.draw(this.a).then(this.b).finish(h{i}(this)); }}
+}}
+function helper{i}(w) {{ return [...Array(w.a).keys()].map(String).concat(h{i}(w)); }}
+''',
+    "css": '''
+.widget-{i} {{ color: red; }}
+@media (min-width: {i}px) {{ .widget-{i} > .child {{ margin: 0 auto; }} }}
+''',
+}
+CHAINS = {
+    "python": lambda n: "x = a" + "".join(f".m{i}(y)" for i in range(n)) + "\n",
+    "javascript": lambda n: "const x = a" + "".join(f".m{i}(y)" for i in range(n)) + ";\n",
+    "css": lambda n: "",
+}
+
+
+def recursive_extract(tree, grammar) -> list[AstLikeNode]:
+    out: list[AstLikeNode] = []
+
+    def last_identifier(node):
+        last = None
+        for child in node.children:
+            if child.type == "identifier":
+                last = child
+            found = last_identifier(child)
+            if found is not None:
+                last = found
+        return last
+
+    def call_name(node):
+        fields = [f for f in ("function", "callee") if f in grammar.call_fields]
+        target = next(filter(None, map(node.child_by_field_name, fields)), None)
+        if target is None:
+            return None
+        if target.type != "identifier":
+            target = last_identifier(target)
+        return target.text.decode("utf-8") if target is not None else None
+
+    def visit(node, parent_idx):
+        kind = node.type
+        idx = parent_idx
+        if kind in grammar.records:
+            name, meta = grammar.records[kind](node)
+            idx = len(out)
+            out.append(AstLikeNode(kind, name, *_ts_range(node), parent_idx=parent_idx, meta=meta))
+        elif kind == grammar.call_type:
+            idx = len(out)
+            out.append(AstLikeNode("call_expression", call_name(node), *_ts_range(node), parent_idx=parent_idx))
+        for child in node.children:
+            visit(child, idx)
+
+    visit(tree.root_node, None)
+    return out
+
+
+def _best(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="*")
+    ap.add_argument("--scale", type=int, default=400)
+    ap.add_argument("--chain", type=int, default=400)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+    sys.setrecursionlimit(100_000)
+
+    if args.paths:
+        cases = []
+        for path in args.paths:
+            with open(path, "rb") as f:
+                cases.append((path, language_for_path(path), f.read()))
+    else:
+        cases = []
+        for language, sample in SAMPLES.items():
+            text = "".join(sample.format(i=i) for i in range(args.scale)) + CHAINS[language](args.chain)
+            cases.append((language, language, text.encode()))
+
+    for label, language, data in cases:
+        grammar = GRAMMARS[language]
+        tree = _get_parser(language).parse(data)
+        old, old_nodes = _best(lambda: recursive_extract(tree, grammar), args.repeat)
+        new, new_nodes = _best(lambda: _extract(tree, grammar), args.repeat)
+        assert [vars(n) for n in old_nodes] == [vars(n) for n in new_nodes], label
+        print(f"{label:<12} {len(data) / 1024:7.0f} KiB  nodes={len(new_nodes):>7,}  "
+              f"recursive={old * 1e3:8.1f}ms  cursor={new * 1e3:8.1f}ms  speedup={old / new:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Transitive caller lookup: one recursive CTE vs walking parent_id per row.
+
+Usage: DATABASE_URL=... python scripts/bench_graph.py [--chains 200] [--depth 6]
+
+Ingests synthetic modules where ``step_{c}_{k}`` calls ``step_{c}_{k+1}``
+from inside nested blocks, then times finding every transitive caller of
+the last step in one chain. The baseline does what a client had to do
+before call_edges existed: find call sites by name, then climb parent_id
+one row at a time to the enclosing definition.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.ast_extract import DEF_KINDS  # noqa: E402
+from app.db import SessionLocal  # noqa: E402
+from app.graph import callers, find_defs  # noqa: E402
+from app.ingest import ingest_files  # noqa: E402
+from app.models import AstNode  # noqa: E402
+from app.query import query_calls  # noqa: E402
+
+
+def _chains(tmpdir, chains, depth):
+    paths = []
+    for c in range(chains):
+        path = os.path.join(tmpdir, f"chain_{c}.py")
+        with open(path, "w") as f:
+            for k in range(depth):
+                callee = f"step_{c}_{k + 1}()" if k + 1 < depth else "pass"
+                f.write(f"def step_{c}_{k}(x):\n    if x:\n        for i in x:\n            {callee}\n\n")
+        paths.append(path)
+    return paths
+
+
+def naive_callers(db, name, run_id, depth):
+    found, round_trips = {}, 0
+    frontier = [name]
+    for level in range(1, depth + 1):
+        next_names = []
+        for callee in frontier:
+            calls = query_calls(db, name=callee, limit=None, run_id=run_id)
+            round_trips += 1
+            for call in calls:
+                node = call
+                while node.parent_id is not None and node.kind not in DEF_KINDS:
+                    node = db.get(AstNode, node.parent_id)
+                    round_trips += 1
+                if node.kind in DEF_KINDS and node.id not in found:
+                    found[node.id] = level
+                    next_names.append(node.name)
+        frontier = next_names
+    return found, round_trips
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chains", type=int, default=200)
+    ap.add_argument("--depth", type=int, default=6)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir, SessionLocal() as db:
+        run_id = ingest_files(db, "python", _chains(tmpdir, args.chains, args.depth))
+
+    target = f"step_0_{args.depth - 1}"
+    for label in ("naive", "cte"):
+        best = float("inf")
+        for _ in range(args.repeat):
+            with SessionLocal() as db:
+                t0 = time.perf_counter()
+                if label == "naive":
+                    found, trips = naive_callers(db, target, run_id, args.depth)
+                else:
+                    found = callers(db, find_defs(db, target, run_id), depth=args.depth)
+                    trips = 2
+                best = min(best, time.perf_counter() - t0)
+        print(f"{label:<6} callers={len(found)} round_trips={trips} best={best * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
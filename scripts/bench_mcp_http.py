@@ -0,0 +1,159 @@
+"""Concurrent MCP sessions served over HTTP per uvicorn worker, vs one stdio process per agent.
+
+Usage: DATABASE_URL=... python scripts/bench_mcp_http.py [--workers 1] [--sessions 10,50,200]
+                                                         [--think 0.5] [--seconds 15]
+
+Starts ``uvicorn app.main:app`` with ``--workers`` workers and, for each
+session count, keeps that many agent sessions busy against ``/mcp``. A
+session initializes, then loops over tool calls (``reason_query_defs`` by
+a random name, ``reason_get_node`` on the first hit, ``reason_list_runs``)
+with ``--think`` seconds between calls, standing in for the model's turn.
+Reports tool calls per second, latency percentiles and sessions per worker.
+Clients speak JSON-RPC over httpx directly (the server is stateless, with
+JSON responses), so one client process can drive hundreds of sessions.
+
+Before that, it times what every agent pays with the stdio transport:
+spawning ``python -m app.mcp_server`` and completing its first tool call.
+The defaults match the synthetic files of ``bench_parse.py``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+HEADERS = {"Accept": "application/json, text/event-stream"}
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _message(method: str, params: dict, request_id: int | None = 1) -> dict:
+    msg = {"jsonrpc": "2.0", "method": method, "params": params}
+    if request_id is not None:
+        msg["id"] = request_id
+    return msg
+
+
+async def _call(http: httpx.AsyncClient, name: str, arguments: dict):
+    resp = await http.post("/mcp", headers=HEADERS, json=_message("tools/call", {"name": name, "arguments": arguments}))
+    resp.raise_for_status()
+    result = resp.json()["result"]
+    if result.get("isError"):
+        raise RuntimeError(result["content"][0]["text"])
+    return json.loads(result["content"][0]["text"])
+
+
+async def _session(http: httpx.AsyncClient, args, start: float, stop: float, latencies: list[float],
+                   errors: list[int]):
+    rng = random.Random()
+    await asyncio.sleep(rng.random() * args.think)
+    await http.post("/mcp", headers=HEADERS, json=_message("initialize", {
+        "protocolVersion": "2025-03-26", "capabilities": {}, "clientInfo": {"name": "bench", "version": "0"},
+    }))
+    while True:
+        calls = [("reason_query_defs", {"name": f"helper{rng.randrange(args.n_max)}_3", "limit": 20}),
+                 ("reason_list_runs", {"limit": 10})]
+        for name, arguments in calls:
+            t0 = time.perf_counter()
+            if t0 >= stop:
+                return
+            try:
+                out = await _call(http, name, arguments)
+                if name == "reason_query_defs" and out:
+                    await _call(http, "reason_get_node", {"node_id": out[0]["id"]})
+                ok = True
+            except (httpx.HTTPError, RuntimeError, KeyError):
+                ok = False
+            t1 = time.perf_counter()
+            if t0 >= start:
+                if ok:
+                    latencies.append(t1 - t0)
+                else:
+                    errors.append(1)
+            await asyncio.sleep(args.think)
+
+
+async def _load(args, sessions: int) -> str:
+    limits = httpx.Limits(max_connections=sessions, max_keepalive_connections=sessions)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as http:
+        latencies: list[float] = []
+        errors: list[int] = []
+        start = time.perf_counter() + args.warmup
+        stop = start + args.seconds
+        await asyncio.gather(*(_session(http, args, start, stop, latencies, errors) for _ in range(sessions)))
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    return (f"sessions={sessions:>4} ({sessions / args.workers:.0f}/worker)  calls={len(latencies)} "
+            f"errors={len(errors)}  calls/s={len(latencies) / args.seconds:,.0f}  "
+            f"p50={_percentile(ms, 50):.1f}ms p95={_percentile(ms, 95):.1f}ms p99={_percentile(ms, 99):.1f}ms")
+
+
+async def _stdio_startup() -> float:
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(command=sys.executable, args=["-m", "app.mcp_server"], cwd=ROOT,
+                                   env=dict(os.environ))
+    t0 = time.perf_counter()
+    async with stdio_client(params) as (read, write), ClientSession(read, write) as session:
+        await session.initialize()
+        await session.call_tool("reason_list_runs", {"limit": 1})
+        return time.perf_counter() - t0
+
+
+def _wait_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url + "/runs?limit=1").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--sessions", default="10,50,200")
+    ap.add_argument("--think", type=float, default=0.5)
+    ap.add_argument("--seconds", type=float, default=15)
+    ap.add_argument("--warmup", type=float, default=2)
+    ap.add_argument("--timeout", type=float, default=30)
+    ap.add_argument("--n-max", type=int, default=1000)
+    args = ap.parse_args()
+    args.url = f"http://127.0.0.1:{args.port}"
+
+    startup = asyncio.run(_stdio_startup())
+    print(f"stdio: spawn + initialize + first call = {startup * 1e3:.0f}ms per agent process")
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        cwd=ROOT,
+    )
+    try:
+        _wait_ready(args.url)
+        print(f"http: {args.workers} worker(s), {os.cpu_count()} core(s), think={args.think}s")
+        for sessions in map(int, args.sessions.split(",")):
+            print(asyncio.run(_load(args, sessions)))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Name lookup latency for each match mode, against a sequential LIKE scan.
+
+Usage: DATABASE_URL=... python scripts/bench_names.py [--files 2000] [--no-ingest]
+
+Unless --no-ingest is given, synthetic files are ingested into a new run
+first; lookups then span every node in the database. The
+baseline forces ``name LIKE '%q%'`` with index scans disabled, which is what
+a substring lookup cost before migration 0005.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.db import SessionLocal  # noqa: E402
+from app.ingest import ingest_files  # noqa: E402
+from app.name_index import has_pg_trgm  # noqa: E402
+from app.query import SUMMARY_COLUMNS, query_nodes  # noqa: E402
+from bench_parse import _synthetic  # noqa: E402
+
+CASES = [
+    ("exact", "helper7_3", False),
+    ("prefix", "helper7_", False),
+    ("prefix", "WIDGET12", True),
+    ("substring", "get12_3", False),
+    ("substring", "GET12_3", True),
+    ("fuzzy", "helpr12_3", False),
+]
+
+
+def _best(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, len(rows)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--no-ingest", action="store_true")
+    ap.add_argument("--files", type=int, default=2000)
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    if not args.no_ingest:
+        with tempfile.TemporaryDirectory() as tmpdir, SessionLocal() as db:
+            ingest_files(db, "python", _synthetic(tmpdir, args.files))
+
+    with SessionLocal() as db:
+        total = db.execute(text("SELECT count(*) FROM ast_nodes")).scalar()
+        print(f"nodes={total} pg_trgm={has_pg_trgm(db)}")
+
+        def scan():
+            db.execute(text("SET LOCAL enable_indexscan = off; SET LOCAL enable_bitmapscan = off"))
+            rows = db.execute(
+                text("SELECT n.id FROM ast_nodes n JOIN symbols s ON s.id = n.name_id "
+                     "WHERE s.name LIKE :p ORDER BY n.id LIMIT :n"),
+                {"p": "%get12\\_3%", "n": args.limit},
+            ).all()
+            db.rollback()
+            return rows
+
+        best, found = _best(scan, args.repeat)
+        print(f"{'seq scan LIKE':<24} rows={found:<4} best={best * 1000:.2f}ms")
+
+        for match, name, ignore_case in CASES:
+            # The first call builds the in-process index when pg_trgm is missing.
+            query_nodes(db, name=name, match=match, ignore_case=ignore_case, limit=args.limit, columns=SUMMARY_COLUMNS)
+            best, found = _best(
+                lambda: query_nodes(db, name=name, match=match, ignore_case=ignore_case, limit=args.limit,
+                                    columns=SUMMARY_COLUMNS),
+                args.repeat,
+            )
+            label = f"{match}{' icase' if ignore_case else ''} {name}"
+            print(f"{label:<24} rows={found:<4} best={best * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark the parse/extract stage at increasing worker counts.
+
+Usage: python scripts/bench_parse.py [--files N] [--language python] [PATH ...]
+
+Without paths, N synthetic Python files are generated in a temp directory.
+Only the parse/extract stage is timed; nothing is written to the database.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.parse_pool import iter_parsed  # noqa: E402
+
+SAMPLE = '''
+class Widget{i}:
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+
+    def render(self, ctx):
+        return ctx.draw(self.a).then(self.b).finish(helper{i}(self))
+
+
+def helper{i}(w):
+    return [str(x) for x in range(w.a)] + list(map(str, range(w.b)))
+'''
+
+
+def _synthetic(tmpdir: str, count: int) -> list[str]:
+    paths = []
+    for i in range(count):
+        path = os.path.join(tmpdir, f"mod_{i}.py")
+        with open(path, "w") as f:
+            f.write("".join(SAMPLE.format(i=f"{i}_{j}") for j in range(40)))
+        paths.append(path)
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="*")
+    ap.add_argument("--files", type=int, default=400)
+    ap.add_argument("--language", default="python")
+    ap.add_argument("--chunk-size", type=int, default=16)
+    args = ap.parse_args()
+
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, 16, cores} & set(range(1, cores + 1)))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = args.paths or _synthetic(tmpdir, args.files)
+        baseline = None
+        for workers in counts:
+            t0 = time.perf_counter()
+            nodes = sum(len(p.nodes) for p in iter_parsed(args.language, paths, workers, args.chunk_size))
+            elapsed = time.perf_counter() - t0
+            baseline = baseline or elapsed
+            print(f"workers={workers:<3} files={len(paths)} nodes={nodes} "
+                  f"time={elapsed:.2f}s speedup={baseline / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Per-row cost of node summary queries: ORM entities vs projected columns.
+
+Usage: DATABASE_URL=... python scripts/bench_query.py [--run-id N] [--rows 10000]
+
+Without --run-id, synthetic files are ingested into a new run first. Each
+path is timed end to end (query, hydration, serialization to JSON bytes)
+for the REST and MCP response shapes.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import orjson  # noqa: E402
+
+from app.db import SessionLocal  # noqa: E402
+from app.ingest import ingest_files  # noqa: E402
+from app.query import SUMMARY_COLUMNS, query_nodes  # noqa: E402
+from app.schemas import QueryResponse  # noqa: E402
+from app.serializers import serialize_node_summary, serialize_summary_row  # noqa: E402
+from bench_parse import _synthetic  # noqa: E402
+
+
+def rest_entities(db, run_id, rows):
+    nodes = query_nodes(db, run_id=run_id, limit=rows)
+    return QueryResponse(results=[serialize_node_summary(n) for n in nodes]).model_dump_json().encode()
+
+
+def rest_projected(db, run_id, rows):
+    found = query_nodes(db, run_id=run_id, limit=rows, columns=SUMMARY_COLUMNS)
+    return orjson.dumps({"results": [serialize_summary_row(r) for r in found], "next_cursor": None})
+
+
+def mcp_entities(db, run_id, rows):
+    nodes = query_nodes(db, run_id=run_id, limit=rows)
+    return json.dumps([serialize_node_summary(n) for n in nodes])
+
+
+def mcp_projected(db, run_id, rows):
+    found = query_nodes(db, run_id=run_id, limit=rows, columns=SUMMARY_COLUMNS)
+    return orjson.dumps([serialize_summary_row(r) for r in found]).decode()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--run-id", type=int)
+    ap.add_argument("--rows", type=int, default=10_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    run_id = args.run_id
+    if run_id is None:
+        with tempfile.TemporaryDirectory() as tmpdir, SessionLocal() as db:
+            files = _synthetic(tmpdir, max(1, args.rows // 500 + 1))
+            run_id = ingest_files(db, "python", files)
+
+    for fn in (rest_entities, rest_projected, mcp_entities, mcp_projected):
+        best = float("inf")
+        for _ in range(args.repeat):
+            # Fresh session each time so the identity map starts empty.
+            with SessionLocal() as db:
+                t0 = time.perf_counter()
+                fn(db, run_id, args.rows)
+                best = min(best, time.perf_counter() - t0)
+        print(f"{fn.__name__:<15} rows={args.rows} best={best * 1000:.1f}ms per_row={best / args.rows * 1e6:.2f}us")
+
+
+if __name__ == "__main__":
+    main()
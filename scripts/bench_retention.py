@@ -0,0 +1,108 @@
+"""Deleting a large run: one cascading DELETE vs the purge (partition drop plus batches).
+
+Usage: DATABASE_URL=... python scripts/bench_retention.py [--run-id N] [--batch-files 100]
+
+Clones a finished run (default: the one with the most nodes, e.g. from
+bench_names.py) server-side, deletes the clone with a single ``DELETE FROM
+runs`` that cascades to every row, clones it again and purges that with
+``app.retention.purge_run``, which drops the clone's ``ast_nodes``
+partition and deletes the remaining rows in batches. Reports total time and
+the longest transaction: how long row locks are held at once, and how long
+an ingest copying those files would have to wait.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import event, func, select, text  # noqa: E402
+
+from app.db import SessionLocal  # noqa: E402
+from app.ingest import _COPY_CST_SQL, _COPY_NODES_SQL  # noqa: E402
+from app.models import AstNode, Run  # noqa: E402
+from app.partitions import drop_partition, ensure_partition  # noqa: E402
+from app.retention import mark_deleting, purge_run  # noqa: E402
+
+
+def clone_run(db, run_id: int) -> int:
+    """Copy a run's files, nodes, call edges and CSTs into a new completed run."""
+    clone = db.execute(text(
+        "INSERT INTO runs (language, status, files_done, bytes_done, full_walk) "
+        "SELECT language, 'completed', files_done, bytes_done, false FROM runs WHERE id = :id RETURNING id"
+    ), {"id": run_id}).scalar_one()
+    pairs = db.execute(text(
+        "SELECT id, nextval(pg_get_serial_sequence('source_files', 'id')) FROM source_files "
+        "WHERE run_id = :id ORDER BY id"
+    ), {"id": run_id}).all()
+    params = {"old_ids": [old for old, _ in pairs], "new_ids": [new for _, new in pairs]}
+    db.execute(text(
+        "INSERT INTO source_files (id, run_id, path, language, content_hash, size_bytes) "
+        "SELECT m.new_id, :clone, f.path, f.language, f.content_hash, f.size_bytes "
+        "FROM unnest(CAST(:old_ids AS bigint[]), CAST(:new_ids AS bigint[])) AS m(old_id, new_id) "
+        "JOIN source_files f ON f.id = m.old_id"
+    ), {**params, "clone": clone})
+    ensure_partition(db, clone)
+    db.execute(_COPY_NODES_SQL, {**params, "run_id": clone})
+    db.execute(_COPY_CST_SQL, params)
+    db.commit()
+    return clone
+
+
+class TransactionTimer:
+    def __init__(self, db):
+        self.longest = 0.0
+        self._start = None
+        event.listen(db, "after_begin", self._begin)
+        event.listen(db, "after_commit", self._end)
+
+    def _begin(self, *args):
+        self._start = time.perf_counter()
+
+    def _end(self, *args):
+        if self._start is not None:
+            self.longest = max(self.longest, time.perf_counter() - self._start)
+            self._start = None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--run-id", type=int)
+    ap.add_argument("--batch-files", type=int, default=100)
+    args = ap.parse_args()
+
+    with SessionLocal() as db:
+        run_id = args.run_id or db.execute(
+            select(AstNode.run_id)
+            .join(Run, Run.id == AstNode.run_id)
+            .where(Run.status == "completed")
+            .group_by(AstNode.run_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        ).scalar_one()
+
+        clone = clone_run(db, run_id)
+        nodes = db.execute(
+            select(func.count()).select_from(AstNode).where(AstNode.run_id == clone)
+        ).scalar_one()
+        t0 = time.perf_counter()
+        db.execute(text("DELETE FROM runs WHERE id = :id"), {"id": clone})
+        db.commit()
+        cascade = time.perf_counter() - t0
+        # The emptied partition is left behind.
+        drop_partition(db, clone)
+        print(f"run={run_id} nodes={nodes:,}")
+        print(f"cascading DELETE  total={cascade:6.2f}s  longest transaction={cascade:6.2f}s")
+
+        clone = clone_run(db, run_id)
+        mark_deleting(db, [clone])
+        timer = TransactionTimer(db)
+        t0 = time.perf_counter()
+        purge_run(db, clone, batch_files=args.batch_files)
+        total = time.perf_counter() - t0
+        print(f"purge_run({args.batch_files:>4})  total={total:6.2f}s  longest transaction={timer.longest:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Row and index sizes of the node tables.
+
+Usage: DATABASE_URL=... python scripts/bench_schema_size.py
+
+Sums heap (with TOAST) and index sizes of ``ast_nodes`` over all its
+partitions, and of the lookup tables ``node_kinds`` and ``symbols`` where
+they exist, then lists every node index and reports bytes per node. Run it
+before and after ``alembic upgrade 0010_slim_nodes`` on a copy of the same
+database to compare the schemas.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.db import SessionLocal  # noqa: E402
+
+TABLES = ("ast_nodes", "node_kinds", "symbols")
+
+# pg_partition_tree is empty for a plain table, which is its own one relation.
+_RELATIONS = """
+WITH t AS (
+    SELECT CAST(:name AS regclass) AS relid
+    UNION SELECT relid FROM pg_partition_tree(CAST(:name AS regclass)) WHERE isleaf
+)
+"""
+_SIZES_SQL = text(_RELATIONS + """
+SELECT (SELECT count(*) FROM pg_partition_tree(CAST(:name AS regclass)) WHERE isleaf),
+       sum(pg_table_size(t.relid)), sum(pg_indexes_size(t.relid))
+FROM t
+""")
+# Indexes on partitions are summed under their parent index's name.
+_INDEXES_SQL = text(_RELATIONS + """
+SELECT coalesce(pg_partition_root(i.indexrelid), i.indexrelid)::regclass::text, sum(pg_relation_size(i.indexrelid))
+FROM t JOIN pg_index i ON i.indrelid = t.relid
+GROUP BY 1
+ORDER BY 2 DESC
+""")
+
+
+def _mb(size: int) -> str:
+    return f"{size / 2**20:9.1f}MB"
+
+
+def main():
+    with SessionLocal() as db:
+        nodes = db.execute(text("SELECT count(*) FROM ast_nodes")).scalar_one()
+        print(f"nodes={nodes:,}")
+        total = 0
+        for name in TABLES:
+            if not db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar():
+                continue
+            partitions, heap, indexes = db.execute(_SIZES_SQL, {"name": name}).one()
+            rows = db.execute(text(f"SELECT count(*) FROM {name}")).scalar_one()
+            total += heap + indexes
+            print(f"{name:<12} rows={rows:>10,} partitions={partitions:>4}  heap={_mb(heap)}  "
+                  f"indexes={_mb(indexes)}")
+        for name, size in db.execute(_INDEXES_SQL, {"name": "ast_nodes"}):
+            print(f"  {name:<28} {_mb(size)}")
+        print(f"total={_mb(total)}  per node={total / max(nodes, 1):.0f}B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Source slice reads: open/seek/read per call vs the mmap cache.
+
+Usage: python scripts/bench_source.py [--slices 100] [--repeat 200] [--snapshot]
+
+Reads ``--slices`` function bodies from one synthetic module, the way an
+agent pulls node bodies from a file it is inspecting. No database needed
+unless ``--snapshot`` is given: then the module is also stored as a
+snapshot (DATABASE_URL) and read back cold and warm through SnapshotCache.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.blob_codec import compress  # noqa: E402
+from app.parse_pool import hash_file  # noqa: E402
+from app.source_slices import SliceCache  # noqa: E402
+from bench_parse import _synthetic  # noqa: E402
+
+
+def open_seek_read(path, ranges):
+    out = []
+    for start, end in ranges:
+        with open(path, "rb") as f:
+            f.seek(start)
+            out.append(f.read(max(0, end - start)).decode("utf-8", errors="replace"))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--slices", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--snapshot", action="store_true")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = _synthetic(tmpdir, 1)[0]
+        size = os.path.getsize(path)
+        step = size // args.slices
+        ranges = [(i * step, i * step + min(step, 400)) for i in range(args.slices)]
+        cache = SliceCache()
+
+        cases = {
+            "open/seek/read": lambda: open_seek_read(path, ranges),
+            "cache.read": lambda: [cache.read(path, s, e) for s, e in ranges],
+            "cache.read_many": lambda: cache.read_many((path, s, e) for s, e in ranges),
+        }
+        for label, fn in cases.items():
+            fn()
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                fn()
+            per_batch = (time.perf_counter() - t0) / args.repeat
+            print(f"{label:<16} slices={args.slices} per_batch={per_batch * 1e6:.0f}us "
+                  f"per_slice={per_batch / args.slices * 1e6:.2f}us")
+        if args.snapshot:
+            _bench_snapshot(path, ranges, args.repeat)
+
+
+def _bench_snapshot(path, ranges, repeat):
+    from app.db import SessionLocal
+    from app.snapshots import SnapshotCache, store_snapshots
+
+    with open(path, "rb") as f:
+        snap = compress(f.read())
+    content_hash, size = hash_file(path)
+    print(f"snapshot codec={snap.codec} size={size} stored={len(snap.data)} ratio={size / len(snap.data):.1f}x")
+    requests = [(content_hash, s, e) for s, e in ranges]
+    with SessionLocal() as db:
+        store_snapshots(db, [(content_hash, snap)])
+        db.commit()
+        for label, fresh in (("snapshot cold", True), ("snapshot warm", False)):
+            cache = SnapshotCache()
+            cache.read_many(db, requests)
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                if fresh:
+                    cache = SnapshotCache()
+                cache.read_many(db, requests)
+            per_batch = (time.perf_counter() - t0) / repeat
+            print(f"{label:<16} slices={len(ranges)} per_batch={per_batch * 1e6:.0f}us "
+                  f"per_slice={per_batch / len(ranges) * 1e6:.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Cold start of the stdio MCP server: import time and time to first response.
+
+Usage: DATABASE_URL=... python scripts/bench_startup.py [--repeat 5] [--top 15] [--target-ms 1500]
+
+Runs ``python -X importtime -c "import app.mcp_server"`` and lists the
+slowest modules it imports directly (cumulative), plus which of the heavy
+modules only ingest or a columnar load needs were loaded anyway. Then
+spawns ``python -m app.mcp_server`` ``--repeat`` times and reports the
+median time from spawn to the ``initialize`` reply and to the reply of a
+first query tool (``reason_list_runs``, which opens the database engine).
+Exits non-zero when the first tool reply misses ``--target-ms``.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Modules only an ingest (or a columnar load) should need.
+HEAVY = ("tree_sitter", "tree_sitter_languages", "app.ingest", "app.parse_pool", "numpy", "psycopg")
+
+
+def import_profile(top: int) -> tuple[float, list[tuple[float, str]], set[str]]:
+    """Import time of app.mcp_server, its slowest direct imports, and every module loaded."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.mcp_server"],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    children, modules = [], set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        modules.add(name)
+        # A module is printed after its imports, two spaces deeper per level.
+        if depth == 1:
+            children.append((int(cumulative) / 1e6, name))
+        elif depth == 0:
+            if name == "app.mcp_server":
+                return int(cumulative) / 1e6, sorted(children, reverse=True)[:top], modules
+            children = []
+    raise RuntimeError("app.mcp_server not in -X importtime output")
+
+
+async def first_response() -> tuple[float, float]:
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(command=sys.executable, args=["-m", "app.mcp_server"], cwd=ROOT,
+                                   env=dict(os.environ))
+    t0 = time.perf_counter()
+    with open(os.devnull, "w") as errlog:
+        async with stdio_client(params, errlog) as (read, write), ClientSession(read, write) as session:
+            await session.initialize()
+            initialized = time.perf_counter() - t0
+            await session.call_tool("reason_list_runs", {"limit": 1})
+            return initialized, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--target-ms", type=float, default=1500)
+    args = ap.parse_args()
+
+    total, top, modules = import_profile(args.top)
+    print(f"import app.mcp_server: {total * 1e3:.0f}ms")
+    for seconds, name in top:
+        print(f"  {seconds * 1e3:8.1f}ms  {name}")
+    print("heavy modules loaded: " + (", ".join(m for m in HEAVY if m in modules) or "none"))
+
+    runs = [asyncio.run(first_response()) for _ in range(args.repeat)]
+    initialize = statistics.median(r[0] for r in runs)
+    first_call = statistics.median(r[1] for r in runs)
+    print(f"stdio spawn -> initialize reply: {initialize * 1e3:.0f}ms  -> first tool reply: {first_call * 1e3:.0f}ms "
+          f"(median of {args.repeat}, target {args.target_ms:.0f}ms)")
+    sys.exit(0 if first_call * 1e3 <= args.target_ms else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Watch-mode update latency for a one-line edit to a large file.
+
+Usage: DATABASE_URL=... python scripts/bench_watch.py [--functions 5000] [--repeat 10]
+
+Generates a module with ``--functions`` functions and times, for a
+one-line edit in its middle, a full tree-sitter parse against an
+incremental parse of the edited cached tree (Python and JavaScript), then
+the whole ``Watcher.apply`` on the Python module in a temporary directory:
+parse, extraction, row replacement and callee resolution in one
+transaction.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.parse_pool import _get_parser  # noqa: E402
+from app.watch import Watcher, edit_tree  # noqa: E402
+
+
+def module(functions: int, edited: int | None = None, version: int = 0, language: str = "python") -> bytes:
+    lines = []
+    for i in range(functions):
+        value = version if i == edited else 0
+        if language == "python":
+            lines.append(f"def func{i}(x):\n    return helper{i % 97}(x) + {value}\n\n")
+        else:
+            lines.append(f"function func{i}(x) {{\n  return helper{i % 97}(x) + {value};\n}}\n\n")
+    return "".join(lines).encode()
+
+
+def _best(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--functions", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=10)
+    args = ap.parse_args()
+    mid = args.functions // 2
+    parse_times = {}
+    for language in ("python", "javascript"):
+        old, new = module(args.functions, language=language), module(args.functions, mid, 1, language)
+        parser = _get_parser(language)
+        full = _best(lambda: parser.parse(new), args.repeat)
+
+        def incremental():
+            tree = parser.parse(old)
+            t0 = time.perf_counter()
+            edit_tree(tree, old, new)
+            parser.parse(new, tree)
+            return time.perf_counter() - t0
+
+        parse_times[language] = full, min(incremental() for _ in range(args.repeat))
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "big.py")
+        with open(path, "wb") as f:
+            f.write(module(args.functions))
+        watcher = Watcher(root, use_watchdog=False)
+        run_id = watcher.start()
+        timings = {True: [], False: []}
+        for version in range(1, 2 * args.repeat + 1):
+            cached = watcher.trees.get(path, "python") is not None
+            if version % 2 and cached:
+                watcher.trees.discard(path)
+                cached = False
+            with open(path, "wb") as f:
+                f.write(module(args.functions, mid, version))
+            t0 = time.perf_counter()
+            watcher.apply([path])
+            timings[cached].append(time.perf_counter() - t0)
+
+    print(f"{args.functions} functions, {len(module(args.functions)) / 1024:.0f} KiB of Python, run={run_id}")
+    for language, (full, incr) in parse_times.items():
+        print(f"parse {language:<14} full={full * 1e3:7.2f}ms  edit+incremental={incr * 1e3:7.2f}ms")
+    print(f"Watcher.apply        cold={min(timings[False]) * 1e3:7.2f}ms  cached tree={min(timings[True]) * 1e3:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
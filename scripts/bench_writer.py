@@ -0,0 +1,52 @@
+"""Compare ast_nodes write throughput of the ORM and COPY writers.
+
+Usage: DATABASE_URL=... python scripts/bench_writer.py [--files N]
+
+Synthetic files are parsed once, then written by each writer inside a
+transaction that is rolled back, so the database is left unchanged.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.db import SessionLocal  # noqa: E402
+from app.models import Run  # noqa: E402
+from app.parse_pool import iter_parsed  # noqa: E402
+from app.writers import make_writer  # noqa: E402
+from bench_parse import _synthetic  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=100)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        parsed = list(iter_parsed("python", _synthetic(tmpdir, args.files)))
+    rows = sum(len(p.nodes) for p in parsed)
+
+    for kind in ("orm", "copy"):
+        db = SessionLocal()
+        try:
+            run = Run(language="python")
+            db.add(run)
+            db.flush()
+            t0 = time.perf_counter()
+            writer = make_writer(db, run.id, kind)
+            for p in parsed:
+                writer.add(p)
+            writer.flush()
+            elapsed = time.perf_counter() - t0
+            print(f"{type(writer).__name__:<11} files={len(parsed)} rows={rows} "
+                  f"time={elapsed:.2f}s rows/sec={rows / elapsed:,.0f}")
+        finally:
+            db.rollback()
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Sustained QPS and latency percentiles under many concurrent clients.
+
+Usage: python scripts/loadtest.py [--url http://localhost:8000] [--clients 500] [--seconds 20]
+                                  [--path '/query/defs?name=helper{n}_3'] ...
+
+Targets a running server (``uvicorn app.main:app``). Each client loops over
+the paths, replacing ``{n}`` with a random integer below ``--n-max`` so
+lookups do not all hit the same rows. Requests during the warmup are not
+counted. The defaults match the synthetic files of ``bench_parse.py``.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+DEFAULT_PATHS = [
+    "/query/defs?name=helper{n}_3&limit=20",
+    "/query?name=helper{n}_&match=prefix&limit=50",
+    "/runs?limit=10",
+]
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+async def _client(http: httpx.AsyncClient, paths: list[str], n_max: int, start: float, stop: float,
+                  latencies: list[float], errors: list[int]):
+    rng = random.Random()
+    while True:
+        path = rng.choice(paths).replace("{n}", str(rng.randrange(n_max)))
+        t0 = time.perf_counter()
+        if t0 >= stop:
+            return
+        try:
+            resp = await http.get(path)
+            ok = resp.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        t1 = time.perf_counter()
+        if t0 >= start:
+            if ok:
+                latencies.append(t1 - t0)
+            else:
+                errors.append(1)
+
+
+async def run(args) -> None:
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as http:
+        latencies: list[float] = []
+        errors: list[int] = []
+        start = time.perf_counter() + args.warmup
+        stop = start + args.seconds
+        await asyncio.gather(*(
+            _client(http, args.path or DEFAULT_PATHS, args.n_max, start, stop, latencies, errors)
+            for _ in range(args.clients)
+        ))
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    print(
+        f"clients={args.clients} requests={len(latencies)} errors={len(errors)} "
+        f"qps={len(latencies) / args.seconds:,.0f} "
+        f"p50={_percentile(ms, 50):.1f}ms p95={_percentile(ms, 95):.1f}ms p99={_percentile(ms, 99):.1f}ms"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://localhost:8000")
+    ap.add_argument("--path", action="append", help="request path; may be repeated (default: a lookup mix)")
+    ap.add_argument("--clients", type=int, default=500)
+    ap.add_argument("--seconds", type=float, default=20)
+    ap.add_argument("--warmup", type=float, default=3)
+    ap.add_argument("--timeout", type=float, default=30)
+    ap.add_argument("--n-max", type=int, default=1000)
+    asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
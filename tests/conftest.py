@@ -1,10 +1,14 @@
 import os
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
+from app.cache import result_cache
+from app.columnar import columnar_store
 from app.db import Base
-from app.main import app, get_db
+from app.main import app, get_db, get_read_db, get_async_db, get_async_read_db
 
 
 @pytest.fixture(scope="session")
@@ -31,14 +35,30 @@ def db_session(db_engine):
 
 
 @pytest.fixture()
-def client(db_session):
+def client(db_session, db_engine):
     def override_get_db():
         try:
             yield db_session
         finally:
             pass
 
+    # Async endpoints get their own connection per request; NullPool keeps
+    # connections from outliving the TestClient's event loop.
+    AsyncTestSession = async_sessionmaker(
+        bind=create_async_engine(db_engine.url, poolclass=NullPool), expire_on_commit=False,
+    )
+
+    async def override_get_async_db():
+        async with AsyncTestSession() as db:
+            yield db
+
+    # Run ids restart with the schema; never serve another session's results.
+    result_cache.clear()
+    columnar_store.clear()
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
     from fastapi.testclient import TestClient
     with TestClient(app) as c:
         yield c
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 
@@ -82,3 +83,454 @@ def test_list_run_files(client, tmp_path):
     results = resp.json()["results"]
     assert len(results) == 1
     assert results[0]["path"] == str(sample)
+
+
+def test_incremental_ingest_reuses_unchanged_files(client, tmp_path, monkeypatch):
+    import app.parse_pool
+
+    a = tmp_path / "a.py"
+    b = tmp_path / "b.py"
+    a.write_text("class A:\n    def m(self):\n        return go(self)\n")
+    b.write_text("def b(): pass\n")
+    files = [str(a), str(b)]
+    first = client.post("/ingest", json={"language": "python", "files": files}).json()["run_id"]
+
+    parsed_paths = []
+    real_parse = app.parse_pool.parse_file
+
+    def counting_parse(language, path, *args):
+        parsed_paths.append(path)
+        return real_parse(language, path, *args)
+
+    monkeypatch.setattr(app.parse_pool, "parse_file", counting_parse)
+    b.write_text("def b(): return 1\n")
+    resp = client.post("/ingest", json={"language": "python", "files": files, "incremental": True})
+    second = resp.json()["run_id"]
+    assert parsed_paths == [str(b)]
+
+    def shape(run_id):
+        nodes = client.get("/query", params={"run_id": run_id, "file_id": _file_id(client, run_id, a)}).json()["results"]
+        details = [client.get(f"/nodes/{n['id']}").json() for n in nodes]
+        ids = {d["id"]: i for i, d in enumerate(sorted(details, key=lambda d: d["id"]))}
+        return sorted((ids[d["id"]], d["kind"], d["name"], d["start"], ids.get(d["parent_id"])) for d in details)
+
+    assert shape(second) == shape(first)
+    assert len(shape(second)) == 3
+
+
+def _file_id(client, run_id, path):
+    files = client.get(f"/runs/{run_id}/files").json()["results"]
+    return next(f["id"] for f in files if f["path"] == str(path))
+
+
+def test_ingest_directory_mixed_languages(client, tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "mod.py").write_text("def py_fn(): pass\n")
+    (tmp_path / "pkg" / "ui.js").write_text("function jsFn() { return 1; }\n")
+    (tmp_path / "pkg" / "site.css").write_text("a { color: red; }\n")
+    (tmp_path / "pkg" / "notes.md").write_text("# notes\n")
+    (tmp_path / ".gitignore").write_text("ignored/\n")
+    (tmp_path / "ignored").mkdir()
+    (tmp_path / "ignored" / "skip.py").write_text("def skipped(): pass\n")
+
+    resp = client.post("/ingest", json={"root_path": str(tmp_path)})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["files_indexed"] == 3
+
+    files = client.get(f"/runs/{data['run_id']}/files").json()["results"]
+    assert {os.path.basename(f["path"]): f["language"] for f in files} == {
+        "mod.py": "python", "ui.js": "javascript", "site.css": "css",
+    }
+    defs = client.get("/query/defs", params={"run_id": data["run_id"]}).json()["results"]
+    assert {d["name"] for d in defs} == {"py_fn", "jsFn"}
+    rules = client.get("/query", params={"run_id": data["run_id"], "kind": "rule_set"}).json()["results"]
+    assert len(rules) == 1
+
+
+def test_ingest_requires_files_or_root(client):
+    resp = client.post("/ingest", json={"language": "python"})
+    assert resp.status_code == 422
+
+
+def test_background_ingest_and_poll(client, tmp_path):
+    import time
+
+    sample = tmp_path / "bg.py"
+    sample.write_text("def bg(): pass\n")
+    resp = client.post("/ingest", json={"files": [str(sample)], "background": True})
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "pending"
+    run_id = resp.json()["run_id"]
+
+    deadline = time.time() + 10
+    while True:
+        run = client.get(f"/runs/{run_id}").json()
+        if run["status"] not in ("pending", "running") or time.time() > deadline:
+            break
+        time.sleep(0.05)
+    assert run["status"] == "completed"
+    assert (run["files_total"], run["files_done"]) == (1, 1)
+
+    cancelled = client.post(f"/runs/{run_id}/cancel").json()
+    assert cancelled["status"] == "completed"
+    assert client.get("/runs/999999").status_code == 404
+
+
+def test_query_keyset_pagination_and_ndjson_stream(client, tmp_path):
+    import json as _json
+
+    sample = tmp_path / "calls.py"
+    sample.write_text("".join(f"f{i}()\n" for i in range(7)))
+    run_id = client.post("/ingest", json={"language": "python", "files": [str(sample)]}).json()["run_id"]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"run_id": run_id, "limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/query/calls", params=params).json()
+        seen.extend(r["name"] for r in body["results"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"f{i}" for i in range(7)]
+
+    resp = client.get("/query/calls", params={"run_id": run_id, "stream": True})
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [_json.loads(line) for line in resp.text.splitlines()]
+    assert [r["name"] for r in rows] == seen
+
+    first_page = client.get("/query/calls", params={"run_id": run_id, "limit": 2}).json()
+    rest = client.get("/query/calls", params={"run_id": run_id, "stream": True, "cursor": first_page["next_cursor"]})
+    assert [_json.loads(line)["name"] for line in rest.text.splitlines()] == seen[2:]
+
+    assert client.get("/query", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_query_name_match_modes(client, tmp_path):
+    sample = tmp_path / "names.py"
+    sample.write_text(
+        "def parse_file(): pass\n"
+        "def parse_chunk(): pass\n"
+        "def ParseError(): pass\n"
+        "def reparse_file(): pass\n",
+    )
+    run_id = client.post("/ingest", json={"language": "python", "files": [str(sample)]}).json()["run_id"]
+
+    def names(**params):
+        resp = client.get("/query/defs", params={"run_id": run_id, **params})
+        assert resp.status_code == 200
+        return [r["name"] for r in resp.json()["results"]]
+
+    assert names(name="parse_", match="prefix") == ["parse_file", "parse_chunk"]
+    assert names(name="parse", match="prefix", ignore_case=True) == ["parse_file", "parse_chunk", "ParseError"]
+    assert names(name="parse_file", match="substring") == ["parse_file", "reparse_file"]
+    assert names(name="PARSE", match="substring", ignore_case=True) == [
+        "parse_file", "parse_chunk", "ParseError", "reparse_file",
+    ]
+    assert names(name="parseerror", ignore_case=True) == ["ParseError"]
+    # LIKE wildcards in the query are matched literally (via the name index and via LIKE).
+    assert names(name="p_rse", match="substring") == []
+    assert names(name="s_", match="substring") == []
+    assert names(name="e_", match="substring") == ["parse_file", "parse_chunk", "reparse_file"]
+
+    fuzzy = client.get("/query/defs", params={"run_id": run_id, "name": "pars_fil", "match": "fuzzy"}).json()
+    assert fuzzy["results"][0]["name"] == "parse_file"
+    assert fuzzy["next_cursor"] is None
+
+    assert client.get("/query", params={"name": "x", "match": "regex"}).status_code == 422
+    assert client.get("/query", params={"name": "x", "match": "fuzzy", "cursor": "abc"}).status_code == 400
+
+
+def test_fuzzy_query_scoped_to_project(client, tmp_path):
+    # Another project's closer match must not take the only slot.
+    for root, source in (("proj", "def parse_file(): pass\n"), ("other", "def parse_fil(): pass\n")):
+        (tmp_path / root).mkdir()
+        (tmp_path / root / "m.py").write_text(source)
+        client.post("/ingest", json={"root_path": str(tmp_path / root)})
+    project = next(p for p in client.get("/projects").json()["results"] if p["root_path"] == str(tmp_path / "proj"))
+    params = {"project_id": project["id"], "name": "parse_fil", "match": "fuzzy", "limit": 1}
+    assert [d["name"] for d in client.get("/query/defs", params=params).json()["results"]] == ["parse_file"]
+
+
+def test_call_graph_traversal(client, tmp_path):
+    (tmp_path / "a.py").write_text(
+        "def leaf():\n    return 1\n\n"
+        "def mid():\n    return leaf()\n\n"
+        "class Svc:\n"
+        "    def run(self):\n        return self.helper() + mid()\n"
+        "    def helper(self):\n        return 2\n"
+    )
+    (tmp_path / "b.py").write_text(
+        "from a import mid\n\n"
+        "def top():\n    return mid() + len([])\n\n"
+        "def other():\n    return top()\n"
+    )
+    files = [str(tmp_path / "a.py"), str(tmp_path / "b.py")]
+
+    def walk(direction, **params):
+        resp = client.get(f"/graph/{direction}", params=params)
+        assert resp.status_code == 200
+        return [(r["name"], r["depth"]) for r in resp.json()["results"]]
+
+    for incremental in (False, True):
+        body = {"language": "python", "files": files, "incremental": incremental}
+        run_id = client.post("/ingest", json=body).json()["run_id"]
+
+        assert walk("callers", name="leaf", run_id=run_id, depth=1) == [("mid", 1)]
+        assert walk("callers", name="leaf", run_id=run_id) == [("mid", 1), ("run", 2), ("top", 2), ("other", 3)]
+        assert walk("callees", name="other", run_id=run_id) == [("top", 1), ("mid", 2), ("leaf", 3)]
+        assert walk("callees", name="run", run_id=run_id, depth=1) == [("mid", 1), ("helper", 1)]
+
+    leaf_id = client.get("/query/defs", params={"name": "leaf", "run_id": run_id}).json()["results"][0]["id"]
+    assert walk("callers", node_id=leaf_id, depth=1) == [("mid", 1)]
+    assert client.get("/graph/callers").status_code == 400
+    assert client.get("/graph/callers", params={"node_id": 10**12}).status_code == 404
+    assert client.get("/graph/callees", params={"name": "x", "depth": 99}).status_code == 422
+
+
+def test_node_tree_navigation(client, tmp_path):
+    sample = tmp_path / "t.py"
+    sample.write_text(
+        "class Svc:\n"
+        "    def run(self):\n        return go(1)\n"
+        "    def stop(self):\n        halt()\n"
+        "def free():\n    go(2)\n"
+    )
+    run_id = client.post("/ingest", json={"language": "python", "files": [str(sample)]}).json()["run_id"]
+    defs = {r["name"]: r["id"] for r in client.get("/query/defs", params={"run_id": run_id}).json()["results"]}
+
+    def names(path, **params):
+        resp = client.get(path, params=params)
+        assert resp.status_code == 200
+        return [r["name"] for r in resp.json()["results"] if r["name"]]
+
+    calls = names(f"/nodes/{defs['Svc']}/descendants", kind="call_expression")
+    assert calls == ["go", "halt"]
+    assert names(f"/nodes/{defs['free']}/descendants", kind="call_expression") == ["go"]
+    assert names(f"/nodes/{defs['Svc']}/descendants", kind="function_definition") == ["run", "stop"]
+
+    first = client.get(f"/nodes/{defs['Svc']}/descendants", params={"limit": 2}).json()
+    rest = client.get(f"/nodes/{defs['Svc']}/descendants", params={"cursor": first["next_cursor"]}).json()
+    every = client.get(f"/nodes/{defs['Svc']}/descendants").json()["results"]
+    assert first["results"] + rest["results"] == every
+
+    halt_id = client.get("/query/calls", params={"name": "halt", "run_id": run_id}).json()["results"][0]["id"]
+    assert names(f"/nodes/{halt_id}/ancestors") == ["Svc", "stop"]
+    assert names(f"/nodes/{halt_id}/ancestors", kind="class_definition") == ["Svc"]
+
+    children = client.get(f"/nodes/{defs['Svc']}/children").json()["results"]
+    assert all(client.get(f"/nodes/{c['id']}").json()["parent_id"] == defs["Svc"] for c in children)
+    assert client.get("/nodes/999999999/descendants").status_code == 404
+
+
+def test_query_results_are_cached_per_run(client, tmp_path):
+    sample = tmp_path / "c.py"
+    sample.write_text("def cached():\n    pass\n")
+    body = {"language": "python", "files": [str(sample)]}
+    run_id = client.post("/ingest", json=body).json()["run_id"]
+
+    def stats():
+        return client.get("/cache/stats").json()
+
+    before = stats()
+    first = client.get("/query/defs", params={"name": "cached", "run_id": run_id}).json()
+    again = client.get("/query/defs", params={"name": "cached", "run_id": run_id}).json()
+    assert first == again and len(first["results"]) == 1
+    assert stats()["hits"] == before["hits"] + 1
+
+    # A new run drops cross-run entries but not the finished run's.
+    client.get("/query/defs", params={"name": "cached"})
+    assert len(client.get("/query/defs", params={"name": "cached"}).json()["results"]) == 1
+    client.post("/ingest", json=body)
+    hits = stats()["hits"]
+    assert client.get("/query/defs", params={"name": "cached", "run_id": run_id}).json() == first
+    assert len(client.get("/query/defs", params={"name": "cached"}).json()["results"]) == 2
+    assert stats()["hits"] == hits + 1
+
+
+def test_columnar_run_serves_queries(client, tmp_path):
+    sample = tmp_path / "col.py"
+    sample.write_text("def alpha():\n    beta()\n\ndef beta():\n    pass\n")
+    run_id = client.post("/ingest", json={"language": "python", "files": [str(sample)]}).json()["run_id"]
+    params = {"run_id": run_id, "limit": 1}
+    before = [client.get("/query/defs", params=params).json(), client.get("/query/calls", params=params).json()]
+
+    loaded = client.post(f"/runs/{run_id}/columnar").json()
+    assert loaded["run_id"] == run_id and loaded["nodes"] > 0
+    assert run_id in [r["run_id"] for r in client.get("/columnar").json()["results"]]
+    after = [client.get("/query/defs", params=params).json(), client.get("/query/calls", params=params).json()]
+    assert after == before
+    second = client.get("/query/defs", params={**params, "cursor": after[0]["next_cursor"]}).json()
+    assert [r["name"] for r in second["results"]] == ["beta"]
+
+    assert client.delete(f"/runs/{run_id}/columnar").status_code == 200
+    assert client.delete(f"/runs/{run_id}/columnar").status_code == 404
+    assert client.post("/runs/999999/columnar").status_code == 404
+
+
+def _wait_gone(client, run_id):
+    import time
+
+    deadline = time.time() + 10
+    while client.get(f"/runs/{run_id}").status_code != 404 and time.time() < deadline:
+        time.sleep(0.05)
+
+
+def test_project_latest_view_and_retention(client, db_session, tmp_path, monkeypatch):
+    from sqlalchemy import text
+    from app.config import settings
+    from app.partitions import partition_name
+
+    a, b, c = (tmp_path / n for n in ("a.py", "b.py", "c.py"))
+    a.write_text("def alpha(): pass\n")
+    b.write_text("def beta(): pass\n")
+    walk = {"root_path": str(tmp_path) + "/"}
+    first = client.post("/ingest", json=walk).json()["run_id"]
+
+    # A second full walk: b.py deleted, a.py changed, c.py new. With a
+    # retention of one run, the first is purged once this completes.
+    monkeypatch.setattr(settings, "retain_runs", 1)
+    b.unlink()
+    a.write_text("def alpha2(): pass\n")
+    c.write_text("def gamma(): pass\n")
+    second = client.post("/ingest", json={**walk, "incremental": True}).json()["run_id"]
+    assert client.get(f"/runs/{first}").status_code == 404
+    # A partial run only replaces the paths it covers.
+    c.write_text("def delta(): pass\n")
+    third = client.post("/ingest", json={"files": [str(c)], "root_path": str(tmp_path)}).json()["run_id"]
+
+    project = next(p for p in client.get("/projects").json()["results"] if p["root_path"] == str(tmp_path))
+    assert project["latest_run_id"] == third
+    assert client.get(f"/runs/{third}").json()["project_id"] == project["id"]
+    files = client.get(f"/projects/{project['id']}/files").json()["results"]
+    assert [(os.path.basename(f["path"]), f["run_id"]) for f in files] == [("a.py", second), ("c.py", third)]
+    defs = client.get("/query/defs", params={"project_id": project["id"]}).json()["results"]
+    assert sorted(d["name"] for d in defs) == ["alpha2", "delta"]
+
+    # The second run still holds a.py's latest version, so retention keeps it.
+    assert client.post("/gc", params={"project_id": project["id"], "keep": 1}).json() == {"runs": []}
+    deleting = client.delete(f"/runs/{second}").json()
+    assert deleting["status"] == "deleting"
+    _wait_gone(client, second)
+    assert client.get(f"/runs/{second}").status_code == 404
+    # The run's nodes went with its partition.
+    assert db_session.execute(text("SELECT to_regclass(:name)"), {"name": partition_name(second)}).scalar() is None
+    assert client.get("/query/defs", params={"name": "alpha2"}).json()["results"] == []
+    defs = client.get("/query/defs", params={"project_id": project["id"]}).json()["results"]
+    assert [d["name"] for d in defs] == ["delta"]
+    assert client.delete("/runs/999999").status_code == 404
+
+
+def test_source_batch_by_range_and_node(client, tmp_path):
+    sample = tmp_path / "s.py"
+    sample.write_text("def one():\n    return 1\n\ndef two():\n    return 2\n")
+    run_id = client.post("/ingest", json={"language": "python", "files": [str(sample)]}).json()["run_id"]
+    defs = client.get("/query/defs", params={"run_id": run_id}).json()["results"]
+
+    resp = client.post("/source/batch", json={
+        "slices": [
+            {"path": str(sample), "start_byte": 4, "end_byte": 7},
+            {"path": str(tmp_path / "missing.py"), "start_byte": 0, "end_byte": 1},
+        ],
+        "node_ids": [defs[1]["id"], 10**12],
+    })
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert results[0]["text"] == "one"
+    assert "error" in results[1]
+    assert results[2]["node_id"] == defs[1]["id"]
+    assert results[2]["text"] == "def two():\n    return 2"
+    assert results[3] == {"node_id": 10**12, "error": "node not found"}
+
+    # Rewriting the file invalidates its cached mapping.
+    sample.write_text("def uno():\n    return 1\n")
+    text = client.post("/source", json={"path": str(sample), "start_byte": 4, "end_byte": 7}).json()["text"]
+    assert text == "uno"
+    assert client.post("/source", json={"path": str(tmp_path / "nope"), "start_byte": 0, "end_byte": 1}).status_code == 404
+
+
+def test_node_slices_come_from_snapshots(client, tmp_path, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "source_snapshots", True)
+    sample = tmp_path / "snap.py"
+    sample.write_text("def kept():\n    return 'original'\n")
+    run_id = client.post("/ingest", json={"language": "python", "files": [str(sample)]}).json()["run_id"]
+    node_id = client.get("/query/defs", params={"name": "kept", "run_id": run_id}).json()["results"][0]["id"]
+
+    # The workspace changes after ingest; node slices still show what was parsed.
+    sample.write_text("# edited\n")
+    results = client.post("/source/batch", json={"node_ids": [node_id]}).json()["results"]
+    assert results[0]["text"] == "def kept():\n    return 'original'"
+    sample.unlink()
+    results = client.post("/source/batch", json={"node_ids": [node_id]}).json()["results"]
+    assert results[0]["text"].startswith("def kept()")
+
+
+def test_batch_runs_mixed_operations(client, tmp_path):
+    sample = tmp_path / "b.py"
+    sample.write_text("def helper():\n    return 1\n\ndef main():\n    return helper()\n")
+    run_id = client.post("/ingest", json={"language": "python", "files": [str(sample)]}).json()["run_id"]
+    main_id = client.get("/query/defs", params={"name": "main", "run_id": run_id}).json()["results"][0]["id"]
+
+    resp = client.post("/batch", json={"operations": [
+        {"op": "query_defs", "run_id": run_id},
+        {"op": "get_node", "node_id": main_id},
+        {"op": "get_node", "node_id": 10**12},
+        {"op": "get_sources", "node_ids": [main_id]},
+        {"op": "get_source", "path": str(sample), "start_byte": 4, "end_byte": 10},
+        {"op": "callees", "node_id": main_id, "depth": 1},
+        {"op": "get_run", "run_id": run_id},
+        {"op": "get_descendants", "node_id": main_id, "kind": "call_expression"},
+        {"op": "drop_tables"},
+        {"op": "get_file", "file_id": "x"},
+    ]})
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [d["name"] for d in results[0]] == ["helper", "main"]
+    assert results[1] == client.get(f"/nodes/{main_id}").json()
+    assert results[2] == {"error": "node not found"}
+    assert results[3][0]["text"] == "def main():\n    return helper()"
+    assert results[4]["text"] == "helper"
+    assert [r["name"] for r in results[5]] == ["helper"]
+    assert results[6]["status"] == "completed"
+    assert [r["name"] for r in results[7]] == ["helper"]
+    assert results[8] == {"error": "unknown op: drop_tables"}
+    assert results[9]["error"].startswith("get_file: file_id:")
+
+    too_many = [{"op": "get_run", "run_id": run_id}] * 1000
+    assert client.post("/batch", json={"operations": too_many}).status_code == 400
+
+
+def test_symbol_context(client, tmp_path):
+    (tmp_path / "lib.py").write_text(
+        "import os\nfrom util import clean\n\n\ndef parse(text):\n    return clean(text).split(os.sep)\n"
+    )
+    (tmp_path / "app.py").write_text(
+        "from lib import parse\n\n\nclass App:\n    def run(self, s):\n        return parse(s)\n\n\nparse('x')\n"
+    )
+    run_id = client.post("/ingest", json={"root_path": str(tmp_path)}).json()["run_id"]
+
+    resp = client.get("/symbols/parse/context", params={"run_id": run_id})
+    assert resp.status_code == 200
+    ctx = resp.json()
+    [definition] = ctx["definitions"]
+    assert definition["path"].endswith("lib.py")
+    assert definition["text"] == "def parse(text):\n    return clean(text).split(os.sep)"
+    sites = [(s["caller"] and s["caller"]["name"], s["line"]) for s in ctx["call_sites"]]
+    assert sites == [("run", "return parse(s)"), (None, "parse('x')")]
+    assert {c["name"] for c in ctx["callees"]} == {"clean", "split"}
+    assert [i["name"] for i in ctx["imports"]] == ["os", "util"]
+    assert ctx["truncated"] is False
+
+    # The byte budget goes to the body first, then to call-site lines.
+    ctx = client.get("/symbols/parse/context", params={"run_id": run_id, "max_bytes": 20}).json()
+    assert ctx["definitions"][0]["text"] == "def parse(text):\n   "
+    assert ctx["definitions"][0]["truncated"] is True
+    assert all("line" not in s for s in ctx["call_sites"])
+    assert ctx["truncated"] is True
+
+    assert client.get("/symbols/nothing/context", params={"run_id": run_id}).status_code == 404
@@ -0,0 +1,50 @@
+import time
+
+from app.cache import ALL_RUNS, ResultCache, query_cache_key, run_tag
+
+
+def test_lru_bound_and_ttl():
+    cache = ResultCache(max_entries=2, ttl=60)
+    for key in ("a", "b", "c"):
+        cache.put(key, ALL_RUNS, key.encode())
+    assert cache.get("a", ALL_RUNS) is None
+    assert cache.get("c", ALL_RUNS) == b"c"
+    assert cache.stats()["evictions"] == 1
+
+    short = ResultCache(max_entries=10, ttl=0.01)
+    short.put("k", ALL_RUNS, b"v")
+    time.sleep(0.02)
+    assert short.get("k", ALL_RUNS) is None
+
+
+def test_finished_runs_survive_other_runs_changes():
+    cache = ResultCache(max_entries=10, ttl=60)
+    assert cache.needs_status(1)
+    assert cache.tag_for(1, "running") is None
+    tag = cache.tag_for(1, "completed")
+    assert tag == run_tag(1)
+
+    cache.put("run1", tag, b"x")
+    cache.put("all", cache.tag_for(None), b"y")
+    cache.invalidate_run(2)
+    assert cache.get("run1", tag) == b"x"
+    assert cache.get("all", ALL_RUNS) is None
+
+    cache.invalidate_run(1, deleted=True)
+    assert cache.get("run1", tag) is None
+    assert cache.needs_status(1)
+
+
+def test_results_computed_across_an_invalidation_are_not_stored():
+    cache = ResultCache(max_entries=10, ttl=60)
+    generation = cache.generation
+    cache.invalidate_run(3)
+    cache.put("k", ALL_RUNS, b"stale", generation)
+    assert cache.get("k", ALL_RUNS) is None
+
+
+def test_keys_ignore_unset_params_and_case_insensitive_names():
+    a = query_cache_key("defs", name="Foo", ignore_case=True, run_id=None, limit=50)
+    b = query_cache_key("defs", limit=50, ignore_case=True, name="foo")
+    assert a == b
+    assert query_cache_key("defs", name="Foo") != query_cache_key("defs", name="foo")
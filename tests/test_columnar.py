@@ -0,0 +1,81 @@
+import pytest
+
+from sqlalchemy import update
+
+from app.columnar import ColumnarStore, columnar_store
+from app.ingest import ingest_files
+from app.models import Run
+from app.query import SUMMARY_COLUMNS, nodes_statement, query_columnar, query_defs
+
+SOURCE = (
+    "class Widget:\n"
+    "    def render(self):\n        return draw(self)\n"
+    "    def Render_all(self):\n        draw(1); render_one()\n"
+    "def draw(x):\n    return x\n"
+    "def render_one():\n    draw(2)\n"
+)
+
+
+def test_columnar_queries_match_postgres(db_session, tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"w{i}.py"
+        path.write_text(SOURCE)
+        paths.append(str(path))
+    run_id = ingest_files(db_session, "python", paths)
+    store = ColumnarStore(max_runs=1)
+    columns = store.load(db_session, run_id)
+    file_id = columns.file_ids[1].item()
+    first_id = columns.ids[5].item()
+
+    cases = [
+        {},
+        {"kind": "call_expression"},
+        {"kinds": ["function_definition", "class_definition"], "file_id": file_id},
+        {"name": "draw"},
+        {"name": "render", "match": "prefix"},
+        {"name": "RENDER", "match": "prefix", "ignore_case": True},
+        {"name": "ender", "match": "substring", "kind": "function_definition"},
+        {"name": "render_all", "ignore_case": True},
+        {"name": "missing"},
+        {"kind": "no_such_kind"},
+        {"file_id": 10**9},
+        {"after_id": first_id, "limit": 4},
+        {"name": "draw", "after_id": first_id, "limit": None},
+    ]
+    for filters in cases:
+        filters = {"limit": 50, **filters}
+        expected = db_session.execute(
+            nodes_statement(db_session, run_id=run_id, columns=SUMMARY_COLUMNS, **filters)
+        ).all()
+        assert [tuple(r) for r in columns.query(**filters)] == [tuple(r) for r in expected], filters
+
+    assert columns.query(name="drw", match="fuzzy") is None
+    assert store.get(run_id, 0) is columns and store.loaded()[0]["nodes"] == len(columns)
+    assert store.drop(run_id) and store.get(run_id, 0) is None
+    with pytest.raises(LookupError):
+        store.load(db_session, 10**9)
+
+
+def test_runs_being_deleted_are_not_served_from_memory(db_session, tmp_path):
+    path = tmp_path / "w.py"
+    path.write_text(SOURCE)
+    run_id = ingest_files(db_session, "python", [str(path)])
+    try:
+        columnar_store.load(db_session, run_id)
+        rows = query_defs(db_session, name="draw", run_id=run_id, columns=SUMMARY_COLUMNS)
+        assert [r.name for r in rows] == ["draw"] and run_id in columnar_store
+
+        # Marked by another process: this one still holds the snapshot.
+        db_session.execute(update(Run).where(Run.id == run_id).values(status="deleting"))
+        db_session.commit()
+        query_defs(db_session, name="draw", run_id=run_id, columns=SUMMARY_COLUMNS)
+        assert run_id not in columnar_store
+
+        # A run that is gone altogether.
+        db_session.execute(update(Run).where(Run.id == run_id).values(status="completed"))
+        db_session.commit()
+        columnar_store.load(db_session, run_id)
+        assert query_columnar(run_id, None, name="draw") is None and run_id not in columnar_store
+    finally:
+        columnar_store.clear()
@@ -0,0 +1,34 @@
+from app.cst_codec import CstTree, encode_tree
+from app.treesitter import get_ts_parser
+
+
+def _pairs(a, b):
+    stack = [(a, b)]
+    while stack:
+        x, y = stack.pop()
+        yield x, y
+        assert x.child_count == y.child_count
+        stack.extend(zip(x.children, y.children))
+
+
+def test_roundtrip_matches_tree_sitter():
+    src = b"import os\n\nclass A(B):\n    def f(self, x):\n        return os.path.join(x, 'y') + 1\n"
+    tree = get_ts_parser("python").parse(src)
+    decoded = CstTree(encode_tree(tree))
+
+    assert decoded.node_count == tree.root_node.descendant_count
+    count = 0
+    for ts_node, node in _pairs(tree.root_node, decoded.root_node):
+        assert (node.type, node.is_named, node.start_byte, node.end_byte) == (
+            ts_node.type, ts_node.is_named, ts_node.start_byte, ts_node.end_byte)
+        for child in node.children:
+            assert child.parent == node
+        count += 1
+    assert count == decoded.node_count
+    assert decoded.root_node.parent is None
+
+
+def test_binary_is_smaller_than_sexp():
+    src = b"".join(b"def f%d(a, b):\n    return g(a)[b].h()\n" % i for i in range(200))
+    tree = get_ts_parser("python").parse(src)
+    assert len(encode_tree(tree)) * 2 < len(tree.root_node.sexp())
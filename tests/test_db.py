@@ -0,0 +1,19 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import Settings
+from app.db import round_robin
+
+
+def test_read_sessions_rotate_over_replicas():
+    replicas = [create_engine(f"postgresql+psycopg://reader@replica{i}/reason") for i in range(2)]
+    make_session = round_robin(sessionmaker(), replicas)
+    assert [make_session().get_bind() for _ in range(4)] == replicas * 2
+
+
+def test_replica_urls_from_environment(monkeypatch):
+    monkeypatch.setenv("DATABASE_REPLICA_URLS", '["postgresql+psycopg://a/r", "postgresql+psycopg://b/r"]')
+    monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+    settings = Settings()
+    assert settings.database_replica_urls == ["postgresql+psycopg://a/r", "postgresql+psycopg://b/r"]
+    assert settings.db_pool_pre_ping is False
@@ -0,0 +1,78 @@
+import os
+
+from app.discover import iter_source_files, source_language
+
+
+def _tree(root, files):
+    for rel, body in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(body)
+
+
+def _rel(root, found):
+    return [(os.path.relpath(p, root), lang) for p, lang in found]
+
+
+def test_walk_detects_languages_and_honors_gitignore(tmp_path):
+    _tree(tmp_path, {
+        ".gitignore": "build/\n*.log\nvendor/*.js\n!vendor/keep.js\n",
+        "a.py": "",
+        "b.txt": "",
+        "web/app.jsx": "",
+        "web/style.css": "",
+        "web/sub/.gitignore": "gen_*.ts\n",
+        "web/sub/gen_x.ts": "",
+        "web/sub/real.ts": "",
+        "build/out.py": "",
+        "vendor/lib.js": "",
+        "vendor/keep.js": "",
+        ".git/hooks/x.py": "",
+    })
+
+    assert _rel(tmp_path, iter_source_files(str(tmp_path))) == [
+        ("a.py", "python"),
+        ("vendor/keep.js", "javascript"),
+        ("web/app.jsx", "jsx"),
+        ("web/style.css", "css"),
+        ("web/sub/real.ts", "ts"),
+    ]
+
+
+def test_walk_include_exclude_and_language_filter(tmp_path):
+    _tree(tmp_path, {
+        "src/pkg/a.py": "",
+        "src/pkg/b.js": "",
+        "src/pkg/tests/test_a.py": "",
+        "scripts/run.py": "",
+    })
+
+    found = iter_source_files(str(tmp_path), include=["src/**"], exclude=["tests/"])
+    assert _rel(tmp_path, found) == [("src/pkg/a.py", "python"), ("src/pkg/b.js", "javascript")]
+
+    found = iter_source_files(str(tmp_path), language="python", exclude=["/src/pkg/tests"])
+    assert _rel(tmp_path, found) == [("scripts/run.py", "python"), ("src/pkg/a.py", "python")]
+
+
+def test_single_path_check_matches_walk(tmp_path):
+    _tree(tmp_path, {
+        ".gitignore": "build/\nvendor/*.js\n!vendor/keep.js\n",
+        "src/a.py": "",
+        "src/tests/test_a.py": "",
+        "src/b.js": "",
+        "build/out.py": "",
+        "vendor/lib.js": "",
+        "vendor/keep.js": "",
+        "web/sub/.gitignore": "gen_*.ts\n",
+        "web/sub/gen_x.ts": "",
+        "web/sub/real.ts": "",
+        ".git/x.py": "",
+        "notes.txt": "",
+    })
+    all_files = sorted(str(p) for p in tmp_path.rglob("*") if p.is_file())
+    for options in ({}, {"language": "python"}, {"include": ["src/**", "web/**"], "exclude": ["tests/"]}):
+        walked = dict(iter_source_files(str(tmp_path), **options))
+        checked = {p: source_language(str(tmp_path), p, **options) for p in all_files}
+        assert {p: lang for p, lang in checked.items() if lang} == walked
+    assert source_language(str(tmp_path / "src"), str(tmp_path / "web/sub/real.ts")) is None
+
@@ -0,0 +1,138 @@
+from sqlalchemy import func, select
+
+from app.models import AstNode, CallEdge, Run, SourceFile, Symbol
+from app.parse_pool import iter_parsed
+from app.writers import make_writer
+
+
+def _shape(db, run_id):
+    rows = db.execute(
+        select(AstNode).join(SourceFile).where(SourceFile.run_id == run_id).order_by(AstNode.id)
+    ).scalars().all()
+    pos = {n.id: i for i, n in enumerate(rows)}
+    edges = db.execute(select(CallEdge).where(CallEdge.run_id == run_id).order_by(CallEdge.call_id)).scalars()
+    return (
+        [(n.kind, n.name, n.start_byte, n.meta, pos.get(n.parent_id)) for n in rows],
+        [(pos[e.caller_id], pos[e.call_id], e.callee_name) for e in edges],
+    )
+
+
+def test_copy_writer_matches_orm_writer(db_session, tmp_path):
+    paths = []
+    for i in range(3):
+        p = tmp_path / f"m{i}.py"
+        p.write_text(f"import os\nclass K{i}:\n    def f(self, a):\n        return g{i}(a)\n")
+        paths.append(str(p))
+    parsed = list(iter_parsed("python", paths))
+
+    run_ids = {}
+    for kind in ("orm", "copy"):
+        run = Run(language="python")
+        db_session.add(run)
+        db_session.flush()
+        writer = make_writer(db_session, run.id, kind)
+        assert type(writer).__name__.lower().startswith(kind)
+        for p in parsed:
+            writer.add(p)
+        writer.flush()
+        run_ids[kind] = run.id
+    db_session.commit()
+
+    nodes, edges = _shape(db_session, run_ids["copy"])
+    assert (nodes, edges) == _shape(db_session, run_ids["orm"])
+    assert [name for _, _, name in edges] == ["g0", "g1", "g2"]
+    # Both runs' nodes named "f" point at one interned name.
+    assert db_session.execute(select(func.count()).where(Symbol.name == "f")).scalar_one() == 1
+    files = db_session.execute(select(SourceFile.path).where(SourceFile.run_id == run_ids["copy"])).scalars().all()
+    assert sorted(files) == paths
+
+
+def _write_files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        p = tmp_path / f"f{i}.py"
+        p.write_text(f"def f{i}(): pass\n")
+        paths.append(str(p))
+    return paths
+
+
+def test_progress_is_committed_in_batches(db_session, tmp_path, monkeypatch):
+    from app.config import settings
+    from app.ingest import ingest_files
+
+    monkeypatch.setattr(settings, "ingest_commit_files", 2)
+    run_id = ingest_files(db_session, "python", _write_files(tmp_path, 5))
+    run = db_session.get(Run, run_id)
+    assert (run.status, run.files_total, run.files_done) == ("completed", 5, 5)
+    assert run.bytes_done > 0 and run.finished_at
+
+
+def test_cancel_stops_at_next_checkpoint(db_session, db_engine, tmp_path, monkeypatch):
+    import app.parse_pool
+    from sqlalchemy.orm import Session
+    from app.config import settings
+    from app.ingest import create_run, ingest_files
+    from app.jobs import cancel_run
+
+    monkeypatch.setattr(settings, "ingest_commit_files", 2)
+    run_id = create_run(db_session, "python").id
+    real_parse = app.parse_pool.parse_file
+    calls = []
+
+    def parse_then_cancel(*args):
+        calls.append(args)
+        if len(calls) == 3:
+            with Session(db_engine) as other:
+                cancel_run(other, run_id)
+        return real_parse(*args)
+
+    monkeypatch.setattr(app.parse_pool, "parse_file", parse_then_cancel)
+    ingest_files(db_session, "python", _write_files(tmp_path, 10), run_id=run_id)
+
+    run = db_session.get(Run, run_id)
+    db_session.refresh(run)
+    assert run.status == "cancelled"
+    assert run.files_done == 4
+    count = db_session.query(SourceFile).filter(SourceFile.run_id == run_id).count()
+    assert count == 4
+
+
+def test_failed_ingest_records_error(db_session, tmp_path):
+    import pytest
+    from app.ingest import create_run, ingest_files
+
+    run_id = create_run(db_session, "python").id
+    with pytest.raises(FileNotFoundError):
+        ingest_files(db_session, "python", [str(tmp_path / "missing.py")], run_id=run_id)
+    run = db_session.get(Run, run_id)
+    db_session.refresh(run)
+    assert run.status == "failed"
+    assert "missing.py" in run.error
+
+
+def test_runs_of_dead_processes_are_finished(db_session, db_engine):
+    from sqlalchemy import text
+    from app import leases
+    from app.ingest import create_run
+    from app.jobs import cancel_run
+
+    live = create_run(db_session, "python").id
+    # Another process: its runs stay as they are while it holds its lock.
+    other = db_engine.connect()
+    other.execute(text("SELECT pg_advisory_lock(:cls, 12345)"), {"cls": leases._LOCK_CLASS})
+    runs = {status: Run(language="python", status=status, owner=12345)
+            for status in ("pending", "running", "cancelling")}
+    db_session.add_all(runs.values())
+    db_session.commit()
+    ids = {status: run.id for status, run in runs.items()}
+    assert not set(leases.fail_orphaned_runs(db_session)) & {live, *ids.values()}
+
+    # Disconnect rather than return to the pool, as a dying process would.
+    other.invalidate()
+    # Cancelling finishes every orphan, not just the one cancelled.
+    assert cancel_run(db_session, ids["pending"]).status == "cancelled"
+    for run in runs.values():
+        db_session.refresh(run)
+    assert runs["running"].status == "failed" and runs["running"].error == leases.ORPHANED_ERROR
+    assert runs["cancelling"].status == "cancelled"
+    assert db_session.get(Run, live).status == "pending"
@@ -1,21 +1,37 @@
 import json
 import os
+import subprocess
+import sys
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from unittest.mock import patch
 
+from app.cache import result_cache
+from app.columnar import columnar_store
 from app.db import Base
 from app.mcp_server import (
     reason_ingest,
+    reason_ingest_directory,
     reason_list_runs,
     reason_list_run_files,
+    reason_list_projects,
+    reason_list_project_files,
     reason_query_nodes,
     reason_query_defs,
     reason_query_calls,
+    reason_callers,
+    reason_callees,
     reason_get_file,
     reason_get_node,
+    reason_get_children,
+    reason_get_descendants,
+    reason_get_ancestors,
     reason_get_source,
+    reason_get_sources,
+    reason_load_run,
+    reason_batch,
+    reason_symbol_context,
 )
 
 
@@ -35,7 +51,9 @@ def db_engine():
 @pytest.fixture()
 def mock_db(db_engine):
     TestSession = sessionmaker(bind=db_engine, autoflush=False, autocommit=False)
-    with patch("app.mcp_server.SessionLocal", TestSession):
+    result_cache.clear()
+    columnar_store.clear()
+    with patch("app.mcp_server.SessionLocal", TestSession), patch("app.mcp_server.ReadSessionLocal", TestSession):
         yield
 
 
@@ -62,6 +80,10 @@ def test_ingest_and_query_roundtrip(mock_db, tmp_path):
     assert "Foo" in names
     assert "baz" in names
 
+    fuzzy = json.loads(reason_query_defs(name="bazz", match="fuzzy", run_id=run_id))
+    assert fuzzy[0]["name"] == "baz"
+    assert "error" in json.loads(reason_query_defs(name="baz", match="regex"))
+
     calls = json.loads(reason_query_calls(run_id=run_id))
     assert isinstance(calls, list)
 
@@ -94,3 +116,177 @@ def test_get_file_not_found(mock_db):
 def test_get_source_not_found(mock_db):
     result = json.loads(reason_get_source("/nonexistent/path.py", 0, 10))
     assert "error" in result
+
+
+def test_call_graph_tools(mock_db, tmp_path):
+    (tmp_path / "g.py").write_text("def a():\n    b()\n\ndef b():\n    c()\n\ndef c():\n    pass\n")
+    run_id = json.loads(reason_ingest_directory(str(tmp_path)))["run_id"]
+
+    callers = json.loads(reason_callers(name="c", run_id=run_id))
+    assert [(r["name"], r["depth"]) for r in callers] == [("b", 1), ("a", 2)]
+    callees = json.loads(reason_callees(name="a", run_id=run_id, depth=1))
+    assert [r["name"] for r in callees] == ["b"]
+    assert "error" in json.loads(reason_callers())
+
+
+def test_tree_navigation_tools(mock_db, tmp_path):
+    sample = tmp_path / "n.py"
+    sample.write_text("def outer():\n    def inner():\n        work()\n    inner()\n")
+    run_id = json.loads(reason_ingest("python", [str(sample)]))["run_id"]
+    outer_id = json.loads(reason_query_defs(name="outer", run_id=run_id))[0]["id"]
+    work_id = json.loads(reason_query_calls(name="work", run_id=run_id))[0]["id"]
+
+    calls = json.loads(reason_get_descendants(outer_id, kind="call_expression"))
+    assert [r["name"] for r in calls] == ["work", "inner"]
+    ancestors = json.loads(reason_get_ancestors(work_id, kind="function_definition"))
+    assert [r["name"] for r in ancestors] == ["outer", "inner"]
+    assert json.loads(reason_get_children(outer_id))
+    assert "error" in json.loads(reason_get_children(10**12))
+
+
+def test_load_run_tool(mock_db, tmp_path):
+    sample = tmp_path / "l.py"
+    sample.write_text("def one():\n    two()\n")
+    run_id = json.loads(reason_ingest("python", [str(sample)]))["run_id"]
+    before = reason_query_calls(name="two", run_id=run_id)
+
+    assert json.loads(reason_load_run(run_id))["nodes"] > 0
+    # A different limit misses the result cache, so this is served from memory.
+    assert reason_query_calls(name="two", run_id=run_id, limit=49) == before
+    assert json.loads(reason_load_run(run_id, unload=True))["dropped"] is True
+    assert "error" in json.loads(reason_load_run(10**9))
+
+
+def test_get_sources_batch(mock_db, tmp_path):
+    sample = tmp_path / "m.py"
+    sample.write_text("def f():\n    pass\n")
+    run_id = json.loads(reason_ingest("python", [str(sample)]))["run_id"]
+    node_id = json.loads(reason_query_defs(name="f", run_id=run_id))[0]["id"]
+
+    results = json.loads(reason_get_sources(
+        slices=[{"path": str(sample), "start_byte": 0, "end_byte": 3}], node_ids=[node_id],
+    ))
+    assert [r["text"] for r in results] == ["def", "def f():\n    pass"]
+    assert "error" in json.loads(reason_get_sources(slices=[{"path": str(sample)}]))
+
+
+def test_batch_matches_single_tools(mock_db, tmp_path):
+    sample = tmp_path / "t.py"
+    sample.write_text("class A:\n    def f(self):\n        g()\n\ndef g():\n    pass\n")
+    run_id = json.loads(reason_ingest("python", [str(sample)]))["run_id"]
+    f_id = json.loads(reason_query_defs(name="f", run_id=run_id))[0]["id"]
+
+    results = json.loads(reason_batch([
+        {"op": "query_calls", "name": "g", "run_id": run_id},
+        {"op": "get_ancestors", "node_id": f_id},
+        {"op": "callers", "name": "g", "run_id": run_id},
+        {"op": "get_sources", "node_ids": [f_id], "slices": [{"path": str(sample), "start_byte": 0, "end_byte": 5}]},
+        {"op": "list_run_files", "run_id": run_id},
+        {"op": "query_defs", "name": "g", "match": "regex"},
+        {"op": "get_node", "node_id": f_id, "extra": 1},
+    ]))
+    assert results[0] == json.loads(reason_query_calls(name="g", run_id=run_id))
+    assert results[1] == json.loads(reason_get_ancestors(f_id))
+    assert results[2] == json.loads(reason_callers(name="g", run_id=run_id))
+    assert results[3] == json.loads(reason_get_sources(
+        slices=[{"path": str(sample), "start_byte": 0, "end_byte": 5}], node_ids=[f_id],
+    ))
+    assert results[4] == json.loads(reason_list_run_files(run_id))
+    assert results[5] == {"error": "Unsupported match mode: regex"}
+    assert "error" in results[6]
+    assert "error" in json.loads(reason_batch([{"op": "get_run", "run_id": run_id}] * 1000))
+
+
+def test_symbol_context_tool(mock_db, tmp_path):
+    sample = tmp_path / "c.py"
+    sample.write_text("def g():\n    pass\n\ndef f():\n    g()\n")
+    run_id = json.loads(reason_ingest("python", [str(sample)]))["run_id"]
+
+    ctx = json.loads(reason_symbol_context("g", run_id=run_id))
+    assert ctx["definitions"][0]["text"] == "def g():\n    pass"
+    assert [(s["caller"]["name"], s["line"]) for s in ctx["call_sites"]] == [("f", "g()")]
+    [batched] = json.loads(reason_batch([{"op": "symbol_context", "name": "g", "run_id": run_id}]))
+    assert batched == ctx
+
+
+def test_ingest_directory(mock_db, tmp_path):
+    (tmp_path / "a.py").write_text("def a(): pass\n")
+    (tmp_path / "b.js").write_text("function b() {}\n")
+    (tmp_path / "c.py").write_text("def c(): pass\n")
+
+    result = json.loads(reason_ingest_directory(str(tmp_path), exclude=["c.py"]))
+    assert result["files_indexed"] == 2
+    defs = json.loads(reason_query_defs(run_id=result["run_id"]))
+    assert {d["name"] for d in defs} == {"a", "b"}
+
+
+def test_project_tools_query_latest_files(mock_db, tmp_path):
+    (tmp_path / "p.py").write_text("def old(): pass\n")
+    reason_ingest_directory(str(tmp_path))
+    (tmp_path / "p.py").write_text("def new(): pass\n")
+    run_id = json.loads(reason_ingest_directory(str(tmp_path)))["run_id"]
+
+    project = next(p for p in json.loads(reason_list_projects()) if p["root_path"] == str(tmp_path))
+    assert project["latest_run_id"] == run_id
+    assert [f["run_id"] for f in json.loads(reason_list_project_files(project["id"]))] == [run_id]
+    assert [d["name"] for d in json.loads(reason_query_defs(project_id=project["id"]))] == ["new"]
+
+
+def test_background_ingest_and_cancel_tools(mock_db, tmp_path):
+    import time
+    from app.mcp_server import reason_cancel_run, reason_get_run
+
+    sample = tmp_path / "bg.py"
+    sample.write_text("def bg(): pass\n")
+    started = json.loads(reason_ingest("python", [str(sample)], background=True))
+    assert started["status"] == "pending"
+
+    deadline = time.time() + 10
+    while (run := json.loads(reason_get_run(started["run_id"])))["status"] in ("pending", "running"):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    assert run["status"] == "completed"
+    assert run["files_done"] == 1
+
+    assert json.loads(reason_cancel_run(started["run_id"]))["status"] == "completed"
+    assert json.loads(reason_get_run(999999))["error"] == "run not found"
+
+
+def test_streamable_http_in_api_app(mock_db, tmp_path):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    sample = tmp_path / "h.py"
+    sample.write_text("def served():\n    pass\n")
+    run_id = json.loads(reason_ingest("python", [str(sample)]))["run_id"]
+    headers = {"Accept": "application/json, text/event-stream"}
+
+    def rpc(client, method, params, request_id=1):
+        resp = client.post("/mcp", headers=headers,
+                           json={"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        assert resp.status_code == 200
+        return resp.json()["result"]
+
+    # Stateless: every request stands alone, so no session id is needed and
+    # a restarted app (another worker) answers just the same.
+    for _ in range(2):
+        with TestClient(app) as client:
+            tools = {t["name"] for t in rpc(client, "tools/list", {})["tools"]}
+            assert {"reason_query_defs", "reason_batch", "reason_symbol_context"} <= tools
+            result = rpc(client, "tools/call", {"name": "reason_query_defs",
+                                                "arguments": {"name": "served", "run_id": run_id}})
+            assert [d["name"] for d in json.loads(result["content"][0]["text"])] == ["served"]
+
+
+
+def test_import_defers_ingest_and_engine():
+    # A fresh stdio server answers initialize without loading the parser
+    # stack, numpy or the database driver; see scripts/bench_startup.py.
+    code = (
+        "import sys, app.mcp_server, app.db; "
+        "heavy = ['tree_sitter', 'app.ingest', 'app.jobs', 'numpy', 'psycopg']; "
+        "print([m for m in heavy if m in sys.modules])"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,52 @@
+from app.parse_pool import iter_parsed
+
+
+def _write_samples(tmp_path, count):
+    paths = []
+    for i in range(count):
+        p = tmp_path / f"mod_{i}.py"
+        p.write_text(f"class C{i}:\n    def m(self):\n        return helper_{i}(self)\n")
+        paths.append(str(p))
+    return paths
+
+
+def test_pool_matches_inline_and_preserves_order(tmp_path):
+    paths = _write_samples(tmp_path, 11)
+
+    inline = list(iter_parsed("python", paths, workers=1))
+    pooled = list(iter_parsed("python", iter(paths), workers=2, chunk_size=2))
+
+    assert [p.path for p in pooled] == paths
+    assert pooled == inline
+    assert pooled[3].nodes[0].name == "C3"
+    assert pooled[3].nodes[2].name == "helper_3"
+
+
+def test_chained_call_names(tmp_path):
+    p = tmp_path / "chain.py"
+    p.write_text("ctx.draw(self.a).then(self.b).finish(h(self))\n")
+    [parsed] = iter_parsed("python", [str(p)])
+    assert [n.name for n in parsed.nodes] == ["finish", "then", "draw", "h"]
+
+
+def test_long_chains_and_deep_nesting(tmp_path):
+    # Both exceed the interpreter's recursion limit if walked recursively.
+    p = tmp_path / "deep.py"
+    p.write_text("x = a" + "".join(f".m{i}(y)" for i in range(3000)) + "\n"
+                 + "def f():\n    return " + "g(" * 1500 + ")" * 1500 + "\n")
+    j = tmp_path / "deep.js"
+    j.write_text("import x from 'lib';\nclass K { run() { return helper(a); } }\n")
+    parsed, js = iter_parsed(None, [(str(p), "python"), (str(j), "javascript")])
+
+    chain = parsed.nodes[:3000]
+    assert [n.name for n in chain[:2]] == ["m2999", "m2998"] and chain[-1].name == "m0"
+    assert [n.parent_idx for n in chain[1:3]] == [0, 1]
+    assert parsed.nodes[3000].kind == "function_definition"
+    assert len(parsed.edges) == 1500 and parsed.nodes[-1].parent_idx == len(parsed.nodes) - 2
+
+    assert [(n.kind, n.name, n.parent_idx) for n in js.nodes] == [
+        ("import_statement", "lib", None),
+        ("class_declaration", "K", None),
+        ("method_definition", "run", 1),
+        ("call_expression", "helper", 2),
+    ]
@@ -0,0 +1,36 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from app.blob_codec import compress, decompress_chunk
+from app.snapshots import SnapshotCache, store_snapshots
+
+
+def test_snapshot_slices_span_chunks(db_session):
+    content = "".join(f"line {i}: é\n" for i in range(50)).encode()
+    for codec in ("zlib", None):
+        snap = compress(content, codec=codec, chunk_size=16)
+        key = f"{snap.codec}-{len(content)}"
+        store_snapshots(db_session, [(key, snap), (key, snap)])
+        db_session.commit()
+
+        cache = SnapshotCache(max_bytes=64)
+        ranges = [(0, 5), (10, 70), (len(content) - 3, len(content) + 10), (30, 30)]
+        expected = [content[s:e].decode() for s, e in ranges]
+        for _ in range(2):  # cold, then partly cached
+            assert cache.read_many(db_session, [(key, s, e) for s, e in ranges]) == expected
+        assert cache.read_many(db_session, [("missing", 0, 1)]) == [None]
+
+
+def test_compress_from_several_threads():
+    # Large enough for the threads to overlap inside zstd: a compressor
+    # shared between them corrupted frames or crashed the interpreter.
+    contents = [random.Random(i).randbytes(50_000) + f"def f{i}(): return {i}\n".encode() * 10_000
+                for i in range(16)]
+
+    def roundtrip(content):
+        snap = compress(content)
+        starts = [0] + snap.chunk_ends[:-1]
+        return b"".join(decompress_chunk(snap.codec, snap.data[s:e]) for s, e in zip(starts, snap.chunk_ends))
+
+    with ThreadPoolExecutor(8) as pool:
+        assert list(pool.map(roundtrip, contents * 8)) == contents * 8
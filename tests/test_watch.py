@@ -0,0 +1,162 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.cache import ResultCache, query_cache_key
+from app.columnar import ColumnarStore
+from app.models import AstNode, CallEdge, Run, SourceFile
+from app.parse_pool import parse_data
+from app.partitions import partition_name
+from app.query import RUN_STATE
+from app.retention import mark_deleting, purge_run
+from app.watch import Watcher, WatchedRunGone
+
+
+def _files(db, run_id):
+    return dict(db.execute(
+        select(SourceFile.path, SourceFile.content_hash).where(SourceFile.run_id == run_id)
+    ).all())
+
+
+def _callee(db, run_id, name):
+    """(file name, line) of the definition the run's only call to ``name`` resolved to."""
+    callee_id = db.execute(
+        select(CallEdge.callee_id).where(CallEdge.run_id == run_id, CallEdge.callee_name == name)
+    ).scalar_one()
+    if callee_id is None:
+        return None
+    node = db.get(AstNode, callee_id)
+    return node.file.path.rsplit("/", 1)[1], node.start_line
+
+
+def test_apply_replaces_touched_files_in_place(db_engine, db_session, tmp_path):
+    (tmp_path / ".gitignore").write_text("gen/\n")
+    (tmp_path / "a.py").write_text("def helper():\n    return 1\n")
+    (tmp_path / "b.py").write_text("def main():\n    return helper()\n")
+    (tmp_path / "c.py").write_text("x = 1\n")
+    watcher = Watcher(str(tmp_path), session_factory=sessionmaker(bind=db_engine), use_watchdog=False)
+    run_id = watcher.start()
+    before = _files(db_session, run_id)
+    assert _callee(db_session, run_id, "helper") == ("a.py", 0)
+
+    # The definition moves to a new file; b.py itself is untouched.
+    (tmp_path / "a.py").write_text("VALUE = 1\n")
+    (tmp_path / "d.py").write_text("\n\ndef helper():\n    return 2\n")
+    (tmp_path / "c.py").unlink()
+    (tmp_path / "gen").mkdir()
+    (tmp_path / "gen" / "e.py").write_text("def helper():\n    pass\n")
+    paths = [tmp_path / p for p in ("a.py", "b.py", "c.py", "d.py", "gen/e.py")]
+    assert watcher.apply(str(p) for p in paths) == {"parsed": 2, "incremental": 0, "removed": 1}
+
+    db_session.expire_all()
+    after = _files(db_session, run_id)
+    assert sorted(p.rsplit("/", 1)[1] for p in after) == ["a.py", "b.py", "d.py"]
+    assert after[str(tmp_path / "b.py")] == before[str(tmp_path / "b.py")]
+    assert after[str(tmp_path / "a.py")] != before[str(tmp_path / "a.py")]
+    assert _callee(db_session, run_id, "helper") == ("d.py", 2)
+    run = db_session.get(Run, run_id)
+    assert (run.status, run.files_done) == ("completed", 3)
+
+    # A second edit of a file parsed here reuses its cached tree, and the
+    # result matches a parse from scratch.
+    (tmp_path / "d.py").write_text("\n\ndef helper(x):\n    return x\n\ndef other():\n    return 3\n")
+    assert watcher.apply([str(tmp_path / "d.py")])["incremental"] == 1
+    data = (tmp_path / "d.py").read_bytes()
+    full, _ = parse_data("python", str(tmp_path / "d.py"), data, cst_format="sexp")
+    assert watcher.trees.get(str(tmp_path / "d.py"), "python")[1].root_node.sexp() == full.cst
+    db_session.expire_all()
+    names = db_session.execute(
+        select(AstNode.name).join(SourceFile)
+        .where(SourceFile.run_id == run_id, SourceFile.path == str(tmp_path / "d.py"),
+               AstNode.kind == "function_definition")
+        .order_by(AstNode.id)
+    ).scalars().all()
+    assert names == ["helper", "other"]
+
+
+def test_polling_applies_changes_after_debounce(db_engine, db_session, tmp_path):
+    (tmp_path / "a.py").write_text("def f():\n    pass\n")
+    watcher = Watcher(str(tmp_path), session_factory=sessionmaker(bind=db_engine), use_watchdog=False,
+                      debounce=0.05, poll_interval=0.05)
+    run_id = watcher.start()
+    thread = threading.Thread(target=watcher.run_forever)
+    thread.start()
+    try:
+        (tmp_path / "b.py").write_text("def g():\n    pass\n")
+        deadline = time.monotonic() + 10
+        while len(_files(db_session, run_id)) < 2 and time.monotonic() < deadline:
+            db_session.rollback()
+            time.sleep(0.05)
+    finally:
+        watcher.stop()
+        thread.join(5)
+    assert sorted(p.rsplit("/", 1)[1] for p in _files(db_session, run_id)) == ["a.py", "b.py"]
+    assert not thread.is_alive()
+
+
+def test_apply_makes_other_processes_drop_the_old_rows(db_engine, db_session, tmp_path):
+    (tmp_path / "a.py").write_text("def old():\n    pass\n")
+    watcher = Watcher(str(tmp_path), session_factory=sessionmaker(bind=db_engine), use_watchdog=False)
+    run_id = watcher.start()
+    # Another process's snapshot and cache: apply cannot reach them.
+    store, cache = ColumnarStore(), ResultCache(max_entries=10, ttl=60)
+
+    def lookup():
+        db_session.rollback()
+        state = db_session.execute(RUN_STATE, {"run_id": run_id}).first()
+        key = query_cache_key("defs", run_id=run_id, name="old", version=state.version)
+        return state, key, cache.tag_for(run_id, state.status)
+
+    state, key, tag = lookup()
+    assert [r.name for r in store.load(db_session, run_id).query(name="old")] == ["old"]
+    cache.put(key, tag, b"old")
+    assert store.get(run_id, state.version) is not None and cache.get(key, tag) == b"old"
+
+    (tmp_path / "a.py").write_text("def new():\n    pass\n")
+    watcher.apply([str(tmp_path / "a.py")])
+    state, key, tag = lookup()
+    assert state.status == "completed"
+    assert store.get(run_id, state.version) is None and run_id not in store
+    assert cache.get(key, tag) is None
+
+
+def test_runs_being_deleted_or_of_other_roots_are_not_written(db_engine, db_session, tmp_path):
+    (tmp_path / "a.py").write_text("def f():\n    pass\n")
+    other = tmp_path / "other"
+    other.mkdir()
+    watcher = Watcher(str(tmp_path), session_factory=sessionmaker(bind=db_engine), use_watchdog=False)
+    run_id = watcher.start()
+    with pytest.raises(ValueError, match="is of"):
+        Watcher(str(other), run_id=run_id, session_factory=sessionmaker(bind=db_engine), use_watchdog=False).start()
+
+    # Retention purged the run from under the watcher.
+    assert mark_deleting(db_session, [run_id]) == [run_id]
+    purge_run(db_session, run_id)
+    (tmp_path / "a.py").write_text("def g():\n    pass\n")
+    with pytest.raises(WatchedRunGone):
+        watcher.apply([str(tmp_path / "a.py")])
+    db_session.rollback()
+    assert db_session.execute(text("SELECT to_regclass(:name)"), {"name": partition_name(run_id)}).scalar() is None
+
+    # The loop carries on with a new run of the root.
+    watcher.debounce = watcher.poll_interval = 0.05
+    thread = threading.Thread(target=watcher.run_forever)
+    thread.start()
+    try:
+        watcher.notify(str(tmp_path / "a.py"))
+        deadline = time.monotonic() + 10
+        while watcher.run_id == run_id and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        watcher.stop()
+        thread.join(5)
+    assert watcher.run_id != run_id
+    db_session.rollback()
+    names = db_session.execute(
+        select(AstNode.name).join(SourceFile)
+        .where(SourceFile.run_id == watcher.run_id, AstNode.kind == "function_definition")
+    ).scalars().all()
+    assert names == ["g"]